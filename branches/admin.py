@@ -1,9 +1,14 @@
 from django.contrib import admin
-from .models import Wallet, Branch
+from django.utils.translation import gettext_lazy as _
+from .models import Wallet, WalletMovement, Branch
 
 @admin.register(Wallet)
 class WalletAdmin(admin.ModelAdmin):
-    list_display = ('name', 'balance')
+    list_display = ('name', 'current_balance')
+
+    @admin.display(description=_('Balance'))
+    def current_balance(self, obj):
+        return obj.current_balance
 
     def has_add_permission(self, request):
         if Wallet.objects.exists():
@@ -16,6 +21,22 @@ class WalletAdmin(admin.ModelAdmin):
     def has_change_permission(self, request, obj=None):
         return False
 
+@admin.register(WalletMovement)
+class WalletMovementAdmin(admin.ModelAdmin):
+    list_display = ('amount', 'description', 'branch', 'created_at')
+    list_filter = ('branch', 'created_at')
+    list_select_related = ('branch',)
+    ordering = ('-id',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
 @admin.register(Branch)
 class BranchAdmin(admin.ModelAdmin):
     list_display = ('name', 'balance', 'phone_number', 'address', 'created_at')  # Display fields in the list view
@@ -0,0 +1,13 @@
+from datetime import timedelta
+
+from jobs.tasks import task
+from .models import Wallet
+
+
+@task('branches.roll_up_wallet', every=timedelta(hours=1))
+def roll_up_wallet(job):
+    """The ``roll_up_wallet`` command, queued by the workers every hour so pending movements stay few."""
+    wallet = Wallet.objects.first()
+    if wallet is None:
+        return {'balance': None}
+    return {'balance': wallet.roll_up().balance}
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from branches.models import Wallet
+
+
+class Command(BaseCommand):
+    help = ('Fold appended wallet movements into the cached wallet balance; `run_jobs` workers do it every '
+            'hour on their own')
+
+    def handle(self, *args, **options):
+        wallet = Wallet.objects.first()
+        if wallet is None:
+            self.stdout.write(self.style.WARNING('No wallet exists yet'))
+            return
+        wallet.roll_up()
+        self.stdout.write(self.style.SUCCESS(f"Wallet balance {wallet.balance}"))
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.7 on 2026-10-18 07:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('branches', '0005_alter_branch_balance_alter_wallet_balance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WalletMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=0, max_digits=15, verbose_name='Amount')),
+                ('description', models.CharField(blank=True, max_length=255, null=True, verbose_name='Description')),
+                ('is_rolled_up', models.BooleanField(db_index=True, default=False, editable=False, verbose_name='Included in wallet balance')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('branch', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='branches.branch', verbose_name='Branch')),
+            ],
+            options={
+                'verbose_name': 'Wallet movement',
+                'verbose_name_plural': 'Wallet movements',
+            },
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.core.validators import MinValueValidator
 from django.utils.translation import gettext_lazy as _
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Sum
 from rest_framework.exceptions import ValidationError
 
 
@@ -18,7 +19,51 @@ class Wallet(models.Model):
         return super().save(*args, **kwargs)
 
     def __str__(self):
-        return str(self.balance)
+        return str(self.current_balance)
+
+    @property
+    def current_balance(self):
+        """Rolled-up balance plus every movement appended after the last roll-up."""
+        pending = WalletMovement.objects.filter(is_rolled_up=False).aggregate(total=Sum('amount'))['total'] or 0
+        return self.balance + pending
+
+    @classmethod
+    def add(cls, amount, branch=None, description=None):
+        """Records a wallet movement; writers only append, so they never contend on the wallet row."""
+        if amount:
+            WalletMovement.objects.create(amount=amount, branch=branch, description=description)
+
+    def roll_up(self, chunk_size=10000):
+        """Folds the appended movements into ``balance``, flagging each one so it is counted once."""
+        while True:
+            with transaction.atomic():
+                Wallet.objects.select_for_update().filter(pk=self.pk).exists()
+                ids = list(WalletMovement.objects.filter(is_rolled_up=False).order_by('id').values_list(
+                    'id', flat=True)[:chunk_size])
+                if not ids:
+                    break
+                movements = WalletMovement.objects.filter(id__in=ids)
+                pending = movements.aggregate(total=Sum('amount'))['total'] or 0
+                movements.update(is_rolled_up=True)
+                Wallet.objects.filter(pk=self.pk).update(balance=F('balance') + pending)
+        self.refresh_from_db(fields=['balance'])
+        return self
+
+
+class WalletMovement(models.Model):
+    amount = models.DecimalField(max_digits=15, decimal_places=0, verbose_name=_('Amount'))
+    description = models.CharField(max_length=255, blank=True, null=True, verbose_name=_('Description'))
+    branch = models.ForeignKey('Branch', on_delete=models.SET_NULL, null=True, blank=True, verbose_name=_('Branch'))
+    is_rolled_up = models.BooleanField(default=False, db_index=True, editable=False,
+                                       verbose_name=_('Included in wallet balance'))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Created at'))
+
+    class Meta:
+        verbose_name = _('Wallet movement')
+        verbose_name_plural = _('Wallet movements')
+
+    def __str__(self):
+        return f"{self.amount} - {self.description}"
 
 
 class Branch(models.Model):
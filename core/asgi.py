@@ -3,6 +3,12 @@ ASGI config for core project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Served by an ASGI server, e.g. ``uvicorn core.asgi:application --workers 4``, the async views
+(statistics, branch balance, order list) wait for their queries on the event loop. Every sync
+view, order entry included, runs in a thread of its own, and reports share the REPORT_WORKERS
+threads of the process, so slow reports queue behind each other rather than starving other
+requests. Under WSGI (``core.wsgi``) async views run to completion in the worker as sync ones do.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
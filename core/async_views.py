@@ -0,0 +1,74 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from rest_framework.views import APIView
+
+_report_executor = None
+
+
+def with_own_connections(function, *args):
+    """
+    Runs ``function(*args)`` in a thread of a pool on that thread's connections, which are closed
+    or kept as after a request: past ``CONN_MAX_AGE`` (at once with 0) or when they are unusable.
+    """
+    close_old_connections()
+    try:
+        return function(*args)
+    finally:
+        close_old_connections()
+
+
+async def run_report(function, *args):
+    """
+    Runs ``function(*args)`` in the pool of ``REPORT_WORKERS`` threads reports share, on database
+    connections of its own, and returns its result.
+
+    However many slow reports come in at once, they take up no more than those threads (and
+    connections): the rest wait for one, without holding the event loop or the threads the other
+    requests run in. ``function`` does all its work in that thread; it starts no threads of its own.
+    """
+    global _report_executor
+    if _report_executor is None:
+        _report_executor = ThreadPoolExecutor(max_workers=settings.REPORT_WORKERS, thread_name_prefix='report')
+    # run_in_executor leaves the request's context behind, so the thread opens its own connections
+    return await asyncio.get_running_loop().run_in_executor(
+        _report_executor, partial(with_own_connections, function, *args))
+
+
+class AsyncAPIView(APIView):
+    """
+    An ``APIView`` with ``async def`` handlers, served on the event loop under an ASGI server.
+
+    Authentication, permissions and throttling may query the database, so they run in the request's
+    worker thread (as the async ORM does) before the handler is awaited. Views with a sync handler
+    (``options``) still work.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
@@ -0,0 +1,27 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite applying ``OPTIONS['pragmas']`` to every new connection and opening transactions with
+    ``BEGIN <OPTIONS['transaction_mode']>``.
+
+    With ``IMMEDIATE`` an ``atomic()`` block takes the write lock up front, so a concurrent writer
+    waits for it within ``busy_timeout``; a deferred transaction that reads first and writes later
+    fails at once with "database is locked" when another connection wrote in between.
+    """
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = params.pop('pragmas', {})
+        self.transaction_mode = params.pop('transaction_mode', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {self.transaction_mode}' if self.transaction_mode else 'BEGIN')
@@ -0,0 +1,46 @@
+from decimal import Decimal
+
+from django.db.models import Case, When, F, Value
+
+
+def _as_field_type(current, delta):
+    if isinstance(current, Decimal) and not isinstance(delta, Decimal):
+        return Decimal(str(delta))
+    return delta
+
+
+def increment(instance, minimum=None, **deltas):
+    """
+    Adds ``deltas`` to the numeric fields of ``instance`` with a single
+    ``UPDATE ... SET field = field + delta`` and moves the in-memory values by the same amount.
+
+    With ``minimum`` a decreasing field is only updated when its stored value stays at or
+    above it; ``False`` is returned (and nothing is written) otherwise.
+    """
+    deltas = {field: _as_field_type(getattr(instance, field), delta) for field, delta in deltas.items() if delta}
+    if not deltas:
+        return True
+    queryset = type(instance)._base_manager.filter(pk=instance.pk)
+    if minimum is not None:
+        for field, delta in deltas.items():
+            if delta < 0:
+                queryset = queryset.filter(**{f'{field}__gte': minimum - delta})
+    if not queryset.update(**{field: F(field) + Value(delta) for field, delta in deltas.items()}):
+        return False
+    for field, delta in deltas.items():
+        setattr(instance, field, (getattr(instance, field) or 0) + delta)
+    return True
+
+
+def increment_many(model, field, deltas, output_field, **values):
+    """Adds ``deltas[pk]`` to ``field`` of every ``model`` row (and sets ``values``) in one UPDATE."""
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    if not deltas:
+        return 0
+    return model._base_manager.filter(pk__in=deltas).update(**{
+        field: Case(
+            *[When(pk=pk, then=F(field) + Value(delta)) for pk, delta in deltas.items()],
+            output_field=output_field
+        ),
+        **values
+    })
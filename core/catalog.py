@@ -0,0 +1,171 @@
+from dataclasses import dataclass, fields
+
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.response import Response
+
+from core.metrics import registry
+from core.versions import bump_versions, cache_versions
+from inventory.models import Service
+from users.models import Employee
+
+
+class Record:
+    __slots__ = ()
+    model = None
+
+    def instance(self):
+        """A new (unshared) model instance of the record, as if loaded from the database."""
+        names = [field.name for field in fields(self)]
+        return self.model.from_db(DEFAULT_DB_ALIAS, names, [getattr(self, name) for name in names])
+
+
+@dataclass(frozen=True, slots=True)
+class ServiceRecord(Record):
+    model = Service
+
+    id: int
+    name: str
+    price: object
+    branch_id: int
+
+
+@dataclass(frozen=True, slots=True)
+class EmployeeRecord(Record):
+    # everything but ``balance``, which every order moves; it stays deferred on ``instance()``
+    model = Employee
+
+    id: int
+    first_name: str
+    last_name: str
+    phone: str
+    address: str
+    branch_id: int
+    usertemp_ptr_id: int
+    position: str
+    commission_per: int
+    kpi: object
+    salary: object
+
+
+RECORDS = {Service: ServiceRecord, Employee: EmployeeRecord}
+
+
+class BranchCatalog:
+    """
+    The services and employees of one branch as records, and the list payloads made of them.
+
+    Never changed once built: a new version of the branch makes a new catalog.
+    """
+    __slots__ = ('version', 'records', 'listings')
+
+    def __init__(self, branch_id, version):
+        self.version = version
+        self.records = {}
+        for model, record in RECORDS.items():
+            names = [field.name for field in fields(record)]
+            rows = model.objects.filter(branch_id=branch_id).order_by('pk').values_list(*names)
+            self.records[model] = {row[0]: record(*row) for row in rows}
+        self.listings = {}
+
+    def get(self, model, pk):
+        return self.records[model].get(pk)
+
+    def select(self, model, **values):
+        """Records of ``model`` with the attribute ``values`` given, by primary key."""
+        return [record for record in self.records[model].values()
+                if all(getattr(record, name) == value for name, value in values.items())]
+
+    def listing(self, name, build):
+        """The list ``name`` made by ``build(catalog)``, built once per catalog."""
+        if name not in self.listings:
+            self.listings[name] = build(self)
+        return self.listings[name]
+
+
+# branch id -> BranchCatalog of this process
+_catalogs = {}
+
+
+def version_key(branch_id):
+    return f'catalog:version:{branch_id}'
+
+
+def branch_catalog(branch_id):
+    """
+    The current catalog of the branch: the one of this process when its version is still the shared
+    one in the cache, otherwise loaded again with a query for services and one for employees.
+    """
+    version, = cache_versions([version_key(branch_id)])
+    catalog = _catalogs.get(branch_id)
+    hit = catalog is not None and catalog.version == version
+    registry.count('catalog_cache_lookups_total', {'result': 'hit' if hit else 'miss'})
+    if not hit:
+        # the version is read before the rows, so a change committed in between is caught next time
+        catalog = _catalogs[branch_id] = BranchCatalog(branch_id, version)
+    return catalog
+
+
+def invalidate(branch_id):
+    """
+    Retires the catalogs of the branch in every process once the current transaction commits, and
+    this process's at once, so that it reads its own change before then.
+    """
+    _catalogs.pop(branch_id, None)
+    bump_versions([version_key(branch_id)])
+
+
+@receiver([post_save, post_delete], sender=Service)
+@receiver([post_save, post_delete], sender=Employee)
+def catalog_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= {'balance'}:
+        return
+    invalidate(instance.branch_id)
+
+
+class CatalogListMixin:
+    """
+    Lists the branch's ``catalog_model`` records matching ``catalog_filter`` from its catalog: they are
+    serialized once per catalog version, newest first with ``catalog_reverse``, and only paginated
+    here. ``live_fields``, left out of the catalog, are read from the database for the page.
+
+    ``get_queryset()`` is not used for the list, so it must select the same rows: those of the user's
+    branch matching ``catalog_filter``. A view with ``filter_backends`` is listed from its queryset.
+    """
+    catalog_model = None
+    catalog_filter = {}
+    catalog_reverse = False
+    live_fields = ()
+
+    def list(self, request, *args, **kwargs):
+        if self.filter_backends:
+            return super().list(request, *args, **kwargs)
+        rows = branch_catalog(request.user.branch_id).listing(type(self).__name__, self.serialize_catalog)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(self.with_live_fields(page))
+        return Response(self.with_live_fields(rows))
+
+    def serialize_catalog(self, catalog):
+        serializer = self.get_serializer()
+        records = catalog.select(self.catalog_model, **self.catalog_filter)
+        rows = []
+        for record in reversed(records) if self.catalog_reverse else records:
+            instance = record.instance()
+            for name in self.live_fields:
+                setattr(instance, name, None)
+            rows.append(serializer.to_representation(instance))
+        return rows
+
+    def with_live_fields(self, rows):
+        if not self.live_fields or not rows:
+            return rows
+        serializer_fields = self.get_serializer().fields
+        values = {row[0]: row[1:] for row in self.catalog_model.objects.filter(
+            pk__in=[row['id'] for row in rows]).values_list('pk', *self.live_fields)}
+        rows = [dict(row) for row in rows]
+        for row in rows:
+            for name, value in zip(self.live_fields, values.get(row['id'], ())):
+                row[name] = serializer_fields[name].to_representation(value)
+        return rows
@@ -0,0 +1,212 @@
+import os
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from decimal import Decimal
+from random import Random
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from branches.models import Branch
+from inventory.models import Car, Product, Service, WarehouseValuation, lookup_key
+from services.models import Order, OrderProduct, OrderService
+from transactions.models import Debt, Expense, ExpenseType, ImportList, ImportProduct, Lending, Salary
+from users.models import Client, Employee, Supplier, User
+
+FIRST_NAMES = ('Aziz', 'Bekzod', 'Dilshod', 'Farrux', 'Jasur', 'Kamola', 'Laylo', 'Malika', 'Nodir', 'Otabek',
+               'Rustam', 'Sardor', 'Shahzod', 'Ulugbek', 'Zarina')
+LAST_NAMES = ('Aliyev', 'Karimov', 'Rahimov', 'Tursunov', 'Yusupov', 'Saidov', 'Nazarov', 'Qodirov')
+CARS = (('Cobalt', 'Chevrolet'), ('Nexia', 'Chevrolet'), ('Malibu', 'Chevrolet'), ('Gentra', 'Chevrolet'),
+        ('Tracker', 'Chevrolet'), ('K5', 'Kia'), ('Sonata', 'Hyundai'), ('Camry', 'Toyota'), ('BYD Han', 'BYD'))
+COLORS = ('white', 'black', 'silver', 'grey', 'blue', 'red')
+SERVICES = ('Oil change', 'Diagnostics', 'Brake pads', 'Wheel alignment', 'Suspension', 'Air conditioning',
+            'Engine repair', 'Gearbox', 'Electrics', 'Body repair', 'Painting', 'Tyre fitting')
+PARTS = ('Oil filter', 'Air filter', 'Brake pad', 'Spark plug', 'Engine oil 4L', 'Timing belt', 'Shock absorber',
+         'Battery', 'Coolant', 'Headlight bulb', 'Wiper blade', 'Clutch kit')
+EXPENSE_TYPES = ('Rent', 'Electricity', 'Water', 'Tools', 'Cleaning', 'Food')
+
+
+@dataclass
+class Size:
+    """Rows generated per branch."""
+    clients: int = 200
+    products: int = 300
+    orders: int = 1000
+    imports: int = 150
+    ledger: int = 200
+    days: int = 90
+
+
+@dataclass
+class GeneratedBranch:
+    branch: Branch
+    user: User
+    first_day: object
+    last_day: object
+
+
+@contextmanager
+def explicit_created_at(*models):
+    """Lets ``bulk_create`` keep the ``created_at`` given instead of stamping the current time."""
+    fields = [model._meta.get_field('created_at') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+@contextmanager
+def scratch_database(directory):
+    """
+    A freshly migrated test database in place of the default one until the block exits, when it is
+    dropped. Data written in it can be committed, so other threads and connections see it too. A
+    SQLite one is a file in ``directory``.
+    """
+    if connection.vendor == 'sqlite':
+        connection.settings_dict['TEST']['NAME'] = os.path.join(directory, 'scratch.sqlite3')
+    name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(name, verbosity=0)
+
+
+def generate(branches, size=None, seed=0):
+    """
+    ``branches`` branches of realistic data, the same for the same ``seed`` and ``size``: people,
+    cars, services and products, then orders with service and product lines, imports, supplier debts,
+    client lendings, expenses and salaries spread over the last ``size.days`` days.
+
+    Rows are inserted with ``bulk_create``; stock, balances and the warehouse valuation are set to
+    plausible values afterwards rather than replayed through every ``save()``.
+    """
+    size = size or Size()
+    with transaction.atomic(), explicit_created_at(Order, ImportList, Debt, Lending, Expense, Salary, Car, Product):
+        return [_branch(Random(f'{seed}-{number}'), number, size) for number in range(branches)]
+
+
+def _moments(rng, count, first_day, days):
+    start = timezone.make_aware(datetime.combine(first_day, datetime.min.time()))
+    return sorted(start + timedelta(days=rng.randrange(days), hours=rng.uniform(8, 20)) for _ in range(count))
+
+
+def _person(rng):
+    return {'first_name': rng.choice(FIRST_NAMES), 'last_name': rng.choice(LAST_NAMES),
+            'phone': f'+99890{rng.randrange(10 ** 7):07d}'}
+
+
+def _branch(rng, number, size):
+    last_day = timezone.localdate()
+    first_day = last_day - timedelta(days=size.days - 1)
+    branch = Branch.objects.create(name=f'Dataset branch {number}', balance=rng.randrange(10 ** 8, 10 ** 9))
+    user = User(username=f'dataset-{branch.id}', branch=branch)
+    user.set_unusable_password()
+    user.save()
+
+    # multi-table inheritance rules out bulk_create for people
+    managers = [Employee.objects.create(**_person(rng), position='manager', commission_per=rng.choice((1, 2, 3)),
+                                        branch=branch) for _ in range(3)]
+    mechanics = [Employee.objects.create(**_person(rng), position='mechanic', kpi=rng.randrange(5, 30) * 1000,
+                                         branch=branch) for _ in range(8)]
+    suppliers = [Supplier.objects.create(**_person(rng), branch=branch) for _ in range(max(size.products // 30, 3))]
+    clients = [Client.objects.create(**_person(rng), branch=branch) for _ in range(size.clients)]
+
+    moments = _moments(rng, len(clients) * 3 // 2, first_day - timedelta(days=365), 365)
+    cars = Car.objects.bulk_create(
+        Car(name=model, brand=brand, color=rng.choice(COLORS), state_number=f'{rng.randrange(1, 99):02d}A{i:03d}AA',
+            odo_mileage=rng.randrange(10 ** 5), client=clients[i % len(clients)], created_at=moment, branch=branch)
+        for i, ((model, brand), moment) in enumerate((rng.choice(CARS), moment) for moment in moments))
+    services = Service.objects.bulk_create(
+        Service(name=f'{name}{level}', price=rng.randrange(5, 100) * 10000, branch=branch)
+        for level in ('', ' (premium)', ' (express)') for name in SERVICES)
+    moments = _moments(rng, size.products, first_day - timedelta(days=365), 365)
+    products = Product.objects.bulk_create(
+        Product(code=code, code_key=lookup_key(code), name=name, name_key=lookup_key(name), amount=rng.randrange(0, 60),
+                min_amount=rng.choice((0, 2, 5)), unit='pcs', arrival_price=price, sell_price=price * 13 // 10,
+                is_temp=rng.random() < 0.05, supplier=rng.choice(suppliers), created_at=moment, branch=branch)
+        for code, name, price, moment in (
+            (f'{number}-{i:05d}', f'{PARTS[i % len(PARTS)]} {i}', rng.randrange(2, 200) * 1000, moment)
+            for i, moment in enumerate(moments)))
+    stock = [product for product in products if not product.is_temp]
+
+    orders, service_lines, product_lines = [], [], []
+    for moment in _moments(rng, size.orders, first_day, size.days):
+        car = rng.choice(cars)
+        order = Order(car=car, client=car.client, manager=rng.choice(managers), branch=branch, created_at=moment,
+                      odo_mileage=car.odo_mileage, total=0, paid=0, landing=0, overall_total=0)
+        for service in rng.sample(services, rng.randint(1, 3)):
+            discount = rng.choice((0, 0, 5, 10))
+            line = OrderService(order=order, service=service, part=1, discount=discount, mechanic=rng.choice(mechanics),
+                                total=service.price * (100 - discount) / 100)
+            order.service_overall_total += service.price
+            order.service_total += line.total
+            service_lines.append(line)
+        for product in rng.sample(stock, rng.randint(0, 4)):
+            amount = rng.randint(1, 4)
+            line = OrderProduct(order=order, product=product, amount=amount, total=product.sell_price * amount,
+                                net_profit=(product.sell_price - product.arrival_price) * amount)
+            order.product_overall_total += line.total
+            order.product_total += line.total
+            product_lines.append(line)
+        order.overall_total = order.service_overall_total + order.product_overall_total
+        order.total = order.service_total + order.product_total
+        order.paid = order.total if rng.random() < 0.9 else order.total // 2
+        order.landing = order.total - order.paid
+        orders.append(order)
+    Order.objects.bulk_create(orders)
+    OrderService.objects.bulk_create(service_lines)
+    OrderProduct.objects.bulk_create(product_lines)
+
+    import_lists, import_lines = [], []
+    for moment in _moments(rng, size.imports, first_day, size.days):
+        import_list = ImportList(supplier=rng.choice(suppliers), payment_type=rng.choice(('0', '1', '2')),
+                                 created_at=moment, branch=branch, total=0)
+        for product in rng.sample(stock, min(rng.randint(1, 8), len(stock))):
+            amount = rng.randint(5, 50)
+            line = ImportProduct(import_list=import_list, product=product, amount=amount,
+                                 arrival_price=product.arrival_price, sell_price=product.sell_price,
+                                 total_summ=product.arrival_price * amount)
+            import_list.total += line.total_summ
+            import_lines.append(line)
+        if import_list.payment_type == '0':
+            import_list.paid = 0
+        else:
+            import_list.paid = import_list.total if rng.random() < 0.7 else import_list.total // 2
+        import_list.debt = import_list.total - import_list.paid
+        import_lists.append(import_list)
+    ImportList.objects.bulk_create(import_lists)
+    ImportProduct.objects.bulk_create(import_lines)
+
+    types = ExpenseType.objects.bulk_create(ExpenseType(name=name, branch=branch) for name in EXPENSE_TYPES)
+    employees = managers + mechanics
+    Debt.objects.bulk_create(
+        Debt(supplier=rng.choice(suppliers), debt_amount=rng.randrange(1, 100) * 10000, is_debt=rng.random() < 0.4,
+             current_debt=0, created_at=moment, branch=branch)
+        for moment in _moments(rng, size.ledger, first_day, size.days))
+    Lending.objects.bulk_create(
+        Lending(client=rng.choice(clients), lending_amount=rng.randrange(1, 50) * 10000,
+                is_lending=rng.random() < 0.6, current_lending=0, created_at=moment, branch=branch)
+        for moment in _moments(rng, size.ledger, first_day, size.days))
+    Expense.objects.bulk_create(
+        Expense(description='Generated', type=rng.choice(types), amount=rng.randrange(1, 100) * 10000,
+                from_user=user, created_at=moment, branch=branch)
+        for moment in _moments(rng, size.ledger, first_day, size.days))
+    Salary.objects.bulk_create(
+        Salary(employee=rng.choice(employees), amount=rng.randrange(10, 100) * 100000, from_user=user,
+               created_at=moment, branch=branch)
+        for moment in _moments(rng, size.ledger // 4, first_day, size.days))
+
+    for supplier in suppliers:
+        supplier.debt = Decimal(rng.randrange(0, 500) * 10000)
+    Supplier.objects.bulk_update(suppliers, ['debt'])
+    for client in clients:
+        client.lending = Decimal(rng.randrange(0, 100) * 10000 if rng.random() < 0.2 else 0)
+    Client.objects.bulk_update(clients, ['lending'])
+    sell, arrival = WarehouseValuation.compute(branch)
+    WarehouseValuation.objects.update_or_create(branch=branch, defaults={'sell_total': sell, 'arrival_total': arrival})
+    return GeneratedBranch(branch, user, first_day, last_day)
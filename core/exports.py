@@ -0,0 +1,124 @@
+import csv
+from datetime import datetime, time, timedelta
+
+from django.core.exceptions import ImproperlyConfigured
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.views import APIView
+
+from core.xlsx import stream_xlsx
+from jobs.tasks import enqueue
+from jobs.views import BACKGROUND_PARAMETER, in_background, accepted
+from users.permissions import IsAdminUser
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+class _Echo:
+    """Pseudo-buffer handing back what ``csv.writer`` writes."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(header, rows, buffer_size=64 * 1024):
+    """Yields ``header`` and ``rows`` as CSV (with a BOM for Excel) in chunks of about ``buffer_size``."""
+    writer = csv.writer(_Echo())
+    buffer = ['\ufeff', writer.writerow(header)]
+    size = 0
+    for row in rows:
+        line = writer.writerow(row)
+        buffer.append(line)
+        size += len(line)
+        if size >= buffer_size:
+            yield ''.join(buffer).encode()
+            buffer, size = [], 0
+    yield ''.join(buffer).encode()
+
+
+class ExportView(APIView):
+    """
+    Streams ``columns`` (header, lookup) of ``get_queryset()`` (by default ``queryset``) as ``csv`` or
+    ``xlsx``, optionally limited to the ``start`` .. ``end`` days of ``date_field``.
+
+    Rows are read with ``values_list(...).iterator(chunk_size)``, so memory stays the same
+    whatever the size of the table.
+    """
+    permission_classes = [IsAdminUser]
+    queryset = None
+    columns = ()
+    filename = 'export'
+    date_field = 'created_at'
+    ordering = ('created_at', 'id')
+    chunk_size = 2000
+
+    def get_queryset(self):
+        if self.queryset is None:
+            raise ImproperlyConfigured(
+                f"'{type(self).__name__}' should either include a `queryset` attribute, "
+                f"or override the `get_queryset()` method.")
+        return self.queryset.all()
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(name='start', in_=openapi.IN_QUERY, description="First day (YYYY-MM-DD)",
+                              type=openapi.TYPE_STRING),
+            openapi.Parameter(name='end', in_=openapi.IN_QUERY, description="Last day (YYYY-MM-DD)",
+                              type=openapi.TYPE_STRING),
+            BACKGROUND_PARAMETER,
+        ]
+    )
+    def get(self, request, extension):
+        if extension not in CONTENT_TYPES:
+            raise NotFound(f"Unknown export format '{extension}', use csv or xlsx.")
+        if in_background(request):
+            # invalid dates are answered now rather than failing the job
+            self.filter_dates(self.get_queryset())
+            cls = type(self)
+            job = enqueue('export', branch_id=request.user.branch_id, created_by=request.user,
+                          view=f'{cls.__module__}.{cls.__qualname__}', extension=extension,
+                          params={param: value for param, value in request.query_params.items()
+                                  if param != 'background'})
+            return accepted(job, request)
+
+        response = StreamingHttpResponse(self.content(extension), content_type=CONTENT_TYPES[extension])
+        response['Content-Disposition'] = f'attachment; filename="{self.filename}.{extension}"'
+        return response
+
+    def content(self, extension):
+        """The export as chunks of bytes, for the response or for the file of an ``export`` job."""
+        queryset = self.filter_dates(self.get_queryset()).order_by(*self.ordering)
+        rows = (
+            [self.to_local(value) for value in row]
+            for row in queryset.values_list(*[lookup for _, lookup in self.columns]).iterator(
+                chunk_size=self.chunk_size)
+        )
+        header = [str(title) for title, _ in self.columns]
+        if extension == 'csv':
+            return stream_csv(header, rows)
+        return stream_xlsx(header, rows, sheet_name=self.filename)
+
+    def filter_dates(self, queryset):
+        for param, lookup, shift in (('start', 'gte', 0), ('end', 'lt', 1)):
+            value = self.request.query_params.get(param)
+            if not value:
+                continue
+            try:
+                day = datetime.strptime(value, "%Y-%m-%d").date()
+            except ValueError:
+                raise ValidationError({param: "Invalid date format, use YYYY-MM-DD."})
+            moment = timezone.make_aware(datetime.combine(day + timedelta(days=shift), time.min))
+            queryset = queryset.filter(**{f'{self.date_field}__{lookup}': moment})
+        return queryset
+
+    @staticmethod
+    def to_local(value):
+        if isinstance(value, datetime) and timezone.is_aware(value):
+            return timezone.localtime(value).replace(tzinfo=None)
+        return value
@@ -0,0 +1,207 @@
+import atexit
+import fcntl
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+HISTOGRAMS = {
+    'http_request_duration_seconds': (
+        'Time spent handling the request',
+        (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    ),
+    'http_request_sql_duration_seconds': (
+        'Time spent in SQL queries while handling the request',
+        (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+    ),
+    'http_request_sql_queries': (
+        'SQL queries run while handling the request',
+        (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000),
+    ),
+}
+COUNTERS = {
+    'catalog_cache_lookups_total': 'Branch catalog lookups, by whether the cached catalog was current',
+}
+
+
+# the series of processes that have exited, folded into one file by ``collect()``
+MERGED_FILE = 'merged.json'
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _read(path):
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def _write(path, data):
+    temporary = path.with_suffix('.tmp')
+    temporary.write_text(json.dumps(data))
+    os.replace(temporary, path)
+
+
+class Registry:
+    """
+    Histograms and counters of this process, saved to ``<METRICS_DIR>/<pid>-<random>.json`` at most every
+    ``METRICS_FLUSH_INTERVAL`` seconds and when the process exits.
+
+    ``collect()`` sums the files of every process, which is what makes the numbers add up behind a
+    multi-process server. The files of exited processes are added to ``merged.json`` and removed, so
+    the totals never go down when a worker is recycled, and the directory stays as large as the
+    number of live workers.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        # (name, labels) -> [bucket counts..., +Inf count, sum] of a histogram, [total] of a counter
+        self.series = {}
+        self.path = None
+        self.pid = os.getpid()
+        self.flushed_at = 0
+
+    def check_fork(self):
+        if self.pid != os.getpid():
+            # a forked worker starts its own file instead of counting the parent's series twice
+            self.reset()
+
+    def observe(self, labels, **values):
+        labels = tuple(sorted(labels.items()))
+        with self.lock:
+            self.check_fork()
+            for name, value in values.items():
+                buckets = HISTOGRAMS[name][1]
+                key = (name, labels)
+                series = self.series.get(key)
+                if series is None:
+                    series = self.series[key] = [0] * (len(buckets) + 2)
+                series[bisect_left(buckets, value)] += 1
+                series[-1] += value
+        if time.monotonic() - self.flushed_at >= settings.METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def count(self, name, labels, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.check_fork()
+            self.series.setdefault(key, [0])[0] += value
+        if time.monotonic() - self.flushed_at >= settings.METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            self.check_fork()
+            self.flushed_at = time.monotonic()
+            if not self.series:
+                return
+            if self.path is None:
+                directory = Path(settings.METRICS_DIR)
+                directory.mkdir(parents=True, exist_ok=True)
+                self.path = directory / f'{os.getpid()}-{uuid.uuid4().hex[:8]}.json'
+            _write(self.path, [[name, labels, series] for (name, labels), series in self.series.items()])
+
+    def collect(self):
+        """Series of every process, summed."""
+        self.flush()
+        directory = Path(settings.METRICS_DIR)
+        self.merge_exited(directory)
+        totals = {}
+        for path in directory.glob('*.json'):
+            self.add(totals, _read(path) or [])
+        return totals
+
+    def merge_exited(self, directory):
+        """Adds the files of the processes that have exited to ``merged.json`` and removes them."""
+        exited = [path for path in directory.glob('*.json')
+                  if path.name.split('-')[0].isdigit() and not _alive(int(path.name.split('-')[0]))]
+        if not exited:
+            return
+        # one scrape at a time, or two of them could both add the same file
+        with open(directory / '.merge.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            merged_path = directory / MERGED_FILE
+            totals = {}
+            self.add(totals, _read(merged_path) or [])
+            exited = [path for path in exited if path.exists()]
+            for path in exited:
+                self.add(totals, _read(path) or [])
+            _write(merged_path, [[name, labels, series] for (name, labels), series in totals.items()])
+            for path in exited:
+                path.unlink(missing_ok=True)
+
+    @staticmethod
+    def add(totals, data):
+        """Adds the series of a file to ``totals``, skipping any that no longer match their definition."""
+        for name, labels, series in data:
+            if name in HISTOGRAMS:
+                length = len(HISTOGRAMS[name][1]) + 2
+            elif name in COUNTERS:
+                length = 1
+            else:
+                continue
+            if len(series) != length:
+                continue
+            key = (name, tuple(tuple(label) for label in labels))
+            total = totals.setdefault(key, [0] * len(series))
+            for index, value in enumerate(series):
+                total[index] += value
+
+
+registry = Registry()
+atexit.register(registry.flush)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels, **extra):
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in [*labels, *extra.items()])
+
+
+def exposition(totals):
+    """The Prometheus text format (version 0.0.4) of ``totals``."""
+    by_name = defaultdict(list)
+    for (name, labels), series in sorted(totals.items()):
+        by_name[name].append((labels, series))
+    lines = []
+    for name, (description, buckets) in HISTOGRAMS.items():
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} histogram']
+        for labels, series in by_name[name]:
+            cumulative = 0
+            for bound, count in zip([*buckets, '+Inf'], series):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{_labels(labels, le=bound)}}} {cumulative}')
+            lines.append(f'{name}_sum{{{_labels(labels)}}} {series[-1]}')
+            lines.append(f'{name}_count{{{_labels(labels)}}} {cumulative}')
+    for name, description in COUNTERS.items():
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} counter']
+        lines += [f'{name}{{{_labels(labels)}}} {series[0]}' for labels, series in by_name[name]]
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """Request histograms and counters of all worker processes for ``Bearer <METRICS_TOKEN>``; nobody without it set."""
+    if not settings.METRICS_TOKEN or request.headers.get('Authorization') != f'Bearer {settings.METRICS_TOKEN}':
+        return HttpResponseForbidden()
+    return HttpResponse(exposition(registry.collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
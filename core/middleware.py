@@ -0,0 +1,110 @@
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import connections
+
+from core.metrics import registry, metrics_view
+
+
+class _QueryRecorder:
+    """``execute_wrapper`` counting the queries of a request and the time they take."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<unresolved>'
+    view = getattr(match.func, 'view_class', match.func)
+    return f'{view.__module__}.{view.__qualname__}'
+
+
+class RequestMetricsMiddleware:
+    """
+    Records the resolved view, SQL query count, SQL time and total time of every request, as a
+    ``Server-Timing`` header and as histograms served by ``/metrics`` (see ``core.metrics``).
+
+    Only queries run on the request thread are seen (under ASGI, the thread the async ORM and sync
+    views of the request use), not those of report threads. A streaming response is observed once its
+    content has been sent, its header can only tell the time to the first byte.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        recorder = _QueryRecorder()
+        with ExitStack() as stack:
+            self.record(stack, recorder)
+            response = self.get_response(request)
+        return self.finish(request, response, started, recorder)
+
+    async def __acall__(self, request):
+        # connections belong to a thread: the wrappers go on those of the thread the request's
+        # queries run in (the async ORM's), which is the same for every query of the request
+        started = time.perf_counter()
+        recorder = _QueryRecorder()
+        stack = ExitStack()
+        await sync_to_async(self.record)(stack, recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.finish(request, response, started, recorder)
+
+    @staticmethod
+    def record(stack, recorder):
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+
+    def finish(self, request, response, started, recorder):
+        if getattr(request, 'resolver_match', None) and request.resolver_match.func is metrics_view:
+            return response
+        labels = {'view': view_name(request), 'method': request.method}
+        elapsed = time.perf_counter() - started
+        response['Server-Timing'] = (f'sql;desc="{recorder.count} queries";dur={recorder.duration * 1000:.1f}, '
+                                     f'total;dur={elapsed * 1000:.1f}')
+        if response.streaming:
+            observe_streamed = self.aobserve_streamed if response.is_async else self.observe_streamed
+            response.streaming_content = observe_streamed(response.streaming_content, started, recorder, labels)
+        else:
+            self.observe(labels, started, recorder)
+        return response
+
+    def observe_streamed(self, content, started, recorder, labels):
+        with ExitStack() as stack:
+            self.record(stack, recorder)
+            yield from content
+        self.observe(labels, started, recorder)
+
+    async def aobserve_streamed(self, content, started, recorder, labels):
+        async for part in content:
+            yield part
+        self.observe(labels, started, recorder)
+
+    @staticmethod
+    def observe(labels, started, recorder):
+        registry.observe(labels,
+                         http_request_duration_seconds=time.perf_counter() - started,
+                         http_request_sql_duration_seconds=recorder.duration,
+                         http_request_sql_queries=recorder.count)
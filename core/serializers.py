@@ -0,0 +1,85 @@
+from rest_framework.serializers import ListSerializer, PrimaryKeyRelatedField, Serializer
+
+from core.catalog import RECORDS, branch_catalog
+
+
+class PrefetchedPrimaryKeyRelatedField(PrimaryKeyRelatedField):
+    def to_internal_value(self, data):
+        prefetched = getattr(self.parent, 'prefetched', {}).get(self.field_name)
+        if prefetched:
+            try:
+                instance = prefetched.get(int(data))
+            except (TypeError, ValueError):
+                instance = None
+            if instance is not None:
+                return instance
+        return super().to_internal_value(data)
+
+
+class CatalogPrimaryKeyRelatedField(PrefetchedPrimaryKeyRelatedField):
+    """
+    Resolves services and employees of the requesting user's branch (matching ``catalog_filter``)
+    from its catalog, without a query; any other key is looked up as before.
+    """
+    def __init__(self, catalog_filter=None, **kwargs):
+        self.catalog_filter = catalog_filter or {}
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        record = self.catalog_record(data)
+        if record is not None:
+            return record.instance()
+        return super().to_internal_value(data)
+
+    def catalog_record(self, data):
+        model = self.queryset.model
+        branch_id = getattr(getattr(self.context.get('request'), 'user', None), 'branch_id', None)
+        if model not in RECORDS or branch_id is None:
+            return None
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            return None
+        # looked up once for all the fields and lines of the request
+        if 'branch_catalog' not in self.context:
+            self.context['branch_catalog'] = branch_catalog(branch_id)
+        record = self.context['branch_catalog'].get(model, pk)
+        if record is None or any(getattr(record, name) != value for name, value in self.catalog_filter.items()):
+            return None
+        return record
+
+
+class PrefetchedListSerializer(ListSerializer):
+    """
+    Resolves the related primary keys of all lines, nested serializers' included, with one query
+    per field instead of one query per line.
+    """
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            prefetch(self.child, data)
+        return super().to_internal_value(data)
+
+
+def prefetch(serializer, items):
+    serializer.prefetched = {}
+    for name, field in serializer.fields.items():
+        values = []
+        for item in items:
+            try:
+                values.append(item[name])
+            except (KeyError, TypeError):
+                pass
+        if isinstance(field, Serializer):
+            prefetch(field, values)
+            continue
+        if not isinstance(field, PrimaryKeyRelatedField) or field.read_only:
+            continue
+        if isinstance(field, CatalogPrimaryKeyRelatedField):
+            values = [value for value in values if field.catalog_record(value) is None]
+        pks = set()
+        for value in values:
+            try:
+                pks.add(int(value))
+            except (TypeError, ValueError):
+                pass
+        serializer.prefetched[name] = field.get_queryset().in_bulk(pks) if pks else {}
@@ -16,6 +16,8 @@ from datetime import timedelta
 from dotenv import load_dotenv
 from django.utils.translation import gettext_lazy as _
 
+from core.database import database_from_env
+
 load_dotenv()
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -51,10 +53,12 @@ INSTALLED_APPS = [
     'users',
     'inventory',
     'services',
-    'transactions'
+    'transactions',
+    'jobs',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
@@ -90,14 +94,53 @@ WSGI_APPLICATION = 'core.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
+# SQLite unless DATABASE_URL is set, see core.database for the PostgreSQL connection settings
 
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_from_env(BASE_DIR),
 }
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Shared by every worker process so that invalidation reaches all of them; set REDIS_URL to use Redis
+
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': BASE_DIR / '.cache',
+        }
+    }
+
+# Seconds statistics of a period that is not closed yet (and current balances) stay cached
+STATISTICS_CACHE_TIMEOUT = 300
+
+# Threads the async report views (statistics) run their queries in, per process; further reports
+# wait for one, so slow reports cannot take all the connections and threads from order entry
+REPORT_WORKERS = int(os.getenv('REPORT_WORKERS', 4))
+
+# Request metrics, see core.metrics: every worker process saves its histograms to METRICS_DIR at most
+# every METRICS_FLUSH_INTERVAL seconds and /metrics sums them; it is served only with METRICS_TOKEN as a Bearer token
+METRICS_DIR = os.getenv('METRICS_DIR', BASE_DIR / '.metrics')
+METRICS_FLUSH_INTERVAL = 1
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+# Background jobs, see jobs.worker (run them with `manage.py run_jobs`): the files jobs read and
+# write (uploads, exports) go to JOBS_FILES_DIR; a failed job is retried after JOBS_RETRY_DELAY
+# seconds, doubled on every attempt; a running job whose worker has not beaten for JOBS_STALE_AFTER
+# seconds (it beats every JOBS_HEARTBEAT_INTERVAL) is given up and queued again
+JOBS_FILES_DIR = os.getenv('JOBS_FILES_DIR') or BASE_DIR / '.jobs'
+JOBS_RETRY_DELAY = 30
+JOBS_HEARTBEAT_INTERVAL = 10
+JOBS_STALE_AFTER = 120
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -140,7 +183,7 @@ JAZZMIN_SETTINGS = {
     # "site_logo_classes": "img-circle",
     "site_icon": None,
     "copyright": _("Acme Library Ltd"),
-    "search_model": ["auth.User", "auth.Group"],
+    "search_model": ["users.User"],
     "user_avatar": None,
     # "topmenu_links": [
     #     {"name": "Home",  "url": "admin:index", "permissions": ["auth.view_user"]},
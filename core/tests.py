@@ -0,0 +1,540 @@
+import csv
+import io
+import json
+import re
+import subprocess
+import tempfile
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib import admin
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+
+from branches.models import Branch
+from core.catalog import _catalogs, branch_catalog, version_key
+from core.dataset import Size, generate
+from core.exports import ExportView
+from core.metrics import MERGED_FILE, Registry
+from core.paginations import KeysetPagination
+from core.versions import bump_versions, cache_versions
+from core.xlsx import read_xlsx
+from inventory.catalog import WarehouseLookup
+from inventory.models import Car, Product, Service
+from jobs.worker import claim, requeue_stale, schedule
+from services.models import Order, OrderProduct, OrderService
+from transactions.models import Debt, Expense, ExpenseType, ImportList, ImportProduct, Lending, Salary
+from transactions.statistics import compute_daily, current_state
+from users.models import Client, Employee, Supplier, User
+
+LIST_URLS = (
+    '/service/orders/',
+    '/transaction/expenses/',
+    '/transaction/debts/',
+    '/transaction/debts/?is_debt=false',
+    '/transaction/lendings/',
+    '/transaction/salaries/',
+    '/transaction/import-lists/',
+    '/inventory/products/',
+    '/inventory/all-products/',
+    '/inventory/products-out/',
+    '/inventory/product-temps/',
+    '/inventory/cars/',
+    '/job/',
+)
+EXPORT_URLS = (
+    '/service/orders/export/csv/',
+    '/transaction/expenses/export/csv/',
+    '/transaction/debts/export/csv/',
+    '/transaction/lendings/export/csv/',
+)
+
+# (explain prefix, full scan, sort) per database vendor
+PLANS = {
+    # a virtual table "scanned" with an index (the product search's MATCH) reads only the matching rows
+    'sqlite': ('EXPLAIN QUERY PLAN ', re.compile(r'^SCAN (?!CONSTANT ROW|\S+ VIRTUAL TABLE INDEX \d+:\S)'),
+               re.compile(r'USE TEMP B-TREE FOR (RIGHT PART OF )?ORDER BY')),
+    'postgresql': ('EXPLAIN ', re.compile(r'Seq Scan on'), re.compile(r'^(->\s*)?(Incremental )?Sort\b')),
+}
+
+
+FEW = Size(clients=10, products=40, orders=10, imports=5, ledger=8, days=10)
+# more rows than a page (99 by the API, 100 by the admin) in every paginated list
+MANY = Size(clients=150, products=200, orders=250, imports=120, ledger=450, days=30)
+
+
+def project_views():
+    """``(route, view class)`` of every URL of the project's own apps answering GET, in URLconf order."""
+    roots = tuple(config.name for config in apps.get_app_configs() if config.path.startswith(str(settings.BASE_DIR)))
+
+    def walk(patterns, prefix):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                yield from walk(pattern.url_patterns, prefix + str(pattern.pattern))
+            elif isinstance(pattern, URLPattern):
+                view = getattr(pattern.callback, 'view_class', None)
+                if view and issubclass(view, APIView) and hasattr(view, 'get') and view.__module__.startswith(roots):
+                    yield prefix + str(pattern.pattern), view
+
+    return list(walk(get_resolver().url_patterns, ''))
+
+
+def fill(route, values):
+    return '/' + re.sub(r'<(?:\w+:)?(\w+)>', lambda match: str(values[match.group(1)]), route)
+
+
+def normalize(sql):
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+(\.\d+)?\b', '?', sql)
+    return re.sub(r'\((?:\?, )+\?\)', '(?...)', sql)
+
+
+def plan_data(branches, rows, days):
+    """``rows`` of every listed table for each of ``branches`` branches, spread over ``days`` days."""
+    first_day = timezone.localdate() - timedelta(days=days - 1)
+    start = timezone.make_aware(datetime.combine(first_day, datetime.min.time()))
+    dated = {model: [] for model in (Order, Expense, Debt, Lending, Salary, ImportList, Car, Product)}
+
+    for number in range(branches):
+        branch = Branch.objects.create(name=f'plan check {number}', balance=0)
+        user = User.objects.create(username=f'plan-check-{branch.id}', branch=branch)
+        # multi-table inheritance rules out bulk_create for people
+        suppliers = [Supplier.objects.create(first_name=f'check {i}', phone='0', branch=branch)
+                     for i in range(max(rows // 20, 5))]
+        clients = [Client.objects.create(first_name=f'check {i}', phone='0', branch=branch)
+                   for i in range(max(rows // 20, 5))]
+        manager = Employee.objects.create(first_name='check', phone='0', position='manager', branch=branch)
+        service = Service.objects.create(name='check', price=1000, branch=branch)
+        expense_type = ExpenseType.objects.create(name='check', branch=branch)
+
+        cars = Car.objects.bulk_create(
+            Car(name=f'check {i}', brand='check', color='white', client=clients[i % len(clients)], branch=branch)
+            for i in range(rows))
+        products = Product.objects.bulk_create(
+            Product(name=f'check {branch.id} {i}', name_key=f'check {branch.id} {i}', code=str(i), code_key=str(i),
+                    amount=i % 7, min_amount=2, arrival_price=800, sell_price=1000, is_temp=i % 5 == 0,
+                    supplier=suppliers[i % len(suppliers)], branch=branch)
+            for i in range(rows))
+        orders = Order.objects.bulk_create(
+            Order(car=cars[i], client=cars[i].client, manager=manager, total=1000, paid=1000, landing=0,
+                  overall_total=1000, product_total=500, service_total=500, branch=branch)
+            for i in range(rows))
+        OrderProduct.objects.bulk_create(
+            OrderProduct(order=order, product=products[i], total=500, net_profit=100)
+            for i, order in enumerate(orders))
+        OrderService.objects.bulk_create(
+            OrderService(order=order, service=service, total=500, part=1, mechanic=manager) for order in orders)
+        import_lists = ImportList.objects.bulk_create(
+            ImportList(total=800, paid=800, payment_type=str(i % 3), supplier=suppliers[i % len(suppliers)], branch=branch)
+            for i in range(rows))
+        ImportProduct.objects.bulk_create(
+            ImportProduct(product=products[i], amount=1, arrival_price=800, sell_price=1000, total_summ=800,
+                          import_list=import_list)
+            for i, import_list in enumerate(import_lists))
+
+        dated[Car] += cars
+        dated[Product] += products
+        dated[Order] += orders
+        dated[ImportList] += import_lists
+        dated[Expense] += Expense.objects.bulk_create(
+            Expense(description='check', type=expense_type, amount=100, from_user=user, branch=branch)
+            for _ in range(rows))
+        dated[Debt] += Debt.objects.bulk_create(
+            Debt(supplier=suppliers[i % len(suppliers)], debt_amount=100, is_debt=i % 2 == 0, current_debt=0, branch=branch)
+            for i in range(rows))
+        dated[Lending] += Lending.objects.bulk_create(
+            Lending(client=clients[i % len(clients)], lending_amount=100, is_lending=i % 2 == 0, current_lending=0, branch=branch)
+            for i in range(rows))
+        dated[Salary] += Salary.objects.bulk_create(
+            Salary(employee=manager, amount=100, from_user=user, branch=branch) for _ in range(rows))
+
+    for model, instances in dated.items():
+        pks = [instance.pk for instance in instances]
+        for offset in range(days):
+            model.objects.filter(pk__in=pks[offset::days]).update(
+                created_at=start + timedelta(days=offset, hours=offset % 12))
+    return user, first_day
+
+
+class QueryPlanTests(TestCase):
+    """
+    EXPLAINs the branch list, export, statistics, product lookup and job queue queries on generated
+    data: none of them may scan a whole table, and the paginated lists may not sort instead of
+    reading an index in order.
+    """
+    branches = 10
+    # rows per table and branch; much smaller tables make whole-table reads the cheapest plan
+    rows = 500
+    days = 90
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.first_day = plan_data(cls.branches, cls.rows, cls.days)
+        cls.last_day = cls.first_day + timedelta(days=cls.days - 1)
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+    def setUp(self):
+        if connection.vendor not in PLANS:
+            self.skipTest(f"Query plans of '{connection.vendor}' are not checked")
+        self.explain, self.full_scan, self.sort = PLANS[connection.vendor]
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('ANALYZE')
+                # a small generated table is cheaper to read whole, ask whether an index could be used
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def test_queries_read_through_indexes(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        start, end = self.first_day.isoformat(), self.last_day.isoformat()
+
+        checks = []
+        for url in LIST_URLS:
+            separator = '&' if '?' in url else '?'
+            checks.append((url, lambda url=url: client.get(url), False))
+            checks.append((f'{url} (cursor)', lambda url=url: client.get(f'{url}{separator}pagination=cursor'), False))
+        for url in EXPORT_URLS:
+            checks.append((url, lambda url=url: b''.join(
+                client.get(f'{url}?start={start}&end={end}').streaming_content), True))
+        checks.append(('compute_daily', lambda: compute_daily(self.user.branch_id, self.first_day, self.last_day), True))
+        checks.append(('current_state', lambda: current_state(self.user.branch_id), True))
+        products = list(Product.objects.filter(branch_id=self.user.branch_id)[:5])
+        checks.append(('WarehouseLookup.get', lambda: [
+            WarehouseLookup(self.user.branch_id).get(product.code, product.name) for product in products], True))
+        checks.append(('WarehouseLookup.prefetch', lambda: WarehouseLookup(self.user.branch_id).prefetch(products), True))
+        # a code prefix, a substring only the search index finds, and with a word too short for it
+        for query in ('1', 'heck', 'heck 1'):
+            checks.append((f'/inventory/products/search/?q={query}',
+                           lambda query=query: client.get('/inventory/products/search/', {'q': query}), False))
+        code = Product.objects.filter(branch_id=self.user.branch_id, is_temp=False).values_list('code', flat=True).first()
+        checks.append(('/inventory/products/code/<code>/', lambda: client.get(f'/inventory/products/code/{code}/'), True))
+        # the queue, polled by every worker
+        checks.append(('jobs.worker.claim', lambda: claim('query-plan-tests'), False))
+        checks.append(('jobs.worker.requeue_stale', requeue_stale, True))
+        checks.append(('jobs.worker.schedule', schedule, True))
+
+        seen = set()
+        for label, run, may_sort in checks:
+            with CaptureQueriesContext(connection) as queries:
+                response = run()
+            self.assertEqual(getattr(response, 'status_code', 200), 200, label)
+            for query in queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT') or sql in seen:
+                    continue
+                seen.add(sql)
+                lines = self.plan(sql)
+                with self.subTest(label, sql=sql):
+                    self.assertFalse(
+                        any(self.full_scan.search(line) or not may_sort and self.sort.search(line) for line in lines),
+                        'scans a table or sorts a paginated list:\n' + '\n'.join(lines))
+
+    def plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(self.explain + sql)
+            return [row[-1].strip() for row in cursor.fetchall()]
+
+
+class MetricsTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.enterContext(override_settings(METRICS_DIR=self.directory))
+
+    def test_token_is_required(self):
+        for token, header, status in ((None, None, 403), ('secret', None, 403), ('secret', 'Bearer nope', 403),
+                                      ('secret', 'Bearer secret', 200)):
+            with self.subTest(token=token, header=header), override_settings(METRICS_TOKEN=token):
+                headers = {'Authorization': header} if header else {}
+                self.assertEqual(self.client.get('/metrics', headers=headers).status_code, status)
+
+    def test_files_of_exited_processes_are_merged(self):
+        process = subprocess.Popen(['true'])
+        process.wait()
+        series = [['catalog_cache_lookups_total', [['result', 'hit']], [3]]]
+        for suffix in ('a', 'b'):
+            (self.directory / f'{process.pid}-{suffix}.json').write_text(json.dumps(series))
+
+        registry = Registry()
+        registry.count('catalog_cache_lookups_total', {'result': 'hit'})
+        expected = {('catalog_cache_lookups_total', (('result', 'hit'),)): [7]}
+        self.assertEqual(registry.collect(), expected)
+        self.assertEqual(registry.collect(), expected)
+        self.assertEqual(sorted(path.name for path in self.directory.glob('*.json') if path.name != MERGED_FILE),
+                         [registry.path.name])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CatalogTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.branch = Branch.objects.create(name='catalog')
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='catalog', branch=self.branch))
+
+    def version(self):
+        version, = cache_versions([version_key(self.branch.pk)])
+        return version
+
+    def managers(self):
+        response = self.client.get('/user/managers/')
+        self.assertEqual(response.status_code, 200)
+        rows = response.json()
+        return [(row['first_name'], row['commission_per']) for row in rows.get('results', rows)]
+
+    def test_saves_and_deletes_bump_the_version(self):
+        changes = (
+            ('employee created', lambda: Employee.objects.create(
+                first_name='manager', phone='0', branch=self.branch, position='manager')),
+            ('employee saved', lambda: Employee.objects.get().save()),
+            ('service created', lambda: Service.objects.create(name='oil', price=10, branch=self.branch)),
+            ('service saved', lambda: Service.objects.get().save()),
+            ('service deleted', lambda: Service.objects.get().delete()),
+            ('employee deleted', lambda: Employee.objects.get().delete()),
+        )
+        for name, change in changes:
+            with self.subTest(name):
+                version = self.version()
+                with self.captureOnCommitCallbacks(execute=True):
+                    change()
+                self.assertNotEqual(self.version(), version)
+
+    def test_balance_only_save_keeps_the_version(self):
+        employee = Employee.objects.create(first_name='manager', phone='0', branch=self.branch, position='manager')
+        catalog, version = branch_catalog(self.branch.pk), self.version()
+        employee.balance = 100
+        with self.captureOnCommitCallbacks(execute=True):
+            employee.save(update_fields=['balance'])
+        self.assertEqual(self.version(), version)
+        self.assertIs(branch_catalog(self.branch.pk), catalog)
+
+    def test_own_change_is_served_before_commit(self):
+        employee = Employee.objects.create(first_name='manager', phone='0', branch=self.branch, position='manager')
+        self.assertEqual(self.managers(), [('manager', 2)])
+        with self.captureOnCommitCallbacks(execute=False):
+            employee.commission_per = 3
+            employee.save()
+            self.assertEqual(self.managers(), [('manager', 3)])
+
+    def test_stale_records_are_not_served_after_a_bump(self):
+        employee = Employee.objects.create(first_name='manager', phone='0', branch=self.branch, position='manager')
+        self.assertEqual(self.managers(), [('manager', 2)])
+        self.assertIn(self.branch.pk, _catalogs)
+        # another process changes the rows and bumps the version; this one still holds its catalog
+        Employee.objects.filter(pk=employee.pk).update(commission_per=4)
+        Employee.objects.create(first_name='second', phone='0', branch=self.branch, position='manager')
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_versions([version_key(self.branch.pk)])
+        self.assertEqual(self.managers(), [('manager', 4), ('second', 2)])
+        self.assertEqual(branch_catalog(self.branch.pk).get(Employee, employee.pk).commission_per, 4)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        start = timezone.now()
+        # three on one instant and two on another: ties broken by id
+        for offset in (0, 0, 0, 1, 1, 2, 3):
+            branch = Branch.objects.create(name=f'branch {offset}')
+            Branch.objects.filter(pk=branch.pk).update(created_at=start + timedelta(seconds=offset))
+        self.expected = list(Branch.objects.order_by('-created_at', '-id').values_list('pk', flat=True))
+
+    def page(self, url):
+        paginator = KeysetPagination()
+        request = Request(APIRequestFactory().get(url))
+        return paginator.get_paginated_response(
+            [branch.pk for branch in paginator.paginate_queryset(Branch.objects.all(), request)]).data
+
+    def test_next_and_previous_cursors(self):
+        pages, url = [], 'http://testserver/branches/?page_size=2'
+        while url:
+            page = self.page(url)
+            pages.append(page)
+            url = page['next']
+        self.assertEqual([page['results'] for page in pages], [self.expected[i:i + 2] for i in range(0, 7, 2)])
+        self.assertIsNone(pages[0]['previous'])
+        self.assertIn('page_size=2', pages[1]['next'])
+
+        # back from the last page, the same pages in turn
+        backwards, url = [], pages[-1]['previous']
+        while url:
+            page = self.page(url)
+            backwards.append(page['results'])
+            url = page['previous']
+        self.assertEqual(backwards, [page['results'] for page in reversed(pages[:-1])])
+        self.assertEqual(self.page(pages[1]['previous'])['next'], pages[0]['next'])
+
+    def test_invalid_cursor(self):
+        for cursor in ('garbage', 'bnxub3QtYS1kYXRlfDE=', 'bnwyMDI2LTAxLTAxfHg=', 'é'):
+            with self.subTest(cursor=cursor), self.assertRaises(NotFound):
+                self.page(f'http://testserver/branches/?cursor={cursor}')
+        branch = Branch.objects.create(name='cursor')
+        client = APIClient()
+        client.force_authenticate(User.objects.create(username='cursor', branch=branch))
+        response = client.get('/transaction/expenses/', {'cursor': 'garbage'})
+        self.assertEqual((response.status_code, response.data['detail']), (404, 'Invalid cursor'))
+        self.assertEqual(client.get('/transaction/expenses/', {'pagination': 'cursor'}).data,
+                         {'next': None, 'previous': None, 'results': []})
+
+
+class ExportViewTests(TestCase):
+    def setUp(self):
+        self.branch = Branch.objects.create(name='export')
+        self.user = User.objects.create(username='export', branch=self.branch)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        expense_type = ExpenseType.objects.create(name='rent', branch=self.branch)
+        other = Branch.objects.create(name='other')
+        self.today = timezone.localdate()
+        self.expenses = []
+        for days, description, branch in ((2, 'first', self.branch), (1, 'second, "quoted"', self.branch),
+                                          (1, 'elsewhere', other), (0, 'third', self.branch)):
+            expense = Expense.objects.create(description=description, type=expense_type, amount=100 * (days + 1),
+                                             from_user=self.user, branch=branch)
+            # late in the day, so that a UTC date would be the next one
+            moment = timezone.make_aware(datetime.combine(self.today - timedelta(days=days), datetime.max.time()))
+            Expense.objects.filter(pk=expense.pk).update(created_at=moment)
+            expense.refresh_from_db()
+            self.expenses.append(expense)
+
+    def export(self, extension, **params):
+        response = self.client.get(f'/transaction/expenses/export/{extension}/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(f'filename="expenses.{extension}"', response['Content-Disposition'])
+        return b''.join(response.streaming_content)
+
+    def expected(self, *indexes):
+        return [[str(expense.pk), timezone.localtime(expense.created_at).replace(tzinfo=None).isoformat(sep=' '),
+                 'rent', expense.description, str(expense.amount), 'export']
+                for expense in (self.expenses[index] for index in indexes)]
+
+    def test_csv(self):
+        content = self.export('csv')
+        self.assertTrue(content.startswith('\ufeff'.encode()))
+        rows = list(csv.reader(io.StringIO(content.decode('utf-8-sig'))))
+        self.assertEqual(rows, [['ID', 'Created at', 'Type', 'Description', 'Amount', 'User'],
+                                *self.expected(0, 1, 3)])
+
+    def test_xlsx(self):
+        rows = list(read_xlsx(io.BytesIO(self.export('xlsx'))))
+        self.assertEqual(rows[0], ['ID', 'Created at', 'Type', 'Description', 'Amount', 'User'])
+        self.assertEqual([[str(value) for value in row] for row in rows[1:]], self.expected(0, 1, 3))
+
+    def test_date_filtering(self):
+        day = (self.today - timedelta(days=1)).isoformat()
+        for params, expected in (({'start': day}, (1, 3)), ({'end': day}, (0, 1)), ({'start': day, 'end': day}, (1,)),
+                                 ({'start': self.today.isoformat(), 'end': day}, ())):
+            with self.subTest(**params):
+                rows = list(csv.reader(io.StringIO(self.export('csv', **params).decode('utf-8-sig'))))
+                self.assertEqual(rows[1:], self.expected(*expected))
+        response = self.client.get('/transaction/expenses/export/csv/', {'start': '18.10.2026'})
+        self.assertEqual((response.status_code, list(response.data)), (400, ['start']))
+        self.assertEqual(self.client.get('/transaction/expenses/export/pdf/').status_code, 404)
+
+    def test_queryset_must_be_configured(self):
+        class UnconfiguredExportView(ExportView):
+            columns = (('ID', 'id'),)
+
+        request = APIRequestFactory().get('/export/csv/')
+        force_authenticate(request, self.user)
+        with self.assertRaisesMessage(ImproperlyConfigured, "'UnconfiguredExportView' should either include a "
+                                                            "`queryset` attribute"):
+            UnconfiguredExportView.as_view()(request, extension='csv')
+        UnconfiguredExportView.queryset = Expense.objects.filter(branch=self.branch)
+        response = UnconfiguredExportView.as_view()(request, extension='csv')
+        self.assertEqual(b''.join(response.streaming_content).decode('utf-8-sig').split(),
+                         ['ID', *(str(self.expenses[index].pk) for index in (0, 1, 3))])
+
+
+class QueryCountTests(TransactionTestCase):
+    """
+    Requests every list and detail endpoint (and admin change list) on a small and on a large branch;
+    an endpoint fails, with the repeated SQL, when its query count grows with the number of rows.
+    """
+    # the statistics reports run on connections of their own in other threads, which only see committed rows
+
+    def test_query_counts_do_not_depend_on_the_data(self):
+        self.factory = APIRequestFactory()
+        views = project_views()
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            admin_user = User.objects.create_superuser('query-counts', password=None)
+            # the same endpoints on a branch with a few rows of everything, then on one with pages of them
+            few = self.measure(views, generate(1, FEW, seed=0)[0], admin_user)
+            many = self.measure(views, generate(1, MANY, seed=1)[0], admin_user)
+
+        for label, runs in few.items():
+            runs = runs + many.get(label, [])
+            if not runs:
+                continue
+            least, most = min(runs, key=len), max(runs, key=len)
+            # a statement run once more (a prefetch or page query skipped when there is nothing to fetch) is
+            # fine; one run several times, and more often with more rows, is a query per row
+            counts = Counter(map(normalize, most))
+            grown = counts - Counter(map(normalize, least))
+            repeated = {sql: extra for sql, extra in grown.items() if counts[sql] > 1}
+            with self.subTest(label):
+                self.assertFalse(repeated, f"{len(least)} -> {len(most)} queries:\n" + "\n".join(
+                    f"+{extra} x {next(query for query in most if normalize(query) == sql)[:500]}"
+                    for sql, extra in sorted(repeated.items(), key=lambda item: -item[1])))
+
+    def measure(self, views, generated, admin_user):
+        """``{label: [queries of each request]}``; every URL is requested once beforehand to warm up."""
+        client = APIClient()
+        client.force_authenticate(generated.user)
+        day = generated.last_day
+        code = Product.objects.filter(branch=generated.branch, is_temp=False).values_list('code', flat=True).first()
+        values = {'year': day.year, 'month': day.month, 'day': day.day, 'extension': 'csv', 'code': code}
+        params = {'start': generated.first_day.isoformat(), 'end': day.isoformat()}
+
+        results = {}
+        for route, view in views:
+            objects = self.sample(view, generated.user) if '<int:pk>' in route else [None]
+            urls = [fill(route, {**values, 'pk': pk}) for pk in objects]
+            label = f"GET /{route}"
+            results[label] = [self.queries(client, url, params) for url in urls]
+
+        admin_client = APIClient()
+        admin_client.force_login(admin_user)
+        for model in admin.site._registry:
+            url = reverse(f'admin:{model._meta.app_label}_{model._meta.model_name}_changelist')
+            results[f"GET {url} (admin)"] = [self.queries(admin_client, url, {})]
+        return results
+
+    def sample(self, view, user):
+        """Primary keys of up to three objects ``view`` shows ``user``: its first, middle and last."""
+        request = self.factory.get('/')
+        force_authenticate(request, user)
+        instance = view()
+        instance.setup(instance.initialize_request(request))
+        instance.format_kwarg = None
+        pks = list(instance.get_queryset().order_by('pk').values_list('pk', flat=True))
+        return sorted({pks[index] for index in (0, len(pks) // 2, -1)}) if pks else []
+
+    def queries(self, client, url, params):
+        self.request(client, url, params)
+        cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            self.request(client, url, params)
+        return [query['sql'] for query in captured]
+
+    def request(self, client, url, params):
+        response = client.get(url, params)
+        # a request turned away (a 4xx) or failing would be measured running none of the queries
+        self.assertEqual(response.status_code, 200, f'GET {url}: {getattr(response, "data", "")}')
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
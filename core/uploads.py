@@ -0,0 +1,32 @@
+import csv
+import io
+from itertools import chain
+
+from core.xlsx import read_xlsx
+
+DELIMITERS = ',;\t'
+
+
+def read_csv(file, encoding='utf-8-sig'):
+    """
+    Yields the rows of the CSV ``file`` (bytes) as lists of strings, decoded as they are read.
+
+    The delimiter is the one of ``,``, ``;`` and tab the header line has most of: spreadsheets save
+    CSV with ``;`` wherever ``,`` is the decimal separator.
+    """
+    text = io.TextIOWrapper(file, encoding=encoding, newline='')
+    try:
+        header = text.readline()
+        delimiter = max(DELIMITERS, key=header.count)
+        yield from csv.reader(chain([header], text), delimiter=delimiter)
+    except csv.Error as error:
+        raise ValueError(f'Not a readable CSV file: {error}') from error
+    finally:
+        text.detach()
+
+
+def read_table(file):
+    """Rows of an uploaded CSV or XLSX ``file``, told apart by content rather than by name."""
+    signature = file.read(4)
+    file.seek(0)
+    return read_xlsx(file) if signature == b'PK\x03\x04' else read_csv(file)
@@ -5,6 +5,8 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf.urls.i18n import i18n_patterns, set_language
 
+from core.metrics import metrics_view
+
 
 schema_view = get_schema_view(
     openapi.Info(
@@ -29,7 +31,9 @@ urlpatterns = [
     path('inventory/', include('inventory.urls')),
     path('service/', include('services.urls')),
     path('transaction/', include('transactions.urls')),
+    path('job/', include('jobs.urls')),
     path('set_language/', set_language, name='set_language'),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 urlpatterns = [
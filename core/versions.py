@@ -0,0 +1,20 @@
+from time import time_ns
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+def cache_versions(keys):
+    """Current values of the version ``keys``; a missing (or evicted) version starts as a fresh one."""
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, time_ns(), None)
+        versions.update(cache.get_many(missing))
+    return [versions[key] for key in keys]
+
+
+def bump_versions(keys):
+    """Gives the version ``keys`` new values once the current transaction commits."""
+    transaction.on_commit(lambda: cache.set_many({key: time_ns() for key in keys}, None))
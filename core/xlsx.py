@@ -0,0 +1,228 @@
+import posixpath
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from itertools import chain
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Target="xl/workbook.xml" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+    '</Relationships>'
+)
+WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+    '</Relationships>'
+)
+SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+SHEET_END = '</sheetData></worksheet>'
+
+# The size of a worksheet, which bounds the gaps a reader fills
+MAX_ROWS, MAX_COLUMNS = 1048576, 16384
+
+# Characters XML 1.0 does not allow, even escaped
+ILLEGAL_CHARACTERS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+class _Sink:
+    """Write-only file object collecting what ``zipfile`` writes until it is drained."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def _cell(value):
+    if value is None:
+        return '<c/>'
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, Decimal)):
+        return f'<c><v>{value}</v></c>'
+    if isinstance(value, (date, datetime)):
+        value = value.isoformat(sep=' ') if isinstance(value, datetime) else value.isoformat()
+    text = escape(ILLEGAL_CHARACTERS.sub('', str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def stream_xlsx(header, rows, sheet_name='Sheet1', flush_every=500):
+    """
+    Yields an XLSX workbook with a single sheet, ``header`` first and then ``rows``.
+
+    The archive is written to a non-seekable sink (zipfile then uses data descriptors) and drained
+    every ``flush_every`` rows, so only the compressor's window is held in memory.
+    """
+    sink = _Sink()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', CONTENT_TYPES)
+        archive.writestr('_rels/.rels', ROOT_RELS)
+        archive.writestr('xl/workbook.xml', WORKBOOK.format(name=escape(sheet_name[:31], {'"': '&quot;'})))
+        archive.writestr('xl/_rels/workbook.xml.rels', WORKBOOK_RELS)
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(SHEET_START.encode())
+            for number, row in enumerate(chain([header], rows), start=1):
+                sheet.write(f'<row r="{number}">{"".join(_cell(value) for value in row)}</row>'.encode())
+                if number % flush_every == 0:
+                    yield sink.drain()
+            sheet.write(SHEET_END.encode())
+    yield sink.drain()
+
+
+def _local(tag):
+    """``tag`` without its namespace: transitional and strict workbooks name the same elements differently."""
+    return tag.rpartition('}')[2]
+
+
+def _text(element):
+    """Text of a shared or inline string, its rich text runs joined and phonetic hints left out."""
+    parts = []
+    for child in element:
+        tag = _local(child.tag)
+        if tag == 't':
+            parts.append(child.text or '')
+        elif tag == 'r':
+            parts.extend(run.text or '' for run in child if _local(run.tag) == 't')
+    return ''.join(parts)
+
+
+def _shared_strings(archive):
+    if 'xl/sharedStrings.xml' not in archive.namelist():
+        return []
+    strings = []
+    with archive.open('xl/sharedStrings.xml') as part:
+        for _, element in ElementTree.iterparse(part):
+            if _local(element.tag) == 'si':
+                strings.append(_text(element))
+                element.clear()
+    return strings
+
+
+def _first_sheet(archive):
+    """Path in the archive of the workbook's first sheet."""
+    try:
+        workbook = ElementTree.fromstring(archive.read('xl/workbook.xml'))
+        rels = ElementTree.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+    except KeyError:
+        return 'xl/worksheets/sheet1.xml'
+    sheet = next(element for element in workbook.iter() if _local(element.tag) == 'sheet')
+    rel_id = next(value for key, value in sheet.attrib.items() if _local(key) == 'id')
+    target = next(rel.get('Target') for rel in rels if rel.get('Id') == rel_id)
+    return target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join('xl', target))
+
+
+def _column(reference):
+    """Zero-based column of a cell reference such as ``AB12``."""
+    index = 0
+    for letter in reference:
+        if not letter.isalpha():
+            break
+        index = index * 26 + ord(letter.upper()) - ord('A') + 1
+    return index - 1
+
+
+def _number(text):
+    try:
+        value = Decimal(text)
+    except InvalidOperation:
+        return text
+    return int(value) if value == value.to_integral_value() else value
+
+
+def _value(cell, strings):
+    kind = cell.get('t', 'n')
+    if kind == 'inlineStr':
+        return ''.join(_text(child) for child in cell if _local(child.tag) == 'is')
+    value = next((child.text for child in cell if _local(child.tag) == 'v'), None)
+    if value is None:
+        return None
+    if kind == 's':
+        return strings[int(value)]
+    if kind == 'b':
+        return value == '1'
+    if kind in ('str', 'e', 'd'):
+        return value
+    return _number(value)
+
+
+def read_xlsx(file):
+    """
+    Yields the rows of the first sheet of the XLSX workbook ``file`` as lists of cell values: strings,
+    ``int`` or ``Decimal`` numbers, booleans and ``None`` for empty cells. Gaps are filled, with ``None``
+    cells and empty rows, so values keep the positions a spreadsheet shows them at.
+
+    The sheet is parsed with ``iterparse`` straight out of the archive and every row dropped once it
+    is yielded, so memory holds the shared strings and one row whatever the length of the sheet.
+    Raises ``ValueError`` if ``file`` is not a readable workbook.
+    """
+    try:
+        with zipfile.ZipFile(file) as archive:
+            strings = _shared_strings(archive)
+            with archive.open(_first_sheet(archive)) as sheet:
+                sheet_data, yielded = None, 0
+                for event, element in ElementTree.iterparse(sheet, events=('start', 'end')):
+                    tag = _local(element.tag)
+                    if event == 'start':
+                        if tag == 'sheetData':
+                            sheet_data = element
+                        continue
+                    if tag != 'row':
+                        continue
+                    number = int(element.get('r', yielded + 1))
+                    if not yielded < number <= MAX_ROWS:
+                        raise ValueError(f'row {number} is out of order')
+                    for _ in range(number - yielded - 1):
+                        yield []
+                    row = []
+                    for cell in element:
+                        if _local(cell.tag) != 'c':
+                            continue
+                        reference = cell.get('r')
+                        index = _column(reference) if reference else len(row)
+                        if not len(row) <= index < MAX_COLUMNS:
+                            raise ValueError(f'cell {reference} is out of order')
+                        row.extend([None] * (index - len(row)))
+                        row.append(_value(cell, strings))
+                    yield row
+                    yielded = number
+                    sheet_data.clear()
+    except (zipfile.BadZipFile, KeyError, StopIteration, IndexError, ValueError, ElementTree.ParseError) as error:
+        raise ValueError(f'Not a readable XLSX workbook: {error}') from error
@@ -1,11 +1,12 @@
 from django.contrib import admin
-from .models import Product, Service, Car
+from .models import Product, Service, Car, WarehouseValuation
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ('code', 'name', 'amount', 'unit', 'arrival_price', 'sell_price', 'min_amount', 'supplier', 'branch', 'created_at', 'updated_at')
     search_fields = ('code', 'name', 'supplier__first_name')  # Enable search by code, name, and supplier name
     list_filter = ('branch', 'created_at', 'updated_at')  # Filter by branch and dates
+    list_select_related = ('supplier', 'branch')
     ordering = ('-created_at',)  # Order by newest first
 
 
@@ -21,4 +22,18 @@ class CarAdmin(admin.ModelAdmin):
     list_display = ('name', 'brand', 'color', 'vin_code', 'state_number', 'is_sold', 'odo_mileage', 'hev_mileage', 'ev_mileage', 'client', 'branch', 'created_at')
     search_fields = ('name', 'brand', 'state_number', 'client__first_name')  # Enable search by name, brand, state number, and client name
     list_filter = ('is_sold', 'branch', 'created_at')  # Filter by sold status, branch, and creation date
+    list_select_related = ('client', 'branch')
     ordering = ('-created_at',)  # Order by newest first
+
+
+
+@admin.register(WarehouseValuation)
+class WarehouseValuationAdmin(admin.ModelAdmin):
+    list_display = ('branch', 'sell_total', 'arrival_total', 'updated_at')
+    list_select_related = ('branch',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,54 @@
+from .models import Product, lookup_key
+
+
+class WarehouseLookup:
+    """
+    Warehouse products of one branch by code and by name, for the lines of an import batch.
+
+    Every product is resolved with an indexed point lookup, or with two queries for the whole batch
+    after ``prefetch()``, and remembered (including a miss, and products created along the way) so
+    lines repeating a product are not looked up again. Meant to live for one batch only.
+    """
+
+    def __init__(self, branch_id):
+        self.branch_id = branch_id
+        self.by_code = {}
+        self.by_name = {}
+
+    def prefetch(self, products):
+        """Resolves the codes and names of ``products``, with a query for each."""
+        codes = {lookup_key(product.code) for product in products} - {None} - self.by_code.keys()
+        names = {lookup_key(product.name) for product in products} - {None} - self.by_name.keys()
+        self.by_code.update(dict.fromkeys(codes))
+        self.by_name.update(dict.fromkeys(names))
+        # separately rather than OR-ed, so both read their unique index
+        for field, keys in (('code_key', codes), ('name_key', names)):
+            if keys:
+                found = Product.objects.filter(branch_id=self.branch_id, is_temp=False, **{f'{field}__in': keys})
+                for product in found:
+                    self.add(product)
+
+    def get(self, code, name):
+        """The warehouse product with ``code``, or else named ``name``; ``None`` if there is neither."""
+        code, name = lookup_key(code), lookup_key(name)
+        if code is not None:
+            if code not in self.by_code:
+                self.by_code[code] = self._find(code_key=code)
+            if self.by_code[code] is not None:
+                return self.by_code[code]
+        if name is None:
+            return None
+        if name not in self.by_name:
+            self.by_name[name] = self._find(name_key=name)
+        return self.by_name[name]
+
+    def add(self, product):
+        if product.code_key:
+            self.by_code[product.code_key] = product
+        self.by_name[product.name_key] = product
+
+    def _find(self, **key):
+        try:
+            return Product.objects.get(branch_id=self.branch_id, is_temp=False, **key)
+        except Product.DoesNotExist:
+            return None
@@ -0,0 +1,17 @@
+from django.db import transaction
+
+from jobs.tasks import task
+from .models import WarehouseValuation
+
+
+@task('inventory.revalue_warehouse')
+def revalue_warehouse(job):
+    """Recomputes the warehouse valuation of the job's branch from its products, as ``rebuild_warehouse_valuation``."""
+    with transaction.atomic():
+        sell, arrival = WarehouseValuation.compute(job.branch_id)
+        valuation, _ = WarehouseValuation.objects.select_for_update().get_or_create(branch_id=job.branch_id)
+        stored = {'sell_total': valuation.sell_total, 'arrival_total': valuation.arrival_total}
+        valuation.sell_total = sell
+        valuation.arrival_total = arrival
+        valuation.save()
+    return {'stored': stored, 'sell_total': sell, 'arrival_total': arrival}
@@ -0,0 +1,43 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from branches.models import Branch
+from inventory.models import WarehouseValuation
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-branch warehouse valuation from the products table and report any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--branch', type=int, action='append', help='Only rebuild these branch ids')
+        parser.add_argument('--check', action='store_true', help='Only verify, exit with an error on drift')
+        parser.add_argument('--tolerance', type=Decimal, default=Decimal('0.01'))
+
+    def handle(self, *args, **options):
+        branches = Branch.objects.order_by('id')
+        if options['branch']:
+            branches = branches.filter(id__in=options['branch'])
+
+        drifted = 0
+        for branch in branches:
+            with transaction.atomic():
+                sell, arrival = WarehouseValuation.compute(branch)
+                valuation, created = WarehouseValuation.objects.select_for_update().get_or_create(branch=branch)
+                sell_drift = sell - valuation.sell_total
+                arrival_drift = arrival - valuation.arrival_total
+                if created or abs(sell_drift) > options['tolerance'] or abs(arrival_drift) > options['tolerance']:
+                    drifted += 1
+                    self.stdout.write(self.style.WARNING(
+                        f"{branch.name} (#{branch.id}): stored sell={valuation.sell_total} arrival={valuation.arrival_total}, "
+                        f"actual sell={sell} arrival={arrival}"))
+                if not options['check']:
+                    valuation.sell_total = sell
+                    valuation.arrival_total = arrival
+                    valuation.save()
+
+        if options['check'] and drifted:
+            raise CommandError(f"Warehouse valuation drifted for {drifted} branch(es)")
+        self.stdout.write(self.style.SUCCESS(
+            f"Warehouse valuation {'verified' if options['check'] else 'rebuilt'}, {drifted} branch(es) drifted"))
@@ -0,0 +1,44 @@
+# Generated by Django 5.0.7 on 2026-10-18 07:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum, F, DecimalField
+
+
+def fill_valuations(apps, schema_editor):
+    Branch = apps.get_model('branches', 'Branch')
+    Product = apps.get_model('inventory', 'Product')
+    WarehouseValuation = apps.get_model('inventory', 'WarehouseValuation')
+    for branch in Branch.objects.all():
+        totals = Product.objects.filter(branch=branch, is_temp=False, amount__gt=0).aggregate(
+            sell=Sum(F("amount") * F("sell_price"), output_field=DecimalField()),
+            arrival=Sum(F("amount") * F("arrival_price"), output_field=DecimalField()),
+        )
+        WarehouseValuation.objects.create(branch=branch, sell_total=totals["sell"] or 0,
+                                          arrival_total=totals["arrival"] or 0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('branches', '0005_alter_branch_balance_alter_wallet_balance'),
+        ('inventory', '0015_alter_product_amount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WarehouseValuation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sell_total', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='Warehouse sell price total')),
+                ('arrival_total', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='Warehouse arrival price total')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated at')),
+                ('branch', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='warehouse_valuation', to='branches.branch', verbose_name='Branch')),
+            ],
+            options={
+                'verbose_name': 'Warehouse valuation',
+                'verbose_name_plural': 'Warehouse valuations',
+            },
+        ),
+        migrations.RunPython(fill_valuations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('branches', '0006_walletmovement'),
+        ('inventory', '0016_warehousevaluation'),
+        ('users', '0011_alter_usertemp_last_name'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(fields=['branch', 'created_at', 'id'], name='car_branch_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_temp', False)), fields=['branch', 'created_at', 'id'], name='product_warehouse_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_temp', True)), fields=['branch', 'created_at', 'id'], name='product_temp_idx'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.0.7 on 2026-10-18 09:02
+
+from django.db import migrations, models
+
+
+def lookup_key(value):
+    if value is None:
+        return None
+    return ' '.join(str(value).split()).casefold() or None
+
+
+def fill_lookup_keys(apps, schema_editor):
+    """
+    Newest first: the newest of several products of a branch with the same key is the one imports
+    picked until now, it keeps the keys. Older namesakes get their id appended to the name key, older
+    warehouse products with the same code no code key, so the unique constraints can be added without touching any product's data.
+    """
+    Product = apps.get_model('inventory', 'Product')
+    names, codes, batch = set(), set(), []
+    products = Product.objects.order_by('-pk').only('pk', 'name', 'code', 'is_temp', 'branch_id')
+    for product in products.iterator():
+        scope = (product.branch_id, product.is_temp)
+        product.name_key, product.code_key = lookup_key(product.name) or '', lookup_key(product.code)
+        if (scope, product.name_key) in names:
+            product.name_key = f'{product.name_key}#{product.pk}'
+        names.add((scope, product.name_key))
+        if not product.is_temp and (scope, product.code_key) in codes:
+            product.code_key = None
+        codes.add((scope, product.code_key))
+        batch.append(product)
+        if len(batch) == 1000:
+            Product.objects.bulk_update(batch, ['name_key', 'code_key'])
+            batch = []
+    Product.objects.bulk_update(batch, ['name_key', 'code_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0017_car_car_branch_created_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='name_key',
+            field=models.CharField(default='', editable=False, max_length=785, verbose_name='Name key'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='code_key',
+            field=models.CharField(editable=False, max_length=60, null=True, verbose_name='Code key'),
+        ),
+        migrations.RunPython(fill_lookup_keys, migrations.RunPython.noop),
+    ]
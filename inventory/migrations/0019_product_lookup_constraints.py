@@ -0,0 +1,26 @@
+# Generated by Django 5.0.7 on 2026-10-18 09:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('branches', '0006_walletmovement'),
+        ('inventory', '0018_product_lookup_keys'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='product',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_temp', False)), fields=('branch', 'name_key'), name='product_warehouse_name_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='product',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_temp', False)), fields=('branch', 'code_key'), name='product_warehouse_code_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='product',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_temp', True)), fields=('branch', 'name_key'), name='product_temp_name_uniq'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.0.7 on 2026-10-18 14:05
+
+from django.db import migrations
+
+# the schema as of this migration; inventory.search keeps the live copy, which restore_triggers installs again
+SQLITE_SCHEMA = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS inventory_product_search USING fts5("
+    "name_key, code_key, content='inventory_product', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS inventory_product_search_insert AFTER INSERT ON inventory_product BEGIN "
+    "INSERT INTO inventory_product_search(rowid, name_key, code_key) VALUES (new.id, new.name_key, new.code_key); END",
+    "CREATE TRIGGER IF NOT EXISTS inventory_product_search_delete AFTER DELETE ON inventory_product BEGIN "
+    "INSERT INTO inventory_product_search(inventory_product_search, rowid, name_key, code_key) "
+    "VALUES ('delete', old.id, old.name_key, old.code_key); END",
+    "CREATE TRIGGER IF NOT EXISTS inventory_product_search_update AFTER UPDATE OF name_key, code_key "
+    "ON inventory_product BEGIN "
+    "INSERT INTO inventory_product_search(inventory_product_search, rowid, name_key, code_key) "
+    "VALUES ('delete', old.id, old.name_key, old.code_key); "
+    "INSERT INTO inventory_product_search(rowid, name_key, code_key) VALUES (new.id, new.name_key, new.code_key); END",
+    "INSERT INTO inventory_product_search(inventory_product_search) VALUES ('rebuild')",
+]
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS inventory_product_search_insert",
+    "DROP TRIGGER IF EXISTS inventory_product_search_delete",
+    "DROP TRIGGER IF EXISTS inventory_product_search_update",
+    "DROP TABLE IF EXISTS inventory_product_search",
+]
+POSTGRES_SCHEMA = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS product_name_trgm_idx ON inventory_product USING gin (name_key gin_trgm_ops) "
+    "WHERE NOT is_temp",
+    "CREATE INDEX IF NOT EXISTS product_code_trgm_idx ON inventory_product USING gin (code_key gin_trgm_ops) "
+    "WHERE NOT is_temp",
+]
+POSTGRES_DROP = ["DROP INDEX IF EXISTS product_name_trgm_idx", "DROP INDEX IF EXISTS product_code_trgm_idx"]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        for sql in statements.get(schema_editor.connection.vendor, ()):
+            schema_editor.execute(sql)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0019_product_lookup_constraints'),
+    ]
+
+    operations = [
+        migrations.RunPython(run({'sqlite': SQLITE_SCHEMA, 'postgresql': POSTGRES_SCHEMA}),
+                             run({'sqlite': SQLITE_DROP, 'postgresql': POSTGRES_DROP})),
+    ]
@@ -1,13 +1,30 @@
+from decimal import Decimal
+
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.template.defaultfilters import default
 from django.utils.translation import gettext_lazy as _
 from django.db import models, transaction
+from django.db.models import Sum, F, DecimalField
 from rest_framework.exceptions import ValidationError
 
 from branches.models import Branch
+from core.balances import increment
 from users.models import Supplier, Client
 
 
+def lookup_key(value):
+    """``value`` as products are looked up by: case-insensitive, with runs of whitespace made one space."""
+    if value is None:
+        return None
+    return ' '.join(str(value).split()).casefold() or None
+
+
+# casefold() makes a character up to three (ß -> ss, ﬄ -> ffl), so the keys have room for three times
+# their field; the name key also for the ``#<id>`` that migration 0018 gave namesakes found then
+KEY_GROWTH = 3
+NAME_KEY_SUFFIX_LENGTH = 20
+
+
 class Product(models.Model):
     code = models.CharField(max_length=20, blank=True, null=True, verbose_name=_('Code'))
     name = models.CharField(max_length=255, verbose_name=_('Name'))
@@ -17,6 +34,9 @@ class Product(models.Model):
     sell_price = models.DecimalField(max_digits=15, decimal_places=0, null=True, blank=True, verbose_name=_('Export price'))
     min_amount = models.FloatField(default=0, verbose_name=_('Min amount'))
     is_temp = models.BooleanField(default=True, null=True)
+    name_key = models.CharField(max_length=255 * KEY_GROWTH + NAME_KEY_SUFFIX_LENGTH, editable=False,
+                                verbose_name=_('Name key'))
+    code_key = models.CharField(max_length=20 * KEY_GROWTH, null=True, editable=False, verbose_name=_('Code key'))
 
     supplier = models.ForeignKey(Supplier, on_delete=models.SET_NULL, null=True, blank=True, verbose_name=_('Supplier'))
     branch = models.ForeignKey(Branch, on_delete=models.CASCADE, verbose_name=_('Branch'))
@@ -26,17 +46,152 @@ class Product(models.Model):
     class Meta:
         verbose_name = _('Product')
         verbose_name_plural = _('Products')
+        indexes = [
+            # warehouse lists (in stock, out of stock, all) and temporary products, newest first
+            models.Index(fields=['branch', 'created_at', 'id'], condition=models.Q(is_temp=False),
+                         name='product_warehouse_idx'),
+            models.Index(fields=['branch', 'created_at', 'id'], condition=models.Q(is_temp=True),
+                         name='product_temp_idx'),
+        ]
+        constraints = [
+            # the indexes imports and searches resolve a product of a branch with
+            models.UniqueConstraint(fields=['branch', 'name_key'], condition=models.Q(is_temp=False),
+                                    name='product_warehouse_name_uniq'),
+            models.UniqueConstraint(fields=['branch', 'code_key'], condition=models.Q(is_temp=False),
+                                    name='product_warehouse_code_uniq'),
+            models.UniqueConstraint(fields=['branch', 'name_key'], condition=models.Q(is_temp=True),
+                                    name='product_temp_name_uniq'),
+        ]
 
     def __str__(self):
         return self.name
 
-    def save(self, *args, **kwargs):
+    VALUATION_FIELDS = {'amount', 'sell_price', 'arrival_price', 'is_temp', 'branch_id'}
+    KEY_FIELDS = {'name', 'code', 'is_temp', 'branch'}
+
+    def _stored(self):
+        """The stored row (its valuation fields), locked until the transaction ends; ``None`` for a new one."""
+        if self._state.adding:
+            return None
+        return Product.objects.select_for_update().filter(pk=self.pk).only(*self.VALUATION_FIELDS).first()
+
+    def valuation(self, amount=None):
+        """Returns the (branch_id, sell, arrival) value this product adds to its branch warehouse."""
+        amount = self.amount if amount is None else amount
+        if self.is_temp or not amount or amount <= 0:
+            return self.branch_id, Decimal(0), Decimal(0)
+        return (self.branch_id,
+                Decimal(amount) * (self.sell_price or 0),
+                Decimal(amount) * (self.arrival_price or 0))
+
+    def change_amount(self, delta, minimum=None):
+        """Atomically adds ``delta`` to the stock; returns False if it would drop below ``minimum``."""
         with transaction.atomic():
+            if not increment(self, minimum=minimum, amount=delta):
+                return False
+            if not self.is_temp and delta < 0 and minimum is not None and minimum >= 0:
+                # the stock was above zero and still is, so its value moves by the delta
+                WarehouseValuation.apply_delta(self.branch_id,
+                                               Decimal(delta) * (self.sell_price or 0),
+                                               Decimal(delta) * (self.arrival_price or 0))
+            elif not self.is_temp:
+                # otherwise it may have been or become negative, which is worth nothing: read it back
+                self.amount = Product.objects.filter(pk=self.pk).values_list('amount', flat=True).get()
+                WarehouseValuation.apply_changes([(self.valuation(self.amount - delta), self.valuation())])
+            return True
+
+    def _check_keys(self):
+        self.name_key, self.code_key = lookup_key(self.name) or '', lookup_key(self.code)
+        others = Product.objects.filter(branch_id=self.branch_id, is_temp=self.is_temp).exclude(pk=self.pk)
+        if others.filter(name_key=self.name_key).exists():
             if self.is_temp:
-                instances = Product.objects.filter(name=self.name, is_temp=True)
-                if instances:
-                    raise ValidationError({'detail': "You cannot create two temp product with same name"})
+                raise ValidationError({'detail': "You cannot create two temp product with same name"})
+            raise ValidationError({'detail': "A product with this name is already in the warehouse"})
+        if not self.is_temp and self.code_key and others.filter(code_key=self.code_key).exists():
+            raise ValidationError({'detail': "A product with this code is already in the warehouse"})
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None or self.KEY_FIELDS & set(update_fields):
+                self._check_keys()
+                if update_fields is not None:
+                    kwargs['update_fields'] = {*update_fields, 'name_key', 'code_key'}
+            # moved from what is stored, which may not be what this instance read
+            stored = self._stored()
             super().save(*args, **kwargs)
+            # the stock another write changed stays as it is unless it was saved too
+            amount = stored.amount if stored and update_fields is not None and 'amount' not in update_fields else None
+            WarehouseValuation.apply_changes([(stored and stored.valuation(), self.valuation(amount))])
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            stored = self._stored()
+            result = super().delete(*args, **kwargs)
+            WarehouseValuation.apply_changes([(stored and stored.valuation(), None)])
+            return result
+
+
+class WarehouseValuation(models.Model):
+    branch = models.OneToOneField(Branch, on_delete=models.CASCADE, related_name='warehouse_valuation',
+                                  verbose_name=_('Branch'))
+    sell_total = models.DecimalField(max_digits=20, decimal_places=2, default=0,
+                                     verbose_name=_('Warehouse sell price total'))
+    arrival_total = models.DecimalField(max_digits=20, decimal_places=2, default=0,
+                                        verbose_name=_('Warehouse arrival price total'))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_('Updated at'))
+
+    class Meta:
+        verbose_name = _('Warehouse valuation')
+        verbose_name_plural = _('Warehouse valuations')
+
+    def __str__(self):
+        return f"{self.branch} - {self.sell_total}"
+
+    @classmethod
+    def totals(cls, branch):
+        """Current (sell, arrival) value of the branch warehouse."""
+        valuation = cls.objects.filter(branch=branch).values_list('sell_total', 'arrival_total').first()
+        return valuation if valuation else (Decimal(0), Decimal(0))
+
+    @classmethod
+    def compute(cls, branch):
+        """Recomputes the (sell, arrival) value of the branch warehouse from the products table."""
+        totals = Product.objects.filter(branch=branch, is_temp=False, amount__gt=0).aggregate(
+            sell=Sum(F("amount") * F("sell_price"), output_field=DecimalField()),
+            arrival=Sum(F("amount") * F("arrival_price"), output_field=DecimalField()),
+        )
+        return totals["sell"] or Decimal(0), totals["arrival"] or Decimal(0)
+
+    @classmethod
+    def apply_delta(cls, branch_id, sell_delta, arrival_delta):
+        if not sell_delta and not arrival_delta:
+            return
+        updated = cls.objects.filter(branch_id=branch_id).update(
+            sell_total=F('sell_total') + sell_delta,
+            arrival_total=F('arrival_total') + arrival_delta,
+        )
+        if not updated:
+            sell, arrival = cls.compute(branch_id)
+            cls.objects.get_or_create(branch_id=branch_id,
+                                      defaults={'sell_total': sell, 'arrival_total': arrival})
+
+    @classmethod
+    def apply_changes(cls, changes):
+        """
+        Moves product contributions from ``old`` to ``new`` for every ``(old, new)`` pair of
+        ``Product.valuation()`` tuples, with one UPDATE per affected branch.
+        """
+        deltas = {}
+        for old, new in changes:
+            for valuation, sign in ((old, -1), (new, 1)):
+                if valuation is None:
+                    continue
+                branch_id, sell, arrival = valuation
+                sell_delta, arrival_delta = deltas.get(branch_id, (0, 0))
+                deltas[branch_id] = (sell_delta + sign * sell, arrival_delta + sign * arrival)
+        for branch_id, (sell_delta, arrival_delta) in deltas.items():
+            cls.apply_delta(branch_id, sell_delta, arrival_delta)
 
 
 class Service(models.Model):
@@ -73,6 +228,9 @@ class Car(models.Model):
     class Meta:
         verbose_name = _('Car')
         verbose_name_plural = _('Cars')
+        indexes = [
+            models.Index(fields=['branch', 'created_at', 'id'], name='car_branch_created_idx'),
+        ]
 
     def __str__(self):
         return self.name
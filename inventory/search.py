@@ -0,0 +1,169 @@
+from functools import partial
+
+from django.db import connections
+from django.db.models import F, Q
+
+from .models import Product, lookup_key
+
+# SQLite: an FTS5 index of the product keys by trigram, which answers substring matches of 3+ characters
+# from the index. It reads the keys from the product table (external content) and triggers keep it in step
+# with every write, ``bulk_create`` and ``update()`` included; the UPDATE one fires only when a key changes,
+# not on the stock and price updates of every sale and import.
+SQLITE_TABLE = 'inventory_product_search'
+SQLITE_SCHEMA = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_TABLE} USING fts5("
+    f"name_key, code_key, content='inventory_product', content_rowid='id', tokenize='trigram')",
+    f"CREATE TRIGGER IF NOT EXISTS {SQLITE_TABLE}_insert AFTER INSERT ON inventory_product BEGIN "
+    f"INSERT INTO {SQLITE_TABLE}(rowid, name_key, code_key) VALUES (new.id, new.name_key, new.code_key); END",
+    f"CREATE TRIGGER IF NOT EXISTS {SQLITE_TABLE}_delete AFTER DELETE ON inventory_product BEGIN "
+    f"INSERT INTO {SQLITE_TABLE}({SQLITE_TABLE}, rowid, name_key, code_key) "
+    f"VALUES ('delete', old.id, old.name_key, old.code_key); END",
+    f"CREATE TRIGGER IF NOT EXISTS {SQLITE_TABLE}_update AFTER UPDATE OF name_key, code_key ON inventory_product BEGIN "
+    f"INSERT INTO {SQLITE_TABLE}({SQLITE_TABLE}, rowid, name_key, code_key) "
+    f"VALUES ('delete', old.id, old.name_key, old.code_key); "
+    f"INSERT INTO {SQLITE_TABLE}(rowid, name_key, code_key) VALUES (new.id, new.name_key, new.code_key); END",
+]
+SQLITE_TRIGGERS = [f'{SQLITE_TABLE}_{event}' for event in ('insert', 'delete', 'update')]
+
+# PostgreSQL: trigram GIN indexes, which serve both LIKE '%...%' and the similarity operator ``%``
+POSTGRES_SCHEMA = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS product_name_trgm_idx ON inventory_product USING gin (name_key gin_trgm_ops) "
+    "WHERE NOT is_temp",
+    "CREATE INDEX IF NOT EXISTS product_code_trgm_idx ON inventory_product USING gin (code_key gin_trgm_ops) "
+    "WHERE NOT is_temp",
+]
+POSTGRES_DROP = ["DROP INDEX IF EXISTS product_name_trgm_idx", "DROP INDEX IF EXISTS product_code_trgm_idx"]
+
+# trigram indexes only know words of three characters or more
+MIN_INDEXED_LENGTH = 3
+
+
+def install(connection):
+    """Creates the search index of ``connection``'s backend, filled with the products there are."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            for sql in SQLITE_SCHEMA:
+                cursor.execute(sql)
+            cursor.execute(f"INSERT INTO {SQLITE_TABLE}({SQLITE_TABLE}) VALUES ('rebuild')")
+        elif connection.vendor == 'postgresql':
+            for sql in POSTGRES_SCHEMA:
+                cursor.execute(sql)
+
+
+def uninstall(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            for name in SQLITE_TRIGGERS:
+                cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+            cursor.execute(f'DROP TABLE IF EXISTS {SQLITE_TABLE}')
+        elif connection.vendor == 'postgresql':
+            for sql in POSTGRES_DROP:
+                cursor.execute(sql)
+
+
+def restore_triggers(using='default', **kwargs):
+    """
+    Puts back (and refills the index behind) the SQLite triggers a migration dropped.
+
+    SQLite alters a table by copying it into a new one, which leaves the triggers of the old table
+    behind; connected to ``post_migrate``, so a later migration of ``Product`` cannot stop the sync.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        names = {row[0] for row in cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name LIKE %s", [f'{SQLITE_TABLE}%'])}
+    if SQLITE_TABLE in names and not names.issuperset(SQLITE_TRIGGERS):
+        install(connection)
+
+
+def _warehouse(branch_id):
+    return Product.objects.filter(branch_id=branch_id, is_temp=False)
+
+
+def _starting(field, branch_id, key, limit):
+    """
+    Products whose ``field`` starts with ``key``. On SQLite, whose text compares by code point, that is
+    read as a range of its unique index rather than with a LIKE; a collation elsewhere (PostgreSQL's
+    locale one) may sort other strings into the range, so there it is a ``startswith``.
+    """
+    if len(key) > Product._meta.get_field(field).max_length:
+        return []
+    products = _warehouse(branch_id)
+    if connections[products.db].vendor == 'sqlite':
+        end = key[:-1] + chr(ord(key[-1]) + 1)
+        products = products.filter(**{f'{field}__gte': key, f'{field}__lt': end})
+    else:
+        products = products.filter(**{f'{field}__startswith': key})
+    return products.order_by(field)[:limit]
+
+
+def _contains(products, words):
+    for word in words:
+        products = products.filter(Q(name_key__contains=word) | Q(code_key__contains=word))
+    return products
+
+
+def _like(word):
+    return '%{}%'.format(word.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_'))
+
+
+def _sqlite_matches(branch_id, key, limit):
+    words = key.split()
+    indexed = [word for word in words if len(word) >= MIN_INDEXED_LENGTH]
+    if not indexed:
+        return []
+    # the index drives the join, so reading stops at ``limit`` products of the branch instead of
+    # collecting every match of every branch first, as ``id IN (SELECT rowid ...)`` would
+    sql = (f'SELECT product.* FROM {SQLITE_TABLE} JOIN {Product._meta.db_table} product '
+           f'ON product.id = {SQLITE_TABLE}.rowid WHERE {SQLITE_TABLE} MATCH %s '
+           f'AND product.branch_id = %s AND NOT product.is_temp')
+    params = [' AND '.join('"{}"'.format(word.replace('"', '""')) for word in indexed), branch_id]
+    for word in words:
+        if word not in indexed:
+            sql += " AND (product.name_key LIKE %s ESCAPE '\\' OR product.code_key LIKE %s ESCAPE '\\')"
+            params += [_like(word)] * 2
+    return Product.objects.raw(sql + ' LIMIT %s', params + [limit])
+
+
+def _postgres_matches(branch_id, key, limit):
+    # the driver the lookups import is there whenever the database is PostgreSQL
+    from django.contrib.postgres.lookups import TrigramSimilar
+    from django.contrib.postgres.search import TrigramSimilarity
+
+    # every word in the name or code, or a name close enough to the query to be a typo of it
+    matches = _warehouse(branch_id).filter(
+        Q(*(Q(name_key__contains=word) | Q(code_key__contains=word) for word in key.split()))
+        | Q(TrigramSimilar(F('name_key'), key))
+    )
+    return matches.annotate(similarity=TrigramSimilarity('name_key', key)).order_by('-similarity')[:limit]
+
+
+def _other_matches(branch_id, key, limit):
+    return _contains(_warehouse(branch_id), key.split()).order_by('name_key')[:limit]
+
+
+MATCHES = {'sqlite': _sqlite_matches, 'postgresql': _postgres_matches}
+
+
+def search_products(branch_id, query, limit=20):
+    """
+    Up to ``limit`` warehouse products of the branch matching ``query``, best first: codes starting
+    with it (the exact one first), names starting with it, then names and codes containing every
+    word of it in any order, from the search index of the database; on PostgreSQL also names a typo
+    away from it.
+    """
+    key = lookup_key(query)
+    if not key:
+        return []
+    matches = MATCHES.get(connections[Product.objects.db].vendor, _other_matches)
+    found = {}
+    for step in (partial(_starting, 'code_key'), partial(_starting, 'name_key'), matches):
+        if len(found) >= limit:
+            break
+        # as many more as were found already, in case the step finds those again
+        for product in step(branch_id, key, limit + len(found)):
+            found.setdefault(product.pk, product)
+    return list(found.values())[:limit]
@@ -1,6 +1,7 @@
 from rest_framework.serializers import ModelSerializer, ValidationError
 from .models import Product, Service, Car
-from rest_framework import serializers
+
+from core.serializers import PrefetchedPrimaryKeyRelatedField
 
 
 class ProductSerializer(ModelSerializer):
@@ -29,7 +30,7 @@ class ProductImportDetailSerializer(ModelSerializer):
         fields = ['id', 'code', 'name', 'amount', 'unit', 'arrival_price']
 
 class ProductImportNameSerializer(ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(queryset=Product.objects.all())
+    id = PrefetchedPrimaryKeyRelatedField(queryset=Product.objects.all())
     class Meta:
         model = Product
         fields = ['id', 'name']
@@ -1,3 +1,218 @@
-from django.test import TestCase
+from importlib import import_module
+from types import SimpleNamespace
+from unittest import skipUnless
 
-# Create your tests here.
+from django.apps import apps
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+from branches.models import Branch, Wallet
+from inventory.models import Car, Product, WarehouseValuation
+from inventory.search import SQLITE_TABLE, SQLITE_TRIGGERS, restore_triggers, search_products
+from services.models import OrderProduct
+from services.serializers import OrderPostSerializer
+from transactions.models import ImportProduct
+from transactions.serializers import ImportListSerializer
+from users.models import Client, Employee, Supplier, User
+
+fill_lookup_keys = import_module('inventory.migrations.0018_product_lookup_keys').fill_lookup_keys
+
+
+class WarehouseValuationTests(TestCase):
+    """Every write to the products keeps the branch's valuation row equal to ``WarehouseValuation.compute``."""
+
+    def setUp(self):
+        self.branch = Branch.objects.create(name='valuation')
+        self.user = User.objects.create(username='valuation', branch=self.branch)
+        Wallet.objects.create(name='wallet', balance=10 ** 6)
+        self.oil = Product.objects.create(name='oil', code='OIL', amount=10, arrival_price=1500, sell_price=2100,
+                                          is_temp=False, branch=self.branch)
+        self.pad = Product.objects.create(name='pad', amount=4, arrival_price=300, sell_price=450, is_temp=False,
+                                          branch=self.branch)
+
+    def assertValuation(self):
+        self.assertEqual(WarehouseValuation.totals(self.branch), WarehouseValuation.compute(self.branch))
+
+    def test_save_and_delete(self):
+        self.assertValuation()
+        temp = Product.objects.create(name='temp', amount=3, arrival_price=10, sell_price=20, is_temp=True,
+                                      branch=self.branch)
+        self.assertValuation()
+        for changes in ({'sell_price': 2500}, {'amount': 12.5}, {'arrival_price': 1400, 'amount': 0},
+                        {'amount': -2}, {'amount': 6}, {'is_temp': True}, {'is_temp': False}):
+            with self.subTest(**changes):
+                for field, value in changes.items():
+                    setattr(self.oil, field, value)
+                self.oil.save()
+                self.assertValuation()
+        # a stale instance: the row is moved from what is stored, not from what was read
+        stale = Product.objects.get(pk=self.pad.pk)
+        Product.objects.get(pk=self.pad.pk).change_amount(5)
+        stale.sell_price = 500
+        stale.save()
+        self.assertValuation()
+        temp.is_temp = False
+        temp.save()
+        self.assertValuation()
+        for product in (self.oil, self.pad, temp):
+            product.delete()
+            self.assertValuation()
+        self.assertEqual(WarehouseValuation.totals(self.branch), (0, 0))
+
+    def test_change_amount(self):
+        for delta, minimum in ((-4, 0), (3, None), (-5, 0), (-20, None), (4, None), (30, None), (-30.5, None)):
+            with self.subTest(delta=delta, minimum=minimum):
+                self.oil.change_amount(delta, minimum=minimum)
+                self.assertValuation()
+        self.assertFalse(self.pad.change_amount(-5, minimum=0))
+        self.assertValuation()
+
+    def test_orders_and_imports(self):
+        client = Client.objects.create(first_name='valuation', phone='0', branch=self.branch)
+        car = Car.objects.create(name='car', brand='brand', color='white', client=client, branch=self.branch)
+        manager = Employee.objects.create(first_name='manager', phone='0', position='manager', branch=self.branch)
+        serializer = OrderPostSerializer(data={
+            'car': car.id, 'paid': 0, 'manager': manager.id,
+            'products': [{'product': self.oil.id, 'amount': 3}, {'product': self.pad.id, 'amount': 4},
+                         {'product': self.oil.id, 'amount': 2, 'discount': 5}],
+        }, context={'request': SimpleNamespace(user=self.user)})
+        serializer.is_valid(raise_exception=True)
+        order = serializer.save()
+        self.assertValuation()
+
+        OrderProduct.objects.filter(order=order).first().delete()
+        self.assertValuation()
+
+        supplier = Supplier.objects.create(first_name='supplier', phone='0', branch=self.branch)
+        serializer = ImportListSerializer(data={
+            'paid': 0, 'payment_type': '1', 'supplier': supplier.id, 'products': [
+                {'product': {'id': self.oil.id, 'name': 'oil'}, 'amount': 4, 'arrival_price': 1600,
+                 'sell_price': 2200},
+                {'product': {'id': self.pad.id, 'name': 'pad'}, 'amount': 1, 'arrival_price': 320,
+                 'sell_price': 480},
+            ]})
+        serializer.is_valid(raise_exception=True)
+        import_list = serializer.save(branch=self.branch)
+        self.assertValuation()
+
+        # the line is cut back after the stock it brought was sold: the stock goes below zero
+        line = ImportProduct.objects.get(import_list=import_list, product=self.pad)
+        self.pad.refresh_from_db()
+        self.pad.change_amount(-self.pad.amount, minimum=0)
+        line.amount = 0.5
+        line.save()
+        self.pad.refresh_from_db()
+        self.assertLess(self.pad.amount, 0)
+        self.assertValuation()
+
+
+class LookupKeyTests(TestCase):
+    def test_keys_fit_their_columns(self):
+        branch = Branch.objects.create(name='keys')
+        # casefold() makes each of these characters two and three
+        product = Product.objects.create(name='ß' * 255, code='ﬄ' * 20, is_temp=False, branch=branch)
+        self.assertEqual((product.name_key, product.code_key), ('ss' * 255, 'ffl' * 20))
+        self.assertEqual(search_products(branch.pk, 'FFL' * 20), [product])
+
+        # namesakes the migration found: the older one's key gets its id appended
+        older, newer = Product.objects.bulk_create([
+            Product(name='ẞ' * 255, name_key='older', is_temp=False, branch=branch),
+            Product(name='ß' * 255, name_key='newer', is_temp=False, branch=branch),
+        ])
+        product.delete()
+        fill_lookup_keys(apps, None)
+        older.refresh_from_db()
+        newer.refresh_from_db()
+        self.assertEqual((older.name_key, newer.name_key), (f"{'ss' * 255}#{older.pk}", 'ss' * 255))
+        # whatever the id
+        self.assertLessEqual(len(f"{'ss' * 255}#{2 ** 63 - 1}"), Product._meta.get_field('name_key').max_length)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.branch = Branch.objects.create(name='search')
+
+    def product(self, name, code=None, is_temp=False, branch=None):
+        return Product.objects.create(name=name, code=code, is_temp=is_temp, branch=branch or self.branch)
+
+    def search(self, query, limit=20):
+        return [product.name for product in search_products(self.branch.pk, query, limit)]
+
+    def test_ranking(self):
+        self.product('rear brk line')
+        self.product('brk cable')
+        self.product('shoe', 'BRK-2')
+        self.product('pad front', 'BRK')
+        self.product('brk temp', 'BRK-1', is_temp=True)
+        self.product('brk elsewhere', 'BRK', branch=Branch.objects.create(name='other'))
+        # the exact code, codes starting with the query, names starting with it, then names containing it
+        self.assertEqual(self.search(' BRK '), ['pad front', 'shoe', 'brk cable', 'rear brk line'])
+        self.assertEqual(self.search('brk', limit=2), ['pad front', 'shoe'])
+        # every word in any order, a word too short for the index included
+        self.assertEqual(self.search('line REAR'), ['rear brk line'])
+        self.assertEqual(self.search('brk li'), ['rear brk line'])
+        self.assertEqual(self.search('ab'), [])
+        self.assertEqual(self.search('  '), [])
+
+
+@skipUnless(connection.vendor == 'sqlite', 'the FTS5 index is SQLite only')
+class SearchIndexTests(TransactionTestCase):
+    def setUp(self):
+        self.branch = Branch.objects.create(name='search')
+
+    def indexed(self, word):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT rowid FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s ORDER BY rowid',
+                           [f'"{word}"'])
+            return [row[0] for row in cursor.fetchall()]
+
+    def triggers(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE %s",
+                           [f'{SQLITE_TABLE}%'])
+            return sorted(row[0] for row in cursor.fetchall())
+
+    def alter(self, old, new):
+        with connection.schema_editor() as editor:
+            editor.alter_field(Product, old, new)
+
+    def test_triggers_keep_the_index_in_step(self):
+        oil = Product.objects.create(name='Engine oil', code='EO-5W30', is_temp=False, branch=self.branch)
+        self.assertEqual(self.indexed('gine'), [oil.pk])
+        self.assertEqual(self.indexed('5w3'), [oil.pk])
+        oil.name = 'Gear oil'
+        oil.save()
+        self.assertEqual(self.indexed('gine'), [])
+        self.assertEqual(self.indexed('gear'), [oil.pk])
+        Product.objects.filter(pk=oil.pk).update(name_key='gearbox oil', amount=3)
+        self.assertEqual(self.indexed('rbox'), [oil.pk])
+        pads = Product.objects.bulk_create([
+            Product(name='Brake pad', name_key='brake pad', is_temp=False, branch=self.branch),
+            Product(name='Brake pads', name_key='brake pads', is_temp=False, branch=self.branch),
+        ])
+        self.assertEqual(self.indexed('rake'), [pad.pk for pad in pads])
+        oil.delete()
+        self.assertEqual(self.indexed('gear'), [])
+        Product.objects.filter(pk=pads[0].pk).delete()
+        self.assertEqual(self.indexed('rake'), [pads[1].pk])
+
+    def test_triggers_are_restored_after_a_product_migration(self):
+        self.assertEqual(self.triggers(), sorted(SQLITE_TRIGGERS))
+        old = Product._meta.get_field('unit')
+        new = old.clone()
+        new.max_length = 60
+        new.set_attributes_from_name('unit')
+        # SQLite alters a column by copying the table into a new one, which drops its triggers
+        self.alter(old, new)
+        self.addCleanup(restore_triggers)
+        self.addCleanup(self.alter, new, old)
+        self.assertEqual(self.triggers(), [])
+        oil = Product.objects.create(name='Engine oil', is_temp=False, branch=self.branch)
+        self.assertEqual(self.indexed('gine'), [])
+
+        restore_triggers()
+        self.assertEqual(self.triggers(), sorted(SQLITE_TRIGGERS))
+        # the rows written meanwhile are indexed again, and the writes after that are kept in step
+        self.assertEqual(self.indexed('gine'), [oil.pk])
+        pad = Product.objects.create(name='Brake pad', is_temp=False, branch=self.branch)
+        self.assertEqual(self.indexed('rake'), [pad.pk])
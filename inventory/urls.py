@@ -1,12 +1,15 @@
 from django.urls import path
 from .views import ProductListView, ProductRetrieveUpdateDestroyView, ServiceListCreateView, \
     ServiceRetrieveUpdateDestroyView, CarListCreateView, CarRetrieveUpdateDestroyView, TempProductListView, \
-    TempProductUpdateView, OutOfProductListView, AllProductsListView
+    TempProductUpdateView, OutOfProductListView, AllProductsListView, ProductSearchView, ProductByCodeView, \
+    WarehouseRevalueView
 
 urlpatterns = [
     path('products/', ProductListView.as_view(), name='product-list-create'),
     path('all-products/', AllProductsListView.as_view(), name='all-product-list'),
     path('products-out/', OutOfProductListView.as_view(), name='product-list-create'),
+    path('products/search/', ProductSearchView.as_view(), name='product-search'),
+    path('products/code/<str:code>/', ProductByCodeView.as_view(), name='product-by-code'),
     path('product/<int:pk>/', ProductRetrieveUpdateDestroyView.as_view(), name='product-detail'),
     path('product-temps/', TempProductListView.as_view(), name='product-list-temp'),
     path('product-temp/<int:pk>/', TempProductUpdateView.as_view(), name='product-update-temp'),
@@ -14,4 +17,5 @@ urlpatterns = [
     path('service/<int:pk>/', ServiceRetrieveUpdateDestroyView.as_view(), name='service-detail'),
     path('cars/', CarListCreateView.as_view(), name='car-list-create'),
     path('car/<int:pk>/', CarRetrieveUpdateDestroyView.as_view(), name='car-detail'),
+    path('warehouse/revalue/', WarehouseRevalueView.as_view(), name='warehouse-revalue'),
 ]
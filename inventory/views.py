@@ -1,10 +1,18 @@
 from drf_yasg import openapi
-from drf_yasg.utils import swagger_auto_schema
-from rest_framework.generics import RetrieveUpdateDestroyAPIView, ListCreateAPIView, ListAPIView, RetrieveUpdateAPIView
+from drf_yasg.utils import swagger_auto_schema, no_body
+from rest_framework.generics import (
+    RetrieveUpdateDestroyAPIView, ListCreateAPIView, ListAPIView, RetrieveUpdateAPIView, RetrieveAPIView
+)
 from rest_framework.permissions import IsAuthenticated
-from .models import Product, Service, Car
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from .models import Product, Service, Car, lookup_key
+from .search import search_products
 from django.db.models import F
 from .serializers import ProductSerializer, ServiceSerializer, CarSerializer, ProductTempPostSerializer
+from core.catalog import CatalogListMixin
+from jobs.tasks import enqueue
+from jobs.views import accepted
 from users.permissions import IsSameBranch, IsAdminUser
 
 
@@ -77,10 +85,52 @@ class AllProductsListView(ListAPIView):
             return self.queryset.filter(branch=self.request.user.branch, is_temp=False).order_by('-created_at')
         return self.queryset.none()
 
-class ServiceListCreateView(ListCreateAPIView):
+class ProductSearchView(APIView):
+    permission_classes = [IsAdminUser, IsSameBranch]
+    default_limit, max_limit = 20, 50
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(name='q', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description='Code or (part of the) name'),
+            openapi.Parameter(name='limit', in_=openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description=f'Products to return, {default_limit} by default, at most {max_limit}'),
+        ],
+        responses={200: ProductSerializer(many=True)}
+    )
+    def get(self, request):
+        try:
+            limit = min(int(request.query_params.get('limit', self.default_limit)), self.max_limit)
+        except ValueError:
+            return Response({"error": "Invalid limit."}, status=400)
+        products = search_products(request.user.branch_id, request.query_params.get('q', ''), max(limit, 1))
+        return Response(ProductSerializer(products, many=True).data)
+
+
+class ProductByCodeView(RetrieveAPIView):
+    """The warehouse product with a code, for barcode scanners: a point lookup of the branch's code index."""
+    queryset = Product.objects.all()
+    serializer_class = ProductSerializer
+    permission_classes = [IsAdminUser, IsSameBranch]
+    lookup_field = 'code_key'
+    lookup_url_kwarg = 'code'
+
+    def get_queryset(self):
+        if self.request.user.is_authenticated:
+            return self.queryset.filter(branch=self.request.user.branch, is_temp=False)
+        return self.queryset.none()
+
+    def get_object(self):
+        self.kwargs['code'] = lookup_key(self.kwargs['code'])
+        return super().get_object()
+
+
+class ServiceListCreateView(CatalogListMixin, ListCreateAPIView):
     queryset = Service.objects.all()
     serializer_class = ServiceSerializer
     permission_classes = [IsAdminUser, IsSameBranch]
+    catalog_model = Service
+    catalog_reverse = True
 
     def get_queryset(self):
         return self.queryset.filter(branch=self.request.user.branch).order_by('-id')
@@ -138,4 +188,14 @@ class CarRetrieveUpdateDestroyView(RetrieveUpdateDestroyAPIView):
     def get_queryset(self):
         if self.request.user.is_authenticated:
             return self.queryset.filter(branch=self.request.user.branch)
-        return self.queryset.none()
\ No newline at end of file
+        return self.queryset.none()
+
+
+class WarehouseRevalueView(APIView):
+    """Queues the recomputation of the warehouse valuation of the user's branch from its products."""
+    permission_classes = [IsAdminUser]
+
+    @swagger_auto_schema(request_body=no_body, responses={202: 'The job revaluing the warehouse'})
+    def post(self, request):
+        job = enqueue('inventory.revalue_warehouse', branch_id=request.user.branch_id, created_by=request.user)
+        return accepted(job, request)
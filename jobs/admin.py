@@ -0,0 +1,11 @@
+from django.contrib import admin
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'status', 'attempts', 'progress', 'branch', 'created_by', 'created_at', 'finished_at')
+    search_fields = ('kind', 'message')
+    list_filter = ('status', 'kind', 'branch')
+    list_select_related = ('branch', 'created_by')
+    readonly_fields = ('started_at', 'finished_at', 'heartbeat_at')
@@ -0,0 +1,58 @@
+import multiprocessing
+import signal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from jobs.worker import Worker
+
+
+def _work(poll_interval, once):
+    worker = Worker(poll_interval=poll_interval, once=once)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    try:
+        worker.work()
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = ('Run the queued background jobs (see jobs.tasks) in worker processes; SIGTERM or Ctrl-C lets '
+            'every worker finish its current job first')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1, help='Worker processes to run')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds an idle worker waits before looking for jobs again')
+        parser.add_argument('--once', action='store_true', help='Exit once no job is due instead of waiting')
+
+    def handle(self, *args, **options):
+        if options['processes'] < 1:
+            raise CommandError('--processes must be positive')
+        if options['processes'] == 1:
+            worker = Worker(poll_interval=options['poll_interval'], once=options['once'])
+            signal.signal(signal.SIGTERM, worker.stop)
+            signal.signal(signal.SIGINT, worker.stop)
+            processed = worker.work()
+            self.stdout.write(self.style.SUCCESS(f"{worker.name}: {processed} job(s) run"))
+            return
+
+        # every process opens its own connections, none inherited from this one
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        processes = [context.Process(target=_work, args=(options['poll_interval'], options['once']))
+                     for _ in range(options['processes'])]
+        for process in processes:
+            process.start()
+
+        def stop(*args):
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        for process in processes:
+            process.join()
+        self.stdout.write(self.style.SUCCESS(f"{len(processes)} worker process(es) stopped"))
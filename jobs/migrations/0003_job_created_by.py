@@ -0,0 +1,36 @@
+# Generated by Django 5.0.7 on 2026-10-18 09:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('branches', '0006_walletmovement'),
+        ('jobs', '0002_job_job_kind_created_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='job',
+            name='job_branch_created_idx',
+        ),
+        # the user who queued the job: renamed, not dropped, so existing jobs keep their owner
+        migrations.RenameField(
+            model_name='job',
+            old_name='user',
+            new_name='created_by',
+        ),
+        migrations.AlterField(
+            model_name='job',
+            name='created_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to=settings.AUTH_USER_MODEL, verbose_name='Created by'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['created_by', 'created_at', 'id'], name='job_creator_created_idx'),
+        ),
+    ]
@@ -0,0 +1,80 @@
+import time
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework.utils.encoders import JSONEncoder
+
+from branches.models import Branch
+from users.models import User
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+# seconds between two saves of the progress of a job
+PROGRESS_INTERVAL = 1
+STATUS_CHOICES = (
+    (QUEUED, _('Queued')),
+    (RUNNING, _('Running')),
+    (SUCCEEDED, _('Succeeded')),
+    (FAILED, _('Failed')),
+)
+
+
+class Job(models.Model):
+    """
+    A unit of background work: the task ``kind`` (see ``jobs.tasks``) called with ``arguments`` by a
+    ``run_jobs`` worker. The table is the queue, so no broker is needed.
+    """
+    kind = models.CharField(max_length=100, verbose_name=_('Kind'))
+    arguments = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder, verbose_name=_('Arguments'))
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED, verbose_name=_('Status'))
+    attempts = models.PositiveIntegerField(default=0, verbose_name=_('Attempts'))
+    max_attempts = models.PositiveIntegerField(default=3, verbose_name=_('Max attempts'))
+    run_after = models.DateTimeField(default=timezone.now, verbose_name=_('Run after'))
+
+    worker = models.CharField(max_length=100, blank=True, default='', verbose_name=_('Worker'))
+    heartbeat_at = models.DateTimeField(null=True, blank=True, verbose_name=_('Heartbeat at'))
+    progress = models.FloatField(null=True, blank=True, verbose_name=_('Progress'))
+    message = models.CharField(max_length=255, blank=True, default='', verbose_name=_('Message'))
+    # encoded as the API answers, so a result reads the same as the response of the view it replaces
+    result = models.JSONField(null=True, blank=True, encoder=JSONEncoder, verbose_name=_('Result'))
+    error = models.TextField(blank=True, default='', verbose_name=_('Error'))
+
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE, null=True, blank=True, verbose_name=_('Branch'))
+    # who queued the job: the only user who sees it and downloads its file (none for periodic tasks)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs',
+                                   verbose_name=_('Created by'))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Created at'))
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name=_('Started at'))
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name=_('Finished at'))
+
+    class Meta:
+        verbose_name = _('Job')
+        verbose_name_plural = _('Jobs')
+        indexes = [
+            # the queue: what is due, and what is running (for stale heartbeats)
+            models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx'),
+            # the jobs a user queued, newest first
+            models.Index(fields=['created_by', 'created_at', 'id'], name='job_creator_created_idx'),
+            # the last job of a periodic task
+            models.Index(fields=['kind', 'created_at'], name='job_kind_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+    def set_progress(self, progress=None, message=None):
+        """
+        Records from inside its task how far the job is (a fraction, ``None`` when it cannot tell)
+        and what it is doing. Saved at most every ``PROGRESS_INTERVAL`` seconds.
+        """
+        self.progress = progress
+        if message is not None:
+            self.message = message[:255]
+        now = time.monotonic()
+        if now - getattr(self, '_progress_saved', 0) >= PROGRESS_INTERVAL:
+            self._progress_saved = now
+            Job.objects.filter(pk=self.pk).update(progress=self.progress, message=self.message)
@@ -0,0 +1,27 @@
+from rest_framework.fields import SerializerMethodField
+from rest_framework.serializers import ModelSerializer
+from rest_framework.reverse import reverse
+
+from .models import Job, SUCCEEDED
+
+
+class JobSerializer(ModelSerializer):
+    file = SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = ['id', 'kind', 'status', 'progress', 'message', 'attempts', 'max_attempts', 'result', 'error',
+                  'file', 'created_at', 'started_at', 'finished_at']
+
+    def get_file(self, obj):
+        """Where the file a job wrote (an export) is downloaded from."""
+        if obj.status != SUCCEEDED or not isinstance(obj.result, dict) or 'file' not in obj.result:
+            return None
+        return reverse('job-file', kwargs={'pk': obj.pk}, request=self.context.get('request'))
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # the path on the server is of no use to the client, the download link is
+        if isinstance(data['result'], dict) and 'file' in data['result']:
+            data['result'] = {key: value for key, value in data['result'].items() if key != 'file'}
+        return data
@@ -0,0 +1,70 @@
+import os
+import uuid
+from dataclasses import dataclass
+from datetime import timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from users.models import User
+from .models import Job
+
+
+@dataclass(frozen=True)
+class Task:
+    name: str
+    function: object
+    max_attempts: int
+    every: timedelta = None
+
+
+TASKS = {}
+
+
+def task(name, max_attempts=3, every=None):
+    """
+    Registers the decorated function as the task ``name``, called as ``function(job, **arguments)``;
+    what it returns (JSON) is the job's result. Tasks live in the ``jobs`` modules of the apps.
+
+    A task run ``every`` (a ``timedelta``) is queued by the workers themselves, without arguments,
+    see ``jobs.worker.schedule``.
+    """
+    def register(function):
+        TASKS[name] = Task(name, function, max_attempts, every)
+        return function
+    return register
+
+
+def enqueue(name, branch_id=None, created_by=None, **arguments):
+    """Queues the task ``name`` with ``arguments`` for a worker, returning the job; ``created_by`` alone sees it."""
+    return Job.objects.create(kind=name, arguments=arguments, max_attempts=TASKS[name].max_attempts,
+                              branch_id=branch_id, created_by=created_by)
+
+
+def job_file(name):
+    """A new path under ``JOBS_FILES_DIR`` for a file named ``name`` that a job reads or writes."""
+    directory = Path(settings.JOBS_FILES_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    return str(directory / f'{uuid.uuid4().hex}-{os.path.basename(name)}')
+
+
+@task('export')
+def export(job, view, extension, params):
+    """Writes the export of the ``ExportView`` subclass ``view`` to a file the job's result points to."""
+    export_view = import_string(view)()
+    export_view.request = SimpleNamespace(user=User.objects.get(pk=job.created_by_id), query_params=params)
+    filename = f'{export_view.filename}.{extension}'
+    path = job_file(filename)
+    written = 0
+    try:
+        with open(path, 'wb') as file:
+            for chunk in export_view.content(extension):
+                file.write(chunk)
+                written += len(chunk)
+                job.set_progress(message=f'{written} bytes written')
+    except BaseException:
+        os.remove(path)
+        raise
+    return {'file': path, 'filename': filename, 'size': written}
@@ -0,0 +1,171 @@
+import json
+import threading
+from datetime import timedelta
+
+from django.db import connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from branches.models import Branch
+from jobs.models import Job, QUEUED, RUNNING, SUCCEEDED, FAILED
+from jobs.tasks import TASKS, enqueue, task
+from jobs.worker import Worker, claim, requeue_stale
+from users.models import User
+
+
+class JobOwnerTests(TestCase):
+    def test_only_the_user_who_queued_a_job_sees_it(self):
+        branches = [Branch.objects.create(name='first'), Branch.objects.create(name='second')]
+        superuser = User.objects.create(username='superuser', is_superuser=True)
+        admin = User.objects.create(username='admin', branch=branches[0])
+        day = timezone.localdate().isoformat()
+
+        client = APIClient()
+        client.force_authenticate(superuser)
+        # a superuser has no branch: the report of several branches is still theirs to poll
+        response = client.get('/transaction/statistics/range/', {
+            'start': day, 'end': day, 'branch': f'{branches[0].pk},{branches[1].pk}', 'background': 'true'})
+        self.assertEqual(response.status_code, 202)
+        job = Job.objects.get(pk=response.data['id'])
+        self.assertEqual(job.created_by, superuser)
+        self.assertEqual(len(job.arguments['branches']), 2)
+        self.assertEqual([item['id'] for item in client.get('/job/').data['results']], [job.pk])
+        self.assertEqual(client.get(f'/job/{job.pk}/').status_code, 200)
+
+        client.force_authenticate(admin)
+        self.assertEqual(client.get('/job/').data['results'], [])
+        self.assertEqual(client.get(f'/job/{job.pk}/').status_code, 404)
+        self.assertEqual(client.get(f'/job/{job.pk}/file/').status_code, 404)
+        self.assertEqual(APIClient().get(f'/job/{job.pk}/').status_code, 401)
+
+
+class TaskMixin:
+    def register(self, name, function, max_attempts=3):
+        task(name, max_attempts)(function)
+        self.addCleanup(TASKS.pop, name)
+
+    def work(self):
+        """Runs what is due, as ``runworker --once`` does; returns the jobs run."""
+        return Worker(once=True).work()
+
+
+@override_settings(JOBS_RETRY_DELAY=30, JOBS_STALE_AFTER=120)
+class WorkerTests(TaskMixin, TransactionTestCase):
+    """A worker starts every round with ``close_old_connections()``, which a test transaction would not survive."""
+
+    def test_failures_are_retried_with_backoff(self):
+        calls = []
+
+        def flaky(job, fail_times):
+            calls.append(job.attempts)
+            if len(calls) <= fail_times:
+                raise RuntimeError('the supplier is down')
+            return {'calls': len(calls)}
+
+        self.register('tests.flaky', flaky)
+        job = enqueue('tests.flaky', fail_times=2)
+        for attempt, delay in ((1, 30), (2, 60)):
+            before = timezone.now()
+            self.work()
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts, job.worker), (QUEUED, attempt, ''))
+            self.assertIn('the supplier is down', job.error)
+            # retried JOBS_RETRY_DELAY seconds later, doubled on every attempt
+            self.assertLessEqual(before + timedelta(seconds=delay), job.run_after)
+            self.assertLessEqual(job.run_after, timezone.now() + timedelta(seconds=delay))
+            # not before then
+            self.work()
+            self.assertEqual(calls, list(range(1, attempt + 1)))
+            Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        self.work()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.result, job.error), (SUCCEEDED, 3, {'calls': 3}, ''))
+
+        # failed for good after its last attempt
+        calls.clear()
+        job = enqueue('tests.flaky', fail_times=3)
+        for _ in range(3):
+            Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+            self.work()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (FAILED, 3))
+        self.assertEqual(calls, [1, 2, 3])
+
+    def test_permanent_errors_fail_at_once(self):
+        def invalid(job):
+            raise ValidationError({'amount': ['Ensure this value is greater than 0.']})
+
+        def missing(job):
+            return Branch.objects.get(pk=0)
+
+        self.register('tests.invalid', invalid)
+        self.register('tests.missing', missing)
+        jobs = [enqueue('tests.invalid'), enqueue('tests.missing'), Job.objects.create(kind='tests.gone', arguments={}),
+                enqueue('tests.invalid', x=1)]
+        self.work()
+        for job in jobs:
+            job.refresh_from_db()
+        self.assertEqual([(job.status, job.attempts) for job in jobs], [(FAILED, 1)] * 4)
+        # a ValidationError as the client would be answered, others with their traceback
+        self.assertEqual(json.loads(jobs[0].error), {'amount': ['Ensure this value is greater than 0.']})
+        self.assertIn('DoesNotExist', jobs[1].error)
+        self.assertEqual(jobs[2].error, "No task named 'tests.gone'")
+        self.assertIn('TypeError', jobs[3].error)
+
+    def test_stale_runs_are_queued_again(self):
+        self.register('tests.done', lambda job: 'done', max_attempts=2)
+        stale, fresh, last = enqueue('tests.done'), enqueue('tests.done'), enqueue('tests.done')
+        for job in (stale, fresh, last):
+            self.assertEqual(claim('gone:1'), job)
+        long_ago = timezone.now() - timedelta(seconds=121)
+        Job.objects.filter(pk__in=[stale.pk, last.pk]).update(heartbeat_at=long_ago)
+        Job.objects.filter(pk=last.pk).update(attempts=2)
+
+        self.assertEqual(requeue_stale(), 2)
+        for job in (stale, fresh, last):
+            job.refresh_from_db()
+        self.assertEqual((stale.status, stale.worker, stale.error), (QUEUED, '', 'The worker gone:1 stopped responding.'))
+        self.assertEqual((fresh.status, fresh.worker), (RUNNING, 'gone:1'))
+        self.assertEqual((last.status, last.attempts), (FAILED, 2))
+        self.assertEqual(requeue_stale(), 0)
+
+        # a worker gives up on the stale run itself and runs the job again once it is due
+        Job.objects.filter(pk=stale.pk).update(run_after=timezone.now())
+        Job.objects.filter(pk=fresh.pk).update(heartbeat_at=long_ago)
+        with override_settings(JOBS_RETRY_DELAY=0):
+            self.work()
+        for job in (stale, fresh):
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts, job.result), (SUCCEEDED, 2, 'done'))
+
+
+class ClaimRaceTests(TaskMixin, TransactionTestCase):
+    threads = 6
+
+    def test_a_job_is_claimed_once(self):
+        self.register('tests.done', lambda job: 'done')
+        jobs = [enqueue('tests.done') for _ in range(self.threads * 2)]
+        claimed, errors, lock = [], [], threading.Lock()
+        barrier = threading.Barrier(self.threads)
+
+        def work(number):
+            try:
+                barrier.wait()
+                while (job := claim(f'worker:{number}')) is not None:
+                    with lock:
+                        claimed.append(job.pk)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=work, args=(number,)) for number in range(self.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(claimed), [job.pk for job in jobs])
+        self.assertEqual(set(Job.objects.values_list('status', 'attempts')), {(RUNNING, 1)})
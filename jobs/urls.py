@@ -0,0 +1,8 @@
+from django.urls import path
+from .views import JobListView, JobDetailView, JobFileView
+
+urlpatterns = [
+    path('', JobListView.as_view(), name='job-list'),
+    path('<int:pk>/', JobDetailView.as_view(), name='job-detail'),
+    path('<int:pk>/file/', JobFileView.as_view(), name='job-file'),
+]
@@ -0,0 +1,54 @@
+import os
+
+from django.http import FileResponse
+from drf_yasg import openapi
+from rest_framework import status
+from rest_framework.exceptions import NotFound
+from rest_framework.generics import ListAPIView, RetrieveAPIView
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from .models import Job, SUCCEEDED
+from .serializers import JobSerializer
+
+BACKGROUND_PARAMETER = openapi.Parameter(
+    name='background', in_=openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN,
+    description="Queue the work as a background job and answer 202 with the job instead of waiting for it")
+
+
+def in_background(request):
+    return request.query_params.get('background') in ('1', 'true', 'True')
+
+
+def accepted(job, request=None):
+    """The answer of an endpoint that queued ``job``; its status is then polled at ``job/<id>/``."""
+    return Response(JobSerializer(job, context={'request': request}).data, status=status.HTTP_202_ACCEPTED)
+
+
+class JobListView(ListAPIView):
+    """The jobs the user queued, newest first."""
+    serializer_class = JobSerializer
+    # whoever an endpoint let queue a job (a superuser's report of several branches too) follows it up
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return Job.objects.filter(created_by=self.request.user).order_by('-created_at', '-id')
+
+
+class JobDetailView(RetrieveAPIView):
+    serializer_class = JobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return Job.objects.filter(created_by=self.request.user)
+
+
+class JobFileView(JobDetailView):
+    """Downloads the file a succeeded job wrote."""
+
+    def get(self, request, *args, **kwargs):
+        job = self.get_object()
+        path = job.result.get('file') if job.status == SUCCEEDED and isinstance(job.result, dict) else None
+        if not path or not os.path.exists(path):
+            raise NotFound("The job has no file.")
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=job.result.get('filename'))
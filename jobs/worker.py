@@ -0,0 +1,173 @@
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist, ValidationError as DjangoValidationError
+from django.db import close_old_connections, connections
+from django.db.models import F
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .models import Job, QUEUED, RUNNING, SUCCEEDED, FAILED
+from .tasks import TASKS, enqueue
+
+# seconds between two looks of a worker for periodic tasks due
+SCHEDULE_INTERVAL = 60
+# errors that running the job again cannot fix: it fails at once
+PERMANENT_ERRORS = (ValidationError, DjangoValidationError, ObjectDoesNotExist, LookupError, TypeError)
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim(worker):
+    """
+    Takes the next due job for ``worker``, or returns ``None``.
+
+    A job is taken by an UPDATE that only matches while it is still queued, so of several workers
+    (processes or hosts) reaching for the same job, exactly one gets it; no row locks are needed,
+    which is what makes the table a queue on SQLite too.
+    """
+    now = timezone.now()
+    due = Job.objects.filter(status=QUEUED, run_after__lte=now).order_by('run_after', 'id')
+    for pk in due.values_list('pk', flat=True)[:10]:
+        taken = Job.objects.filter(pk=pk, status=QUEUED).update(
+            status=RUNNING, worker=worker, attempts=F('attempts') + 1, started_at=now, heartbeat_at=now)
+        if taken:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def schedule():
+    """
+    Queues every periodic task (``task(every=...)``) no job of which was created in its last
+    ``every``. Workers checking at the same moment may both queue one, so periodic tasks are
+    written to be run twice. Returns the jobs queued.
+    """
+    now = timezone.now()
+    return [
+        enqueue(task.name) for task in TASKS.values()
+        if task.every and not Job.objects.filter(kind=task.name, created_at__gt=now - task.every).exists()
+    ]
+
+
+def retry_delay(attempts):
+    """Seconds before attempt ``attempts + 1``: ``JOBS_RETRY_DELAY``, doubled on every attempt."""
+    return settings.JOBS_RETRY_DELAY * 2 ** (attempts - 1)
+
+
+def finish(job, **values):
+    Job.objects.filter(pk=job.pk).update(**values)
+    for name, value in values.items():
+        setattr(job, name, value)
+
+
+def fail(job, error, permanent=False):
+    """Queues ``job`` again after ``retry_delay``, or marks it failed after its last attempt."""
+    if permanent or job.attempts >= job.max_attempts:
+        finish(job, status=FAILED, error=error, worker='', finished_at=timezone.now())
+    else:
+        finish(job, status=QUEUED, error=error, worker='',
+               run_after=timezone.now() + timedelta(seconds=retry_delay(job.attempts)))
+
+
+def run(job):
+    """Runs the task of the claimed ``job`` and records its result, or its error and what comes next."""
+    task = TASKS.get(job.kind)
+    if task is None:
+        fail(job, f'No task named {job.kind!r}', permanent=True)
+        return job
+    try:
+        result = task.function(job, **job.arguments)
+    except ValidationError as error:
+        # what the client is told about its input, as a view would answer it
+        fail(job, json.dumps(error.detail), permanent=True)
+    except PERMANENT_ERRORS:
+        fail(job, traceback.format_exc(), permanent=True)
+    except Exception:
+        fail(job, traceback.format_exc())
+    else:
+        finish(job, status=SUCCEEDED, result=result, progress=1, error='', worker='', finished_at=timezone.now())
+    return job
+
+
+def requeue_stale():
+    """
+    Gives up on running jobs whose worker stopped beating (it was killed, or its host went down):
+    they are queued again, or failed after their last attempt. Returns how many there were.
+    """
+    stale = Job.objects.filter(
+        status=RUNNING, heartbeat_at__lt=timezone.now() - timedelta(seconds=settings.JOBS_STALE_AFTER))
+    count = 0
+    for job in stale:
+        # only if it is still the same stale run, not one another worker has just taken over
+        if Job.objects.filter(pk=job.pk, status=RUNNING, heartbeat_at=job.heartbeat_at).update(worker=''):
+            fail(job, f'The worker {job.worker} stopped responding.')
+            count += 1
+    return count
+
+
+class Heartbeat(threading.Thread):
+    """Keeps ``heartbeat_at`` of the running job fresh while its task works, on a connection of its own."""
+
+    def __init__(self, job):
+        super().__init__(daemon=True)
+        self.job = job
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(settings.JOBS_HEARTBEAT_INTERVAL):
+                Job.objects.filter(pk=self.job.pk, status=RUNNING).update(heartbeat_at=timezone.now())
+        finally:
+            connections.close_all()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+class Worker:
+    """
+    Claims and runs jobs one at a time until ``stop()``, or with ``once`` until none is due; queues
+    the periodic tasks due as well, so they need no cron.
+    """
+
+    def __init__(self, poll_interval=1.0, once=False):
+        self.name = worker_name()
+        self.poll_interval = poll_interval
+        self.once = once
+        self.stopped = threading.Event()
+        self.scheduled_at = None
+
+    def stop(self, *args):
+        self.stopped.set()
+
+    def work(self):
+        processed = 0
+        while not self.stopped.is_set():
+            close_old_connections()
+            if self.scheduled_at is None or time.monotonic() - self.scheduled_at >= SCHEDULE_INTERVAL:
+                self.scheduled_at = time.monotonic()
+                schedule()
+            requeue_stale()
+            job = claim(self.name)
+            if job is None:
+                if self.once:
+                    break
+                self.stopped.wait(self.poll_interval)
+                continue
+            heartbeat = Heartbeat(job)
+            heartbeat.start()
+            try:
+                run(job)
+            finally:
+                heartbeat.stop()
+            processed += 1
+        return processed
@@ -0,0 +1,99 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, FloatField
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from core.balances import increment_many
+from inventory.models import Product, WarehouseValuation
+from users.models import Employee
+from .models import Order, OrderService, OrderProduct
+
+
+def compose_order(order_data, services_data, products_data):
+    """
+    Creates an order with all of its lines in a fixed number of queries.
+
+    Every line is priced in memory with the same rules as ``OrderService.save`` and
+    ``OrderProduct.save``, the lines are inserted with ``bulk_create`` and stock and
+    employee balances are changed by one aggregated UPDATE each.
+    """
+    with transaction.atomic():
+        car = order_data['car']
+        order = Order(**order_data, branch=car.branch, total=0, overall_total=0, landing=0)
+        for field in ('odo_mileage', 'hev_mileage', 'ev_mileage'):
+            if not getattr(order, field):
+                setattr(order, field, getattr(car, field))
+
+        balances = defaultdict(Decimal)
+        service_lines = []
+        for service_data in services_data:
+            line = OrderService(order=order, **service_data)
+            line.calculate_total()
+            overall = line.service.price * Decimal(line.part)
+            if line.mechanic:
+                balances[line.mechanic.pk] += line.mechanic.kpi * Decimal(line.part)
+            order.total += line.total
+            order.service_total += line.total
+            order.service_overall_total += overall
+            order.overall_total += overall
+            service_lines.append(line)
+
+        warehouse_sell, warehouse_arrival = WarehouseValuation.totals(order.branch) if products_data else (0, 0)
+        stock = {}
+        sold = defaultdict(float)
+        product_lines = []
+        for product_data in products_data:
+            line = OrderProduct(order=order, **product_data)
+            line.calculate_total()
+            product = line.product
+            sell_value = Decimal(line.amount) * product.sell_price
+            arrival_value = Decimal(line.amount) * product.arrival_price
+
+            line.warehouse_remainder_sell_price = warehouse_sell - sell_value
+            line.warehouse_remainder_arrival_price = warehouse_arrival - arrival_value
+
+            available = stock.get(product.pk, product.amount)
+            if available < line.amount:
+                raise ValidationError(
+                    f"Not enough product stock. Available: {available}, requested: {line.amount}.")
+            stock[product.pk] = available - line.amount
+            sold[product.pk] += line.amount
+            if not product.is_temp and product.branch_id == order.branch_id:
+                warehouse_sell -= sell_value
+                warehouse_arrival -= arrival_value
+
+            if order.manager:
+                balances[order.manager.pk] += Decimal(order.manager.commission_per / 100) * sell_value
+            order.total += line.total
+            order.product_total += line.total
+            order.product_overall_total += sell_value
+            order.overall_total += sell_value
+            product_lines.append(line)
+
+        order.landing = order.total - order.paid
+        order.save()
+
+        OrderService.objects.bulk_create(service_lines)
+        OrderProduct.objects.bulk_create(product_lines)
+
+        if sold:
+            increment_many(Product, 'amount', {pk: -amount for pk, amount in sold.items()}, FloatField(),
+                           updated_at=timezone.now())
+            oversold = Product.objects.filter(pk__in=sold, amount__lt=0).values_list('pk', 'amount').first()
+            if oversold:
+                pk, amount = oversold
+                raise ValidationError(
+                    f"Not enough product stock. Available: {amount + sold[pk]}, requested: {sold[pk]}.")
+            products = {line.product.pk: line.product for line in product_lines}
+            WarehouseValuation.apply_changes(
+                (product.valuation(stock[pk] + sold[pk]), product.valuation(stock[pk]))
+                for pk, product in products.items()
+            )
+            for line in product_lines:
+                line.product.amount = stock[line.product.pk]
+        increment_many(Employee, 'balance', balances, DecimalField(max_digits=15, decimal_places=2))
+
+        return order, service_lines, product_lines
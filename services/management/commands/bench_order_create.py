@@ -0,0 +1,60 @@
+import time
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from branches.models import Branch
+from inventory.models import Car, Service, Product
+from services.serializers import OrderPostSerializer
+from users.models import Employee, Client, User
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Measure queries and time spent by OrderPostSerializer.create for growing line counts (nothing is kept)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, nargs='+', default=[1, 5, 20, 50])
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'lines':>6} {'queries':>8} {'ms':>10}")
+        for lines in options['lines']:
+            try:
+                with transaction.atomic():
+                    queries, elapsed = self.run_once(lines)
+                    raise Rollback
+            except Rollback:
+                pass
+            self.stdout.write(f"{lines:>6} {queries:>8} {elapsed * 1000:>10.1f}")
+
+    def run_once(self, lines):
+        branch = Branch.objects.create(name='bench')
+        user = User.objects.create(username='bench-order-create', branch=branch)
+        client = Client.objects.create(first_name='bench', phone='0', branch=branch)
+        car = Car.objects.create(name='bench', brand='bench', color='white', client=client, branch=branch)
+        manager = Employee.objects.create(first_name='bench', phone='0', position='manager', branch=branch)
+        mechanic = Employee.objects.create(first_name='bench', phone='0', position='mechanic', kpi=1000, branch=branch)
+        services = [Service.objects.create(name=f'bench {i}', price=50000, branch=branch) for i in range(lines)]
+        products = [
+            Product.objects.create(name=f'bench {i}', amount=100, arrival_price=8000, sell_price=10000,
+                                   is_temp=False, branch=branch)
+            for i in range(lines)
+        ]
+        data = {
+            'car': car.id,
+            'paid': 0,
+            'manager': manager.id,
+            'services': [{'service': s.id, 'part': 1, 'mechanic': mechanic.id} for s in services],
+            'products': [{'product': p.id, 'amount': 2} for p in products],
+        }
+        serializer = OrderPostSerializer(data=data, context={'request': SimpleNamespace(user=user)})
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+        return len(queries), time.perf_counter() - started
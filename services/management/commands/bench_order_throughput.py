@@ -0,0 +1,212 @@
+import json
+import os
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlsplit
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework_simplejwt.tokens import AccessToken
+
+from branches.models import Branch
+from inventory.models import Car, Service, Product
+from users.models import Employee, Client, User
+
+# core.database.sqlite_database overrides giving SQLite's own defaults
+STOCK_SQLITE = ('journal_mode=DELETE&synchronous=FULL&cache_size=-2000&mmap_size=0&temp_store=DEFAULT'
+                '&transaction_mode=DEFERRED')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def masked(url):
+    parts = urlsplit(url)
+    if parts.password:
+        return url.replace(f':{parts.password}@', ':***@', 1)
+    return url
+
+
+class Command(BaseCommand):
+    help = ('Measure order creation throughput of a locally started server under concurrent clients, '
+            'on the configured database or on every --database-url given')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, nargs='+', default=[1, 4, 16],
+                            help='Concurrent clients of each round')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds of every round')
+        parser.add_argument('--database-url', action='append', dest='database_urls',
+                            help='Benchmark this DATABASE_URL instead (repeat to compare backends)')
+        parser.add_argument('--sqlite-profiles', action='store_true',
+                            help='Compare stock SQLite with the tuned profile, each on a fresh database file')
+        parser.add_argument('--migrate', action='store_true', help='Migrate the database first')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+
+    def handle(self, *args, **options):
+        failed = []
+        targets = [(masked(url), url) for url in options['database_urls'] or ()]
+        if options['sqlite_profiles']:
+            directory = tempfile.mkdtemp()
+            targets += [
+                ('sqlite stock', f'sqlite:///{directory}/stock.sqlite3?{STOCK_SQLITE}'),
+                ('sqlite tuned', f'sqlite:///{directory}/tuned.sqlite3'),
+            ]
+            options['migrate'] = True
+        if targets:
+            results = []
+            try:
+                for label, url in targets:
+                    try:
+                        results += self.run_child(label, url, options)
+                    except CommandError as exc:
+                        self.stderr.write(str(exc))
+                        failed.append(label)
+            finally:
+                if options['sqlite_profiles']:
+                    shutil.rmtree(directory)
+        else:
+            if options['migrate']:
+                call_command('migrate', verbosity=0)
+            results = self.bench(options['clients'], options['duration'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(results))
+            return
+        self.stdout.write(f"{'database':<40} {'clients':>7} {'orders':>7} {'errors':>7} {'orders/s':>9} "
+                          f"{'p50 ms':>8} {'p95 ms':>8}")
+        for result in results:
+            self.stdout.write(f"{result['database'][:40]:<40} {result['clients']:>7} {result['orders']:>7} "
+                              f"{result['errors']:>7} {result['throughput']:>9.1f} {result['p50']:>8.1f} "
+                              f"{result['p95']:>8.1f}")
+            for error, count in result['error_kinds'].items():
+                self.stdout.write(f"{'':<40} {count:>7} x {error}")
+        if failed:
+            raise CommandError(f"No results for {', '.join(failed)}")
+
+    def run_child(self, label, url, options):
+        command = [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'bench_order_throughput', '--json',
+                   '--duration', str(options['duration']), '--clients', *map(str, options['clients'])]
+        if options['migrate']:
+            command.append('--migrate')
+        child = subprocess.run(command, env={**os.environ, 'DATABASE_URL': url}, capture_output=True, text=True)
+        if child.returncode:
+            raise CommandError(f"Benchmark on {label} failed: {child.stderr.strip().splitlines()[-1]}")
+        results = json.loads(child.stdout.strip().splitlines()[-1])
+        for result in results:
+            result['database'] = label
+        return results
+
+    def bench(self, rounds, duration):
+        branch = Branch.objects.create(name='bench throughput')
+        try:
+            body = self.fixtures(branch)
+            token = str(AccessToken.for_user(User.objects.get(branch=branch)))
+            port = free_port()
+            server = subprocess.Popen(
+                [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'runserver', f'127.0.0.1:{port}',
+                 '--noreload'],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                url = f'http://127.0.0.1:{port}/service/orders/'
+                self.wait_for(url, server)
+                database = connection.settings_dict['ENGINE'].rsplit('.', 1)[-1]
+                return [self.run_round(url, token, body, clients, duration) | {'database': database}
+                        for clients in rounds]
+            finally:
+                server.terminate()
+                server.wait()
+        finally:
+            branch.delete()
+
+    def fixtures(self, branch):
+        User.objects.create(username=f'bench-throughput-{branch.id}', branch=branch)
+        client = Client.objects.create(first_name='bench', phone='0', branch=branch)
+        car = Car.objects.create(name='bench', brand='bench', color='white', client=client, branch=branch)
+        manager = Employee.objects.create(first_name='bench', phone='0', position='manager', branch=branch)
+        mechanic = Employee.objects.create(first_name='bench', phone='0', position='mechanic', kpi=1000, branch=branch)
+        service = Service.objects.create(name='bench', price=50000, branch=branch)
+        products = [Product.objects.create(name=f'bench {branch.id} {i}', amount=10 ** 9, arrival_price=8000,
+                                           sell_price=10000, is_temp=False, branch=branch) for i in range(2)]
+        return json.dumps({
+            'car': car.id,
+            'paid': 1000,
+            'manager': manager.id,
+            'services': [{'service': service.id, 'part': 1, 'mechanic': mechanic.id}],
+            'products': [{'product': product.id, 'amount': 1} for product in products],
+        }).encode()
+
+    def wait_for(self, url, server, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError('The server exited before answering')
+            try:
+                urlopen(url, timeout=1)
+                return
+            except HTTPError:
+                return
+            except (URLError, ConnectionError):
+                time.sleep(0.2)
+        raise CommandError(f'The server did not answer within {timeout} seconds')
+
+    def run_round(self, url, token, body, clients, duration):
+        latencies, errors, lock = [], Counter(), threading.Lock()
+        headers = {'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
+        deadline = time.monotonic() + duration
+
+        def client():
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    with urlopen(Request(url, data=body, headers=headers, method='POST'), timeout=60) as response:
+                        response.read()
+                    error = None
+                except HTTPError as exc:
+                    # the debug page names the exception in its title
+                    title = re.search(rb'<title>(.*?) at ', exc.read(), re.S)
+                    error = f'HTTP {exc.code} {title[1].decode().strip()}' if title else f'HTTP {exc.code}'
+                except (URLError, ConnectionError, TimeoutError) as exc:
+                    error = type(exc).__name__
+                elapsed = time.perf_counter() - started
+                with lock:
+                    if error:
+                        errors[error] += 1
+                    else:
+                        latencies.append(elapsed)
+
+        threads = [threading.Thread(target=client) for _ in range(clients)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+
+        def percentile(share):
+            return latencies[min(int(len(latencies) * share), len(latencies) - 1)] * 1000 if latencies else 0
+
+        return {
+            'clients': clients,
+            'orders': len(latencies),
+            'errors': sum(errors.values()),
+            'error_kinds': dict(errors),
+            'throughput': len(latencies) / elapsed,
+            'p50': percentile(0.5),
+            'p95': percentile(0.95),
+        }
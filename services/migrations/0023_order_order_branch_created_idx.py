@@ -0,0 +1,20 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('branches', '0006_walletmovement'),
+        ('inventory', '0017_car_car_branch_created_idx_and_more'),
+        ('services', '0022_order_product_overall_total_and_more'),
+        ('users', '0011_alter_usertemp_last_name'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['branch', 'created_at', 'id'], name='order_branch_created_idx'),
+        ),
+    ]
@@ -1,12 +1,12 @@
 from decimal import Decimal
 from django.db import models, transaction
-from django.db.models import Sum, Case, When, F, DecimalField
 from django.utils.translation import gettext_lazy as _
 from rest_framework.exceptions import ValidationError
 from django.utils import timezone
 
+from core.balances import increment
 from users.models import Employee, Client
-from inventory.models import Branch, Car, Service, Product
+from inventory.models import Branch, Car, Service, Product, WarehouseValuation
 
 
 class Order(models.Model):
@@ -38,6 +38,9 @@ class Order(models.Model):
     class Meta:
         verbose_name = _('Order')
         verbose_name_plural = _('Orders')
+        indexes = [
+            models.Index(fields=['branch', 'created_at', 'id'], name='order_branch_created_idx'),
+        ]
 
     def __str__(self):
         return self.description if self.description else f"{self.pk}"
@@ -62,11 +65,9 @@ class Order(models.Model):
 
             super().save(*args, **kwargs)
 
-            self.car.client.lending += self.landing
-            self.car.client.save()
-
-            self.branch.balance += self.paid
-            self.branch.save()
+            if self.client:
+                increment(self.client, lending=self.landing)
+            increment(self.branch, balance=self.paid)
 
             if self.odo_mileage:
                 self.car.odo_mileage = self.odo_mileage
@@ -80,15 +81,13 @@ class Order(models.Model):
                 self.car.ev_mileage = self.ev_mileage
             else:
                 self.ev_mileage = self.car.ev_mileage
-            self.car.save()
+            self.car.save(update_fields=['odo_mileage', 'hev_mileage', 'ev_mileage'])
 
     def delete(self, *args, **kwargs):
         with transaction.atomic():
-            self.client.lending -= self.landing
-            self.client.save()
-
-            self.branch.balance -= self.paid
-            self.branch.save()
+            if self.client:
+                increment(self.client, lending=-self.landing)
+            increment(self.branch, balance=-self.paid)
 
             super(Order, self).delete(*args, **kwargs)
 
@@ -116,6 +115,22 @@ class OrderService(models.Model):
     def __str__(self):
         return f'{self.order.id} - {self.service.name}'
 
+    def calculate_total(self):
+        self.total = self.service.price * Decimal(self.part)
+        if self.discount > 0:
+            if self.discount_type == "%":
+                if 0 < self.discount < 100:
+                    self.total -= self.total * self.discount / 100
+                else:
+                    raise ValidationError({'detail': 'Discount amount must be from 0 to 100 if discout type is %'})
+            if self.discount_type == "$":
+                if 0 < self.discount < self.service.price:
+                    self.total -= self.discount
+                else:
+                    raise ValidationError(
+                        {'detail': 'If discount_type is $, Discount must be between 1000 and service.price'})
+        return self.total
+
     def save(self, *args, **kwargs):
         with transaction.atomic():
             # if self.pk:
@@ -130,40 +145,23 @@ class OrderService(models.Model):
             #         self.order.total -= old_instance.service.price * old_instance.part - old_instance.discount
             #     self.order.overall_total -= old_instance.service.price
 
-            self.total = self.service.price * Decimal(self.part)
-            if self.discount > 0:
-                if self.discount_type == "%":
-                    if 0 < self.discount < 100:
-                        self.total -= self.total * self.discount / 100
-                    else:
-                        raise ValidationError({'detail': 'Discount amount must be from 0 to 100 if discout type is %'})
-                if self.discount_type == "$":
-                    if 0 < self.discount < self.service.price:
-                        self.total -= self.discount
-                    else:
-                        raise ValidationError(
-                            {'detail': 'If discount_type is $, Discount must be between 1000 and service.price'})
+            self.calculate_total()
 
             super().save(*args, **kwargs)
             if self.mechanic:
-                self.mechanic.balance += self.mechanic.kpi * Decimal(self.part)
-                self.mechanic.save()
+                increment(self.mechanic, balance=self.mechanic.kpi * Decimal(self.part))
 
-            self.order.total += self.total
-            self.order.service_total += self.total
-            self.order.service_overall_total += self.service.price * Decimal(self.part)
-            self.order.overall_total += self.service.price * Decimal(self.part)
-            self.order.save()
+            overall = self.service.price * Decimal(self.part)
+            increment(self.order, total=self.total, service_total=self.total,
+                      service_overall_total=overall, overall_total=overall)
 
     def delete(self, *args, **kwargs):
         with transaction.atomic():
-            self.mechanic.balance -= self.mechanic.kpi * Decimal(self.part)
-            self.mechanic.save()
+            if self.mechanic:
+                increment(self.mechanic, balance=-self.mechanic.kpi * Decimal(self.part))
 
             if self.order:
-                self.order.total -= self.total
-                self.order.overall_total -= self.service.price * Decimal(self.part)
-                self.order.save()
+                increment(self.order, total=-self.total, overall_total=-self.service.price * Decimal(self.part))
 
             super(OrderService, self).delete(*args, **kwargs)
 
@@ -191,6 +189,22 @@ class OrderProduct(models.Model):
     def __str__(self):
         return f'{self.order.id} - {self.product.name}'
 
+    def calculate_total(self):
+        self.total = Decimal(self.amount) * self.product.sell_price
+        if self.discount > 0:
+            if self.discount_type == "%":
+                if 0 < self.discount <= 100:
+                    self.total -= self.total * (self.discount / 100)
+                else:
+                    raise ValidationError({"detail": "Discount amount must be from 0 to 100 if discout type is %"})
+            elif self.discount_type == "$":
+                if 0 < self.discount <= self.product.sell_price:
+                    self.total -= self.discount
+                else:
+                    raise ValidationError(
+                        {"detail": "Discount amount must be from 0 to product sell price if discout type is $"})
+        return self.total
+
     def save(self, *args, **kwargs):
         with transaction.atomic():
             # if self.pk:
@@ -208,65 +222,39 @@ class OrderProduct(models.Model):
             #     manager.balance -= (manager.commission_per / 100) * old_instance.amount * (
             #                 self.product.sell_price - self.product.sell_price)
 
-            self.total = Decimal(self.amount) * self.product.sell_price
-            if self.discount > 0:
-                if self.discount_type == "%":
-                    if 0 < self.discount <= 100:
-                        self.total -= self.total * (self.discount / 100)
-                    else:
-                        raise ValidationError({"detail": "Discount amount must be from 0 to 100 if discout type is %"})
-                elif self.discount_type == "$":
-                    if 0 < self.discount <= self.product.sell_price:
-                        self.total -= self.discount
-                    else:
-                        raise ValidationError(
-                            {"detail": "Discount amount must be from 0 to product sell price if discout type is $"})
-
-            warehouse_products = Product.objects.filter(branch=self.order.branch, is_temp=False)
-            warehouse_total_sell = warehouse_products.filter(amount__gt=0).aggregate(
-                total_value=Sum(
-                    F("amount") * F("sell_price"), output_field=DecimalField()))["total_value"] or 0
+            self.calculate_total()
+
+            warehouse_total_sell, warehouse_total_arrival = WarehouseValuation.totals(self.order.branch)
             self.warehouse_remainder_sell_price = warehouse_total_sell - (
                         Decimal(self.amount) * self.product.sell_price)
-            warehouse_total_arrival = warehouse_products.filter(amount__gt=0).aggregate(
-                total_value=Sum(
-                    F("amount") * F("arrival_price"), output_field=DecimalField()))["total_value"] or 0
             self.warehouse_remainder_arrival_price = warehouse_total_arrival - (
                         Decimal(self.amount) * self.product.arrival_price)
 
             super().save(*args, **kwargs)
+            overall = Decimal(self.amount) * self.product.sell_price
             if self.order.manager:
                 manager = self.order.manager
-                manager.balance += Decimal(manager.commission_per / 100) * Decimal(
-                    self.amount) * self.product.sell_price
-                manager.save()
-
-            self.order.total += self.total
-            self.order.product_total += self.total
-            self.order.overall_total += Decimal(self.amount) * self.product.sell_price
-            self.order.save()
-
-            if self.product.amount >= self.amount:
-                self.product.amount -= self.amount
-                self.product.save()
-            else:
+                increment(manager, balance=Decimal(manager.commission_per / 100) * overall)
+
+            increment(self.order, total=self.total, product_total=self.total,
+                      product_overall_total=overall, overall_total=overall)
+
+            if not self.product.change_amount(-self.amount, minimum=0):
+                self.product.refresh_from_db(fields=['amount'])
                 raise ValidationError(
                     f"Not enough product stock. Available: {self.product.amount}, requested: {self.amount}.")
 
     def delete(self, *args, **kwargs):
         with transaction.atomic():
-            self.product.amount += self.amount
-            self.product.save()
+            self.product.change_amount(self.amount)
 
             if self.order.manager:
                 manager = self.order.manager
-                manager.balance -= Decimal(manager.commission_per / 100) * Decimal(self.amount) * (
-                        self.product.sell_price - self.product.arrival_price)
-                manager.save()
+                increment(manager, balance=-Decimal(manager.commission_per / 100) * Decimal(self.amount) * (
+                        self.product.sell_price - self.product.arrival_price))
 
             if self.order:
-                self.order.total -= self.total
-                self.order.overall_total -= Decimal(self.amount) * self.product.sell_price
-                self.order.save()
+                increment(self.order, total=-self.total,
+                          overall_total=-Decimal(self.amount) * self.product.sell_price)
 
             super(OrderProduct, self).delete(*args, **kwargs)
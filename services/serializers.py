@@ -3,13 +3,15 @@ from decimal import Decimal
 from django.db import transaction
 from rest_framework.exceptions import ValidationError
 from rest_framework.fields import SerializerMethodField
-from rest_framework.serializers import ModelSerializer, DecimalField, PrimaryKeyRelatedField
+from rest_framework.serializers import ModelSerializer, DecimalField
 
 from branches.serializers import BranchBalanceSerializer
+from core.serializers import CatalogPrimaryKeyRelatedField, PrefetchedListSerializer, PrefetchedPrimaryKeyRelatedField
 from inventory.models import Product, Car
 from inventory.serializers import CarSerializer, ServiceSerializer, ProductSerializer
-from users.models import Employee, Client
+from users.models import Employee
 from users.serializers import ManagerSerializer, ClientSerializer
+from .composition import compose_order
 from .models import Order, OrderService, OrderProduct
 
 
@@ -24,7 +26,10 @@ class OrderServiceSerializer(ModelSerializer):
 
 
 class OrderServicePostSerializer(ModelSerializer):
+    serializer_related_field = CatalogPrimaryKeyRelatedField
+
     class Meta:
+        list_serializer_class = PrefetchedListSerializer
         model = OrderService
         fields = ['id', 'service', 'total', 'part', 'discount_type', 'discount', 'mechanic', 'description']
 
@@ -53,7 +58,10 @@ class OrderProductSerializer(ModelSerializer):
             return order_product
 
 class OrderProductPostSerializer(ModelSerializer):
+    serializer_related_field = PrefetchedPrimaryKeyRelatedField
+
     class Meta:
+        list_serializer_class = PrefetchedListSerializer
         model = OrderProduct
         fields = ['id', 'product', 'amount', 'total', 'discount_type', 'discount', 'description']
 
@@ -83,45 +91,31 @@ class OrderPostSerializer(ModelSerializer):
 
     total = DecimalField(max_digits=15, decimal_places=0, required=False)
     landing = DecimalField(max_digits=15, decimal_places=0, required=False)
-    manager = PrimaryKeyRelatedField(queryset=Employee.objects.filter(position='manager'), allow_null=True)
+    manager = CatalogPrimaryKeyRelatedField(
+        queryset=Employee.objects.filter(position='manager'), allow_null=True, catalog_filter={'position': 'manager'})
 
     def get_user_full_name(self, obj):
         user = self.context['request'].user
         return user.get_full_name() if hasattr(user, 'get_full_name') else user.username
 
     def create(self, validated_data):
-        with transaction.atomic():
-            services_data = validated_data.pop('services')
-            products_data = validated_data.pop('products')
-
-            # if products_data and not validated_data['manager']:
-            #     raise ValidationError({'detail': "If product is exist, Manager is required"})
+        services_data = validated_data.pop('services', [])
+        products_data = validated_data.pop('products', [])
 
-            car = validated_data.get('car')
+        # if products_data and not validated_data['manager']:
+        #     raise ValidationError({'detail': "If product is exist, Manager is required"})
 
-            if isinstance(car, int):
-                car = Car.objects.get(id=car)
-            validated_data['total'] =  0
-            validated_data['landing'] = 0
-            validated_data['overall_total'] = 0
+        car = validated_data.get('car')
+        if isinstance(car, int):
+            validated_data['car'] = Car.objects.get(id=car)
+        for field in ('total', 'landing', 'overall_total'):
+            validated_data.pop(field, None)
 
-            order = Order.objects.create(**validated_data, branch=car.branch)
-            service_responses = []
-            product_responses = []
-            for service_data in services_data:
-                service_i = OrderService.objects.create(order=order, **service_data)
-                service_responses.append(service_i)
+        order, service_responses, product_responses = compose_order(validated_data, services_data, products_data)
 
-            for product_data in products_data:
-                product_i = OrderProduct.objects.create(order=order, **product_data)
-                product_responses.append(product_i)
-
-            order.landing = order.total - order.paid
-            order.save()
-
-            order.services = service_responses
-            order.products = product_responses
-            return order
+        order.services = service_responses
+        order.products = product_responses
+        return order
 
 
 class OrderListSerializer(ModelSerializer):
@@ -151,9 +145,6 @@ class OrderListSerializer(ModelSerializer):
     def get_qqs(self, obj):
         return obj.total * Decimal(0.12)
 
-    def get_client(self, obj):
-        return Client.objects.get(id=obj.car.client.id)
-
     def get_start_date(self, obj):
         return obj.start_date.strftime('%d.%m.%Y') if obj.start_date else None
 
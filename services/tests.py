@@ -1,3 +1,275 @@
-from django.test import TestCase
+import threading
+from decimal import Decimal
+from types import SimpleNamespace
 
-# Create your tests here.
+from django.db import connections, DatabaseError
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from branches.models import Branch
+from core.balances import increment
+from core.dataset import Size, generate
+from inventory.models import Car, Product, Service, WarehouseValuation
+from services.models import Order, OrderProduct, OrderService
+from services.serializers import OrderPostSerializer
+from transactions.models import Lending, ExpenseType, Expense
+from users.models import Employee, Client, User
+
+
+class OrderQueryBudgetTests(TestCase):
+    """The order list and detail read a fixed number of queries, however many orders and lines there are."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.generated = generate(1, Size(clients=10, products=40, orders=120, imports=1, ledger=1, days=10))[0]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.generated.user)
+
+    def test_order_list(self):
+        # the count (not with a cursor), the page with its foreign keys, then service lines, services,
+        # product lines and products
+        for params, queries in (({}, 6), ({'page': 2}, 6), ({'pagination': 'cursor'}, 5)):
+            with self.subTest(params=params), self.assertNumQueries(queries):
+                response = self.client.get('/service/orders/', params)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.data['results'])
+
+    def test_order_detail(self):
+        order = Order.objects.filter(branch=self.generated.branch, orderproduct__isnull=False,
+                                     orderservice__isnull=False).first()
+        # the order with its foreign keys, then service lines, services, product lines and products
+        with self.assertNumQueries(5):
+            response = self.client.get(f'/service/order/{order.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['products'] and response.data['services'])
+
+
+class ComposeOrderTests(TestCase):
+    """
+    An order placed through ``OrderPostSerializer`` (``compose_order``) against the same order built
+    line by line with ``OrderService.save`` and ``OrderProduct.save``, on two identical branches.
+    """
+
+    def branch(self, name):
+        branch = Branch.objects.create(name=name, balance=1000)
+        objects = SimpleNamespace(branch=branch, user=User.objects.create(username=name, branch=branch))
+        objects.client = Client.objects.create(first_name=name, phone='0', lending=50, branch=branch)
+        objects.car = Car.objects.create(name='car', brand='brand', color='white', client=objects.client,
+                                         branch=branch)
+        objects.manager = Employee.objects.create(first_name='manager', phone='0', position='manager',
+                                                  commission_per=3, balance=10, branch=branch)
+        objects.mechanic = Employee.objects.create(first_name='mechanic', phone='0', position='mechanic', kpi=300,
+                                                   balance=20, branch=branch)
+        objects.services = [Service.objects.create(name=f'service {i}', price=5000 + 1000 * i, branch=branch)
+                            for i in range(2)]
+        objects.products = [
+            Product.objects.create(name=f'{name} part', amount=10, arrival_price=800, sell_price=1000,
+                                   is_temp=False, branch=branch),
+            Product.objects.create(name=f'{name} oil', amount=4.5, arrival_price=1500, sell_price=2100,
+                                   is_temp=False, branch=branch),
+            Product.objects.create(name=f'{name} temp', amount=2, arrival_price=100, sell_price=300,
+                                   is_temp=True, branch=branch),
+        ]
+        # stock of other products, so that the warehouse remainders are not just these
+        Product.objects.create(name=f'{name} stock', amount=7, arrival_price=50, sell_price=90, is_temp=False,
+                               branch=branch)
+        return objects
+
+    @staticmethod
+    def lines(objects):
+        services = [
+            {'service': objects.services[0], 'part': 1, 'discount': Decimal(10), 'mechanic': objects.mechanic},
+            {'service': objects.services[1], 'part': 0.5, 'discount_type': '$', 'discount': Decimal(200)},
+        ]
+        products = [
+            {'product': objects.products[0], 'amount': 2, 'discount': Decimal(5)},
+            {'product': objects.products[1], 'amount': 1.5},
+            {'product': objects.products[0], 'amount': 3, 'discount_type': '$', 'discount': Decimal(100)},
+            {'product': objects.products[2], 'amount': 1},
+        ]
+        return services, products
+
+    @staticmethod
+    def state(objects, order):
+        order.refresh_from_db()
+        return {
+            'order': {field: getattr(order, field) for field in (
+                'total', 'overall_total', 'product_total', 'product_overall_total', 'service_total',
+                'service_overall_total', 'paid', 'landing')},
+            'services': list(OrderService.objects.filter(order=order).order_by('id').values_list('total', flat=True)),
+            'products': list(OrderProduct.objects.filter(order=order).order_by('id').values_list(
+                'total', 'warehouse_remainder_sell_price', 'warehouse_remainder_arrival_price')),
+            'stock': list(Product.objects.filter(branch=objects.branch).order_by('id').values_list(
+                'amount', flat=True)),
+            'employees': list(Employee.objects.filter(branch=objects.branch).order_by('id').values_list(
+                'balance', flat=True)),
+            'branch': Branch.objects.get(pk=objects.branch.pk).balance,
+            'lending': Client.objects.get(pk=objects.client.pk).lending,
+            'warehouse': WarehouseValuation.totals(objects.branch),
+        }
+
+    def test_batched_order_matches_line_by_line(self):
+        batched, line_by_line = self.branch('batched'), self.branch('line by line')
+
+        services, products = self.lines(batched)
+        serializer = OrderPostSerializer(data={
+            'car': batched.car.id, 'paid': 9000, 'manager': batched.manager.id,
+            'services': [{**line, 'service': line['service'].id,
+                          **({'mechanic': line['mechanic'].id} if 'mechanic' in line else {})} for line in services],
+            'products': [{**line, 'product': line['product'].id} for line in products],
+        }, context={'request': SimpleNamespace(user=batched.user)})
+        serializer.is_valid(raise_exception=True)
+        batched_order = serializer.save()
+
+        services, products = self.lines(line_by_line)
+        order = Order.objects.create(car=line_by_line.car, paid=9000, manager=line_by_line.manager,
+                                     branch=line_by_line.branch, total=0, overall_total=0, landing=0)
+        for line in services:
+            OrderService.objects.create(order=order, **line)
+        for line in products:
+            OrderProduct.objects.create(order=order, **line)
+        order.refresh_from_db()
+        Order.objects.filter(pk=order.pk).update(landing=order.total - order.paid)
+        increment(line_by_line.client, lending=order.total - order.paid)
+
+        expected = self.state(line_by_line, order)
+        self.assertEqual(self.state(batched, batched_order), expected)
+        self.assertEqual(expected['warehouse'], WarehouseValuation.compute(line_by_line.branch))
+
+
+class OrderLineDeleteTests(TestCase):
+    """
+    Deleting a line takes back what it has always taken back: the order total and overall total, the
+    stock, the mechanic's KPI and the manager's commission on the margin. The product and service
+    totals of the order stay as they are.
+    """
+
+    def setUp(self):
+        branch = Branch.objects.create(name='delete')
+        user = User.objects.create(username='delete', branch=branch)
+        client = Client.objects.create(first_name='delete', phone='0', branch=branch)
+        car = Car.objects.create(name='car', brand='brand', color='white', client=client, branch=branch)
+        self.manager = Employee.objects.create(first_name='manager', phone='0', position='manager', branch=branch)
+        self.mechanic = Employee.objects.create(first_name='mechanic', phone='0', position='mechanic', kpi=300,
+                                                branch=branch)
+        self.product = Product.objects.create(name='part', amount=10, arrival_price=800, sell_price=1000,
+                                              is_temp=False, branch=branch)
+        service = Service.objects.create(name='service', price=5000, branch=branch)
+        serializer = OrderPostSerializer(data={
+            'car': car.id, 'paid': 0, 'manager': self.manager.id,
+            'services': [{'service': service.id, 'part': 2, 'mechanic': self.mechanic.id, 'discount': 10}],
+            'products': [{'product': self.product.id, 'amount': 3, 'discount': 5}],
+        }, context={'request': SimpleNamespace(user=user)})
+        serializer.is_valid(raise_exception=True)
+        self.order = serializer.save()
+
+    def state(self):
+        self.order.refresh_from_db()
+        self.product.refresh_from_db()
+        self.manager.refresh_from_db()
+        self.mechanic.refresh_from_db()
+        return {
+            'total': self.order.total, 'overall_total': self.order.overall_total,
+            'product_total': self.order.product_total, 'product_overall_total': self.order.product_overall_total,
+            'service_total': self.order.service_total, 'service_overall_total': self.order.service_overall_total,
+            'stock': self.product.amount, 'manager': self.manager.balance, 'mechanic': self.mechanic.balance,
+        }
+
+    def test_product_line(self):
+        before = self.state()
+        line = OrderProduct.objects.get(order=self.order)
+        line.delete()
+        margin = Decimal(self.manager.commission_per) / 100 * 3 * (1000 - 800)
+        self.assertEqual(self.state(), {**before, 'total': before['total'] - line.total,
+                                        'overall_total': before['overall_total'] - 3000, 'stock': 10,
+                                        'manager': before['manager'] - margin})
+
+    def test_service_line(self):
+        before = self.state()
+        line = OrderService.objects.get(order=self.order)
+        line.delete()
+        self.assertEqual(self.state(), {**before, 'total': before['total'] - line.total,
+                                        'overall_total': before['overall_total'] - 10000,
+                                        'mechanic': before['mechanic'] - 600})
+
+
+class ConcurrentBalanceTests(TransactionTestCase):
+    """
+    Orders (``compose_order``), lending payments, expenses and bare ``increment`` calls racing on one
+    branch, client and product: no update may be lost and stock may never be sold twice.
+    """
+    threads = 8
+    iterations = 12
+
+    def setUp(self):
+        self.branch = Branch.objects.create(name='concurrent')
+        self.user = User.objects.create(username='concurrent', branch=self.branch)
+        self.client_ = Client.objects.create(first_name='concurrent', phone='0', branch=self.branch)
+        self.car = Car.objects.create(name='car', brand='brand', color='white', client=self.client_, branch=self.branch)
+        self.manager = Employee.objects.create(first_name='manager', phone='0', position='manager', branch=self.branch)
+        # fewer than the orders placed, so that some of them are turned away for want of stock
+        self.stock = self.threads * self.iterations // 8
+        self.product = Product.objects.create(name='part', amount=self.stock, arrival_price=800, sell_price=1000,
+                                              is_temp=False, branch=self.branch)
+        self.expense_type = ExpenseType.objects.create(name='concurrent', branch=self.branch)
+
+    def work(self, number, errors, lock):
+        try:
+            for i in range(self.iterations):
+                try:
+                    kind = (number + i) % 4
+                    if kind == 0:
+                        Lending.objects.create(client=Client.objects.get(pk=self.client_.pk), lending_amount=100,
+                                               is_lending=False, current_lending=0, branch=self.branch)
+                    elif kind == 1:
+                        Expense.objects.create(description='concurrent', type=self.expense_type, amount=10,
+                                               from_user=self.user, branch=Branch.objects.get(pk=self.branch.pk))
+                    elif kind == 2:
+                        increment(Branch.objects.get(pk=self.branch.pk), balance=7)
+                    else:
+                        serializer = OrderPostSerializer(data={
+                            'car': self.car.pk, 'paid': 500, 'manager': self.manager.pk,
+                            'products': [{'product': self.product.pk, 'amount': 1}],
+                        }, context={'request': SimpleNamespace(user=self.user)})
+                        serializer.is_valid(raise_exception=True)
+                        serializer.save()
+                except ValidationError:
+                    with lock:
+                        errors['rejected'] += 1
+                except DatabaseError as error:
+                    with lock:
+                        errors['database'].append(error)
+        finally:
+            connections.close_all()
+
+    def test_balances_add_up(self):
+        errors, lock = {'rejected': 0, 'database': []}, threading.Lock()
+        threads = [threading.Thread(target=self.work, args=(number, errors, lock)) for number in range(self.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors['database'], [])
+
+        orders = Order.objects.filter(branch=self.branch)
+        paid = orders.aggregate(total=Sum('paid'))['total'] or 0
+        landing = orders.aggregate(total=Sum('landing'))['total'] or 0
+        repaid = Lending.objects.filter(branch=self.branch).aggregate(total=Sum('lending_amount'))['total'] or 0
+        spent = Expense.objects.filter(branch=self.branch).aggregate(total=Sum('amount'))['total'] or 0
+        sold = OrderProduct.objects.filter(order__branch=self.branch).aggregate(total=Sum('amount'))['total'] or 0
+        increments = sum(1 for number in range(self.threads) for i in range(self.iterations) if (number + i) % 4 == 2)
+
+        for instance in (self.branch, self.client_, self.product, self.manager):
+            instance.refresh_from_db()
+        self.assertGreater(errors['rejected'], 0)
+        self.assertEqual(sold, self.stock)
+        self.assertEqual(self.product.amount, 0)
+        self.assertEqual(self.branch.balance, paid + repaid - spent + 7 * increments)
+        self.assertEqual(self.client_.lending, landing - repaid)
+        self.assertEqual(self.manager.balance,
+                         Decimal(self.manager.commission_per) / 100 * Decimal(sold) * self.product.sell_price)
+        self.assertEqual(WarehouseValuation.totals(self.branch)[0], WarehouseValuation.compute(self.branch)[0])
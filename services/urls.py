@@ -1,7 +1,8 @@
 from django.urls import path
-from .views import OrderListCreateView, OrderDetailView
+from .views import OrderListCreateView, OrderDetailView, OrderExportView
 
 urlpatterns = [
     path('orders/', OrderListCreateView.as_view(), name='order-list'),
     path('order/<int:pk>/', OrderDetailView.as_view(), name='order-detail'),
+    path('orders/export/<str:extension>/', OrderExportView.as_view(), name='order-export'),
 ]
\ No newline at end of file
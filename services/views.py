@@ -1,19 +1,27 @@
+from asgiref.sync import sync_to_async
 from rest_framework.generics import ListCreateAPIView, RetrieveUpdateDestroyAPIView
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 
+from core.async_views import AsyncAPIView
+from core.exports import ExportView
 from users.permissions import IsAdminUser
 from .models import Order
 from .serializers import OrderPostSerializer, OrderListSerializer
 
 
-class OrderListCreateView(ListCreateAPIView):
-    queryset = Order.objects.all()
+ORDER_DETAIL_RELATED = ('car', 'manager', 'branch', 'client')
+ORDER_DETAIL_PREFETCH = ('orderservice_set__service', 'orderproduct_set__product')
+
+
+class OrderListCreateView(AsyncAPIView, ListCreateAPIView):
+    queryset = Order.objects.select_related(*ORDER_DETAIL_RELATED).prefetch_related(*ORDER_DETAIL_PREFETCH)
     permission_classes = [IsAdminUser,]
     serializer_class = OrderPostSerializer
 
     def get_queryset(self):
         if self.request.user.is_authenticated:
-            return self.queryset.filter(branch=self.request.user.branch).order_by('-created_at')
+            return self.queryset.filter(branch_id=self.request.user.branch_id).order_by('-created_at')
         return self.queryset.none()
 
     def get_serializer_class(self):
@@ -21,13 +29,46 @@ class OrderListCreateView(ListCreateAPIView):
             return OrderListSerializer
         return OrderPostSerializer
 
+    async def get(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = await self.paginator.apaginate_queryset(queryset, request, view=self)
+        if page is None:
+            return Response(self.get_serializer([order async for order in queryset], many=True).data)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    async def post(self, request, *args, **kwargs):
+        # order entry: the composition runs in one transaction on the request's worker thread
+        return await sync_to_async(self.create)(request, *args, **kwargs)
+
 
 class OrderDetailView(RetrieveUpdateDestroyAPIView):
-    queryset = Order.objects.all()
+    queryset = Order.objects.select_related(*ORDER_DETAIL_RELATED).prefetch_related(*ORDER_DETAIL_PREFETCH)
     permission_classes = [IsAdminUser,]
     serializer_class = OrderListSerializer
 
     def get_queryset(self):
         if self.request.user.is_authenticated:
             return self.queryset.filter(branch=self.request.user.branch)
-        return self.queryset.none()
\ No newline at end of file
+        return self.queryset.none()
+
+class OrderExportView(ExportView):
+    filename = 'orders'
+    columns = (
+        ('ID', 'id'),
+        ('Created at', 'created_at'),
+        ('Client', 'client__first_name'),
+        ('Client last name', 'client__last_name'),
+        ('Car', 'car__name'),
+        ('State number', 'car__state_number'),
+        ('Manager', 'manager__first_name'),
+        ('Overall total', 'overall_total'),
+        ('Service total', 'service_total'),
+        ('Product total', 'product_total'),
+        ('Total', 'total'),
+        ('Paid', 'paid'),
+        ('Debt', 'landing'),
+        ('Description', 'description'),
+    )
+
+    def get_queryset(self):
+        return Order.objects.filter(branch=self.request.user.branch)
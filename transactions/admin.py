@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import ExpenseType, Expense, Salary, ImportList, ImportProduct, Debt
+from .models import ExpenseType, Expense, Salary, ImportList, ImportProduct, Debt, DailyBranchStats
 
 
 @admin.register(Debt)
@@ -39,6 +39,7 @@ class ImportListAdmin(admin.ModelAdmin):
     list_display = ('supplier', 'total', 'paid', 'debt', 'branch', 'created_at')
     search_fields = ('supplier__first_name', 'branch__name')
     list_filter = ('branch', 'created_at')
+    list_select_related = ('supplier', 'branch')
     inlines = [ImportProductInline]
 
 
@@ -48,3 +49,16 @@ class ImportListAdmin(admin.ModelAdmin):
 #     search_fields = ('product__name', 'import_list__branch__name')
 #     list_filter = ('import_list__branch',)
 
+
+
+@admin.register(DailyBranchStats)
+class DailyBranchStatsAdmin(admin.ModelAdmin):
+    list_display = ('branch', 'date', 'product_total', 'service_total', 'expense_total', 'is_dirty', 'updated_at')
+    list_filter = ('branch', 'is_dirty', 'date')
+    list_select_related = ('branch',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
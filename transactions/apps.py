@@ -7,3 +7,6 @@ class TransactionsConfig(AppConfig):
     name = 'transactions'
     verbose_name = _('Transactions')
 
+
+    def ready(self):
+        import transactions.signals
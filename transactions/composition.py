@@ -0,0 +1,98 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import FloatField
+from django.utils import timezone
+
+from core.balances import increment_many
+from inventory.catalog import WarehouseLookup
+from inventory.models import Product, WarehouseValuation, lookup_key
+from .models import ImportList, ImportProduct
+
+
+def compose_import(import_data, products_data):
+    """
+    Creates an import with all of its lines in a fixed number of queries.
+
+    Every line is resolved and priced in memory with the same rules as ``ImportProduct.save``: the
+    warehouse products of the branch are looked up for the whole batch at once, missing ones are
+    inserted with one ``bulk_create``, the stock of existing ones is raised by one aggregated UPDATE
+    and their prices set by one ``bulk_update``. The list total and supplier debt are saved once
+    and the warehouse valuation moved by one UPDATE.
+    """
+    with transaction.atomic():
+        import_list = ImportList.objects.create(**import_data, total=0, debt=0)
+        return import_list, add_import_lines(import_list, products_data)
+
+
+def add_import_lines(import_list, products_data):
+    """
+    Adds lines to the saved ``import_list`` as ``compose_import`` does, raising its total and debt, so
+    a long import can be composed a chunk at a time.
+
+    A line's product may also be an unsaved ``Product`` carrying the code, name, unit and minimum
+    amount of a line read from a file: the line is then booked on the warehouse product it resolves
+    to, created if there is none.
+    """
+    with transaction.atomic():
+        branch = import_list.branch
+        lookup = WarehouseLookup(branch.pk)
+        lookup.prefetch([product_data['product']['id'] for product_data in products_data])
+
+        warehouse_sell, warehouse_arrival = WarehouseValuation.totals(branch)
+        initial, created, changed = {}, {}, {}
+        received = defaultdict(float)
+        lines = []
+        for product_data in products_data:
+            product_data = dict(product_data)
+            product = product_data.pop('product')['id']
+            line = ImportProduct(import_list=import_list, product=product, **product_data)
+
+            warehouse = lookup.get(product.code, product.name)
+            if warehouse is None:
+                warehouse = Product(
+                    code=product.code, code_key=lookup_key(product.code),
+                    name=product.name, name_key=lookup_key(product.name) or '',
+                    amount=0, unit=product.unit, min_amount=product.min_amount,
+                    is_temp=False, supplier=import_list.supplier, branch=branch
+                )
+                lookup.add(warehouse)
+                created[id(warehouse)] = warehouse
+                line.product = warehouse
+            elif id(warehouse) not in created:
+                changed[warehouse.pk] = warehouse
+                received[warehouse.pk] += line.amount
+            if product.pk is None:
+                line.product = warehouse
+            initial.setdefault(id(warehouse), warehouse.valuation())
+
+            _, sell_before, arrival_before = warehouse.valuation()
+            warehouse.amount += line.amount
+            warehouse.arrival_price, warehouse.sell_price = line.arrival_price, line.sell_price
+            _, sell_after, arrival_after = warehouse.valuation()
+            warehouse_sell += sell_after - sell_before
+            warehouse_arrival += arrival_after - arrival_before
+
+            line.total_summ = line.arrival_price * Decimal(line.amount)
+            line.warehouse_remainder_sell_price = warehouse_sell
+            line.warehouse_remainder_arrival_price = warehouse_arrival
+            import_list.total += line.total_summ
+            lines.append(line)
+
+        import_list.debt = import_list.total - (import_list.paid or 0)
+        import_list.save()
+
+        Product.objects.bulk_create(created.values())
+        if changed:
+            increment_many(Product, 'amount', received, FloatField())
+            now = timezone.now()
+            for product in changed.values():
+                product.updated_at = now
+            Product.objects.bulk_update(changed.values(), ['arrival_price', 'sell_price', 'updated_at'])
+        ImportProduct.objects.bulk_create(lines)
+
+        products = [*created.values(), *changed.values()]
+        WarehouseValuation.apply_changes((initial[id(product)], product.valuation()) for product in products)
+
+        return lines
@@ -0,0 +1,119 @@
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import translation
+from rest_framework.exceptions import ValidationError
+
+from core.uploads import read_table
+from inventory.models import Product, lookup_key
+from .composition import add_import_lines
+from .models import ImportList
+from .serializers import InvoiceRowSerializer
+
+# the columns of an invoice (the first ones required), with other names suppliers head them with
+SYNONYMS = {
+    'name': ('product', 'title'),
+    'amount': ('quantity', 'qty', 'count'),
+    'arrival_price': ('price', 'cost', 'purchase price', 'import price'),
+    'sell_price': ('retail price', 'sale price', 'export price'),
+    'code': ('sku', 'article'),
+    'unit': (),
+}
+REQUIRED = ('name', 'amount', 'arrival_price', 'sell_price')
+# rows above the header (an invoice's title, number, date) searched for it
+HEADER_SEARCH_ROWS = 20
+MAX_REPORTED_ERRORS = 1000
+
+
+def header_key(value):
+    return lookup_key(str(value).replace('_', ' ')) if value is not None else None
+
+
+def column_names():
+    """Header names each invoice column is recognized by: its own, the product field's in every language, synonyms."""
+    names = {field: {header_key(field), *map(header_key, synonyms)} for field, synonyms in SYNONYMS.items()}
+    for language, _ in settings.LANGUAGES:
+        with translation.override(language):
+            for field in names:
+                names[field].add(header_key(Product._meta.get_field(field).verbose_name))
+    return names
+
+
+def map_columns(header, names):
+    """``{field: index}`` of the columns of ``header`` named as in ``names``; ``None`` unless all required are there."""
+    keys = [header_key(cell) for cell in header]
+    mapping = {}
+    for field, aliases in names.items():
+        index = next((index for index, key in enumerate(keys) if key in aliases), None)
+        if index is not None:
+            mapping[field] = index
+    return mapping if all(field in mapping for field in REQUIRED) else None
+
+
+def _cell(row, index):
+    value = row[index] if index < len(row) else None
+    value = str(value).strip() if value is not None else ''
+    return value or None
+
+
+def import_invoice(import_data, file, columns=None, chunk_size=500, progress=None):
+    """
+    Imports the supplier invoice ``file`` (CSV or XLSX) as one import list made from ``import_data``.
+
+    The file is read a row at a time. The header is looked for among the first rows, by the names of
+    ``column_names()`` or, for the fields in ``columns``, by the header given there. Rows are then
+    validated and added to the list ``chunk_size`` at a time with ``add_import_lines``, so memory and
+    the queries per row stay the same whatever the length of the invoice. Invalid rows are left out
+    and reported.
+
+    ``progress``, if given, is called with the report after every chunk.
+
+    Returns the import list (``None`` if no row was valid) and a report of the rows read, the lines
+    imported and the errors of the rows, by their number in the file.
+    """
+    names = column_names()
+    for field, name in (columns or {}).items():
+        if field not in names:
+            raise ValidationError({'columns': f'Unknown column "{field}", expected one of {", ".join(names)}.'})
+        names[field] = {header_key(name)}
+
+    rows = enumerate(read_table(file), start=1)
+    row_serializer = InvoiceRowSerializer()
+    import_list, report = None, {'rows': 0, 'imported': 0, 'error_count': 0, 'errors': []}
+    try:
+        mapping = next(filter(None, (map_columns(row, names) for _, row in islice(rows, HEADER_SEARCH_ROWS))), None)
+        if mapping is None:
+            raise ValidationError({'detail': f'No header naming the columns {", ".join(REQUIRED)} was found.'})
+
+        with transaction.atomic():
+            while chunk := list(islice(rows, chunk_size)):
+                products_data = []
+                for number, row in chunk:
+                    data = {field: _cell(row, index) for field, index in mapping.items()}
+                    if not any(data.values()):
+                        continue
+                    report['rows'] += 1
+                    try:
+                        line = row_serializer.run_validation(data)
+                    except ValidationError as error:
+                        report['error_count'] += 1
+                        if len(report['errors']) < MAX_REPORTED_ERRORS:
+                            report['errors'].append({'row': number, 'errors': error.detail})
+                        continue
+                    product = Product(code=line.get('code') or None, name=line['name'], unit=line.get('unit') or None)
+                    products_data.append({
+                        'product': {'id': product}, 'amount': line['amount'],
+                        'arrival_price': line['arrival_price'], 'sell_price': line['sell_price'],
+                    })
+
+                if products_data:
+                    if import_list is None:
+                        import_list = ImportList.objects.create(**import_data, total=0, debt=0)
+                    add_import_lines(import_list, products_data)
+                    report['imported'] += len(products_data)
+                if progress is not None:
+                    progress(report)
+    except ValueError as error:
+        raise ValidationError({'detail': str(error)}) from error
+    return import_list, report
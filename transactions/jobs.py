@@ -0,0 +1,53 @@
+import os
+from datetime import date
+
+from rest_framework.exceptions import ValidationError
+
+from jobs.tasks import task
+from .invoices import import_invoice
+from .models import ImportList
+from .serializers import ImportListSummarySerializer
+from .statistics import branch_days, range_report, refresh_days
+
+# days recomputed per batch of queries, as ``rebuild_daily_stats --chunk-days``
+REBUILD_CHUNK_DAYS = 31
+
+
+@task('transactions.import_invoice', max_attempts=1)
+def import_invoice_job(job, path, import_data, columns=None):
+    """
+    Imports the invoice uploaded to ``path`` (see ``ImportUploadView``). It is run once: a second
+    attempt could import the rows of a list the first one left behind again.
+    """
+    data = {name: ImportList._meta.get_field(name).to_python(value) for name, value in import_data.items()}
+    data['supplier_id'] = data.pop('supplier', None)
+
+    def progress(report):
+        job.set_progress(message=f"{report['rows']} rows read, {report['imported']} imported")
+
+    try:
+        with open(path, 'rb') as file:
+            import_list, report = import_invoice({**data, 'branch_id': job.branch_id}, file, columns,
+                                                 progress=progress)
+    finally:
+        os.remove(path)
+    if import_list is None:
+        raise ValidationError(report)
+    return {'import_list': ImportListSummarySerializer(import_list).data, **report}
+
+
+@task('transactions.rebuild_daily_stats')
+def rebuild_daily_stats(job, start=None, end=None):
+    """Recomputes the daily statistics of the job's branch, as the ``rebuild_daily_stats`` command."""
+    days = branch_days(job.branch_id, start and date.fromisoformat(start), end and date.fromisoformat(end))
+    for offset in range(0, len(days), REBUILD_CHUNK_DAYS):
+        refresh_days(job.branch_id, days[offset:offset + REBUILD_CHUNK_DAYS])
+        job.set_progress(min(offset + REBUILD_CHUNK_DAYS, len(days)) / len(days),
+                         f'{days[offset]} .. {days[min(offset + REBUILD_CHUNK_DAYS, len(days)) - 1]}')
+    return {'days': len(days), 'start': days[0] if days else None, 'end': days[-1] if days else None}
+
+
+@task('transactions.range_statistics')
+def range_statistics_job(job, branches, start, end):
+    """The report of ``BranchRangeStatisticsView`` for ``branches``, its ``background`` form."""
+    return range_report(branches, date.fromisoformat(start), date.fromisoformat(end))
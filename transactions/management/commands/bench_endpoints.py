@@ -0,0 +1,208 @@
+import json
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from statistics import median
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+
+from core.dataset import Size, generate, scratch_database
+from core.metrics import registry
+from inventory.models import Car, Product
+from services.models import Order
+from transactions.models import ImportList
+from users.models import Client, Employee, Supplier
+
+SIZES = {
+    'small': Size(clients=50, products=100, orders=200, imports=30, ledger=50, days=30),
+    'medium': Size(),
+    'large': Size(clients=1000, products=2000, orders=10000, imports=1000, ledger=1000, days=365),
+}
+
+
+class Command(BaseCommand):
+    help = ('Time the public endpoints on generated datasets of several sizes and write a JSON report; with '
+            '--compare, fail on regressions against an earlier report')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', choices=SIZES, default=['small', 'medium'])
+        parser.add_argument('--branches', type=int, default=3, help='Branches generated (the first one is measured)')
+        parser.add_argument('--repeat', type=int, default=5, help='Requests per endpoint')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the report to this file instead of stdout')
+        parser.add_argument('--compare', help='Earlier report to compare with')
+        parser.add_argument('--threshold', type=float, default=25,
+                            help='Percent a median may grow before it counts as a regression')
+        parser.add_argument('--min-ms', type=float, default=2,
+                            help='Smaller growths of a median are noise, not regressions')
+
+    def handle(self, *args, **options):
+        report = {'meta': self.meta(options), 'results': {}}
+        # a private cache and metrics directory: nothing is served from (or left in) the real ones
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+                CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                METRICS_DIR=directory):
+            try:
+                for name in options['sizes']:
+                    report['results'][name] = self.run_size(SIZES[name], options, directory)
+            finally:
+                registry.reset()
+
+        content = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(content + '\n')
+            self.summary(report)
+        else:
+            self.stdout.write(content)
+        if options['compare']:
+            with open(options['compare']) as file:
+                self.compare(json.load(file), report, options['threshold'], options['min_ms'])
+
+    def meta(self, options):
+        try:
+            commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                                    capture_output=True, text=True).stdout.strip() or None
+        except OSError:
+            commit = None
+        return {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'commit': commit,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'seed': options['seed'],
+            'branches': options['branches'],
+            'repeat': options['repeat'],
+        }
+
+    def run_size(self, size, options, directory):
+        # every size gets a fresh database with committed data: the range statistics read it from other
+        # threads, which would not see (or would wait for) rows inside a transaction left open for a rollback
+        with scratch_database(directory):
+            cache.clear()
+            return self.measure(size, options)
+
+    def measure(self, size, options):
+        started = time.perf_counter()
+        generated = generate(options['branches'], size, seed=options['seed'])[0]
+        self.stderr.write(f"Generated {options['branches']} x {size} in {time.perf_counter() - started:.1f} s")
+
+        client = APIClient()
+        client.force_authenticate(generated.user)
+        results = {}
+        for label, method, url, data in self.endpoints(generated):
+            timings, queries, statuses = [], [], set()
+            for _ in range(options['repeat']):
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    response = getattr(client, method)(url, data, format='json')
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                    timings.append((time.perf_counter() - started) * 1000)
+                queries.append(len(captured))
+                statuses.add(response.status_code)
+            results[label] = {
+                'status': sorted(statuses),
+                'first_ms': round(timings[0], 2),
+                'median_ms': round(median(timings), 2),
+                'max_ms': round(max(timings), 2),
+                'first_queries': queries[0],
+                'queries': queries[-1],
+            }
+            if any(status >= 400 for status in statuses):
+                self.stderr.write(self.style.WARNING(f"{label} answered {sorted(statuses)}: {response.content[:200]}"))
+        return results
+
+    def endpoints(self, generated):
+        branch = generated.branch
+        first, last = generated.first_day.isoformat(), generated.last_day.isoformat()
+        order = Order.objects.filter(branch=branch).latest('created_at')
+        import_list = ImportList.objects.filter(branch=branch).latest('created_at')
+        product = Product.objects.filter(branch=branch, is_temp=False).order_by('-amount').first()
+        car = Car.objects.filter(branch=branch).first()
+        supplier = Supplier.objects.filter(branch=branch).first()
+        manager = Employee.objects.filter(branch=branch, position='manager').first()
+        mechanic = Employee.objects.filter(branch=branch, position='mechanic').first()
+        service = order.orderservice_set.first().service
+        client = Client.objects.filter(branch=branch).first()
+        year, month = generated.last_day.year, generated.last_day.month
+
+        return [
+            ('GET /service/orders/', 'get', '/service/orders/', None),
+            ('GET /service/orders/ cursor', 'get', '/service/orders/', {'pagination': 'cursor'}),
+            ('GET /service/order/<pk>/', 'get', f'/service/order/{order.pk}/', None),
+            ('POST /service/orders/', 'post', '/service/orders/', {
+                'car': car.pk, 'paid': 0, 'manager': manager.pk,
+                'services': [{'service': service.pk, 'part': 1, 'mechanic': mechanic.pk}],
+                'products': [{'product': product.pk, 'amount': 1}],
+            }),
+            ('GET /service/orders/export/csv/', 'get', '/service/orders/export/csv/', {'start': first, 'end': last}),
+            ('GET /inventory/products/', 'get', '/inventory/products/', None),
+            ('GET /inventory/all-products/', 'get', '/inventory/all-products/', None),
+            ('GET /inventory/products-out/', 'get', '/inventory/products-out/', None),
+            ('GET /inventory/product-temps/', 'get', '/inventory/product-temps/', None),
+            ('GET /inventory/products/search/ name', 'get', '/inventory/products/search/',
+             {'q': product.name.split()[0]}),
+            ('GET /inventory/products/search/ substring', 'get', '/inventory/products/search/',
+             {'q': product.name_key[1:6]}),
+            ('GET /inventory/products/code/<code>/', 'get', f'/inventory/products/code/{product.code}/', None),
+            ('GET /inventory/services/', 'get', '/inventory/services/', None),
+            ('GET /inventory/cars/', 'get', '/inventory/cars/', None),
+            ('GET /user/clients/', 'get', '/user/clients/', None),
+            ('GET /user/suppliers/', 'get', '/user/suppliers/', None),
+            ('GET /user/client/<pk>/', 'get', f'/user/client/{client.pk}/', None),
+            ('GET /transaction/import-lists/', 'get', '/transaction/import-lists/', None),
+            ('GET /transaction/import-list/<pk>/', 'get', f'/transaction/import-list/{import_list.pk}/', None),
+            ('POST /transaction/import/', 'post', '/transaction/import/', {
+                'supplier': supplier.pk, 'paid': 1000, 'payment_type': '1',
+                'products': [{'product': {'id': product.pk, 'name': product.name}, 'amount': 5,
+                              'arrival_price': int(product.arrival_price), 'sell_price': int(product.sell_price)}],
+            }),
+            ('GET /transaction/debts/', 'get', '/transaction/debts/', None),
+            ('GET /transaction/lendings/', 'get', '/transaction/lendings/', None),
+            ('GET /transaction/expenses/', 'get', '/transaction/expenses/', None),
+            ('GET /transaction/salaries/', 'get', '/transaction/salaries/', None),
+            ('GET /transaction/expenses/export/csv/', 'get', '/transaction/expenses/export/csv/',
+             {'start': first, 'end': last}),
+            ('GET /transaction/statistics/<month>/', 'get', f'/transaction/statistics/{year}/{month}/', None),
+            ('GET /transaction/statistics/<day>/', 'get',
+             f'/transaction/statistics/{year}/{month}/{generated.last_day.day}/', None),
+            ('GET /transaction/statistics/range/', 'get', '/transaction/statistics/range/',
+             {'start': first, 'end': last}),
+            ('GET /branch/', 'get', '/branch/', None),
+        ]
+
+    def summary(self, report):
+        for size, results in report['results'].items():
+            self.stdout.write(self.style.MIGRATE_HEADING(size))
+            self.stdout.write(f"  {'endpoint':<44} {'first ms':>9} {'median ms':>10} {'queries':>8}")
+            for label, result in results.items():
+                self.stdout.write(f"  {label:<44} {result['first_ms']:>9.1f} {result['median_ms']:>10.1f} "
+                                  f"{result['queries']:>8}")
+
+    def compare(self, baseline, report, threshold, min_ms):
+        regressions = []
+        for size, results in report['results'].items():
+            for label, result in results.items():
+                before = baseline.get('results', {}).get(size, {}).get(label)
+                if not before:
+                    continue
+                grown = result['median_ms'] - before['median_ms']
+                if grown > min_ms and result['median_ms'] > before['median_ms'] * (1 + threshold / 100):
+                    regressions.append(f"{size} {label}: median {before['median_ms']} -> {result['median_ms']} ms")
+                if result['queries'] > before['queries']:
+                    regressions.append(f"{size} {label}: queries {before['queries']} -> {result['queries']}")
+        for regression in regressions:
+            self.stdout.write(self.style.WARNING(regression))
+        if regressions:
+            raise CommandError(f"{len(regressions)} regression(s) against {baseline.get('meta', {}).get('commit')}")
+        self.stdout.write(self.style.SUCCESS('No regressions'))
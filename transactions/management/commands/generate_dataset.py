@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.dataset import Size, generate
+
+
+class Command(BaseCommand):
+    help = ('Generate branches of realistic data (people, cars, services, products, orders with lines, imports, '
+            'debts, lendings, expenses and salaries); the same seed gives the same data')
+
+    def add_arguments(self, parser):
+        defaults = Size()
+        parser.add_argument('--branches', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--clients', type=int, default=defaults.clients, help='Clients per branch')
+        parser.add_argument('--products', type=int, default=defaults.products, help='Products per branch')
+        parser.add_argument('--orders', type=int, default=defaults.orders, help='Orders per branch')
+        parser.add_argument('--imports', type=int, default=defaults.imports, help='Import lists per branch')
+        parser.add_argument('--ledger', type=int, default=defaults.ledger,
+                            help='Debts, lendings and expenses per branch (and a quarter as many salaries)')
+        parser.add_argument('--days', type=int, default=defaults.days, help='Days the activity is spread over')
+        parser.add_argument('--password', help='Password of the generated branch users (unusable without it)')
+
+    def handle(self, *args, **options):
+        size = Size(**{field: options[field] for field in Size.__dataclass_fields__})
+        started = time.perf_counter()
+        generated = generate(options['branches'], size, seed=options['seed'])
+        for item in generated:
+            if options['password']:
+                item.user.set_password(options['password'])
+                item.user.save(update_fields=['password'])
+            self.stdout.write(f"{item.branch.name} (#{item.branch.id}): user {item.user.username}, "
+                              f"{item.first_day} .. {item.last_day}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {len(generated)} branch(es) in {time.perf_counter() - started:.1f} s"))
@@ -0,0 +1,40 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from branches.models import Branch
+from transactions.models import DailyBranchStats
+from transactions.statistics import branch_days, refresh_days
+
+
+class Command(BaseCommand):
+    help = 'Backfill the daily branch statistics rollup, or recompute only the days flagged as dirty'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--branch', type=int, action='append', help='Only rebuild these branch ids')
+        parser.add_argument('--start', type=date.fromisoformat, help='First day (YYYY-MM-DD), defaults to the first record')
+        parser.add_argument('--end', type=date.fromisoformat, help='Last day (YYYY-MM-DD), defaults to today')
+        parser.add_argument('--chunk-days', type=int, default=31, help='Days recomputed per batch of queries')
+        parser.add_argument('--dirty', action='store_true', help='Only recompute days flagged as dirty')
+
+    def handle(self, *args, **options):
+        if options['chunk_days'] < 1:
+            raise CommandError('--chunk-days must be positive')
+        branches = Branch.objects.order_by('id')
+        if options['branch']:
+            branches = branches.filter(id__in=options['branch'])
+
+        total = 0
+        for branch in branches:
+            if options['dirty']:
+                days = list(DailyBranchStats.objects.filter(branch=branch, is_dirty=True).order_by(
+                    'date').values_list('date', flat=True))
+            else:
+                days = branch_days(branch.id, options['start'], options['end'])
+            for offset in range(0, len(days), options['chunk_days']):
+                refresh_days(branch.id, days[offset:offset + options['chunk_days']])
+            total += len(days)
+            if days:
+                self.stdout.write(f"{branch.name} (#{branch.id}): {len(days)} day(s) from {days[0]} to {days[-1]}")
+
+        self.stdout.write(self.style.SUCCESS(f"Daily statistics rebuilt for {total} day(s)"))
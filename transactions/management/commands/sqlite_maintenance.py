@@ -0,0 +1,60 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+
+def size(path):
+    try:
+        value = os.path.getsize(path)
+    except OSError:
+        return '-'
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if value < 1024 or unit == 'GB':
+            return f'{value:.1f} {unit}' if unit != 'B' else f'{value} B'
+        value /= 1024
+
+
+class Command(BaseCommand):
+    help = ('Refresh the query planner statistics of the SQLite database (ANALYZE, PRAGMA optimize), '
+            'optionally VACUUM it, truncate the WAL and report file sizes before and after')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vacuum', action='store_true',
+                            help='Also rebuild the file to drop free pages (locks the database while it runs)')
+        parser.add_argument('--report', action='store_true', help='Only report the sizes')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError(f"The default database is {connection.vendor}, not SQLite")
+
+        self.report('Before' if not options['report'] else 'Now')
+        if options['report']:
+            return
+
+        steps = [('ANALYZE', 'ANALYZE'), ('PRAGMA optimize', 'PRAGMA optimize')]
+        if options['vacuum']:
+            steps.append(('VACUUM', 'VACUUM'))
+        steps.append(('WAL checkpoint', 'PRAGMA wal_checkpoint(TRUNCATE)'))
+        with connection.cursor() as cursor:
+            for label, sql in steps:
+                started = time.perf_counter()
+                cursor.execute(sql)
+                result = cursor.fetchone()
+                self.stdout.write(f"{label:<16} {(time.perf_counter() - started) * 1000:>9.1f} ms")
+                if sql.startswith('PRAGMA wal_checkpoint') and result and result[0]:
+                    self.stdout.write(self.style.WARNING('  readers kept the WAL from being fully checkpointed'))
+        self.report('After')
+
+    def report(self, title):
+        path = str(connection.settings_dict['NAME'])
+        with connection.cursor() as cursor:
+            pragmas = {
+                name: cursor.execute(f'PRAGMA {name}').fetchone()[0]
+                for name in ('journal_mode', 'page_size', 'page_count', 'freelist_count')
+            }
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{title}:'))
+        self.stdout.write(f"  database {size(path)}, WAL {size(path + '-wal')}, shared memory {size(path + '-shm')}")
+        self.stdout.write(f"  journal {pragmas['journal_mode']}, {pragmas['page_count']} pages of "
+                          f"{pragmas['page_size']} B, {pragmas['freelist_count']} free")
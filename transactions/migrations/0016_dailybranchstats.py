@@ -0,0 +1,54 @@
+# Generated by Django 5.0.7 on 2026-10-18 07:58
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('branches', '0006_walletmovement'),
+        ('transactions', '0015_remove_importproduct_warehouse_remainder_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyBranchStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Date')),
+                ('product_overall_total', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='Sold products total')),
+                ('product_total', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='Sold products total with discount')),
+                ('product_net_profit', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='Sold products net profit')),
+                ('service_overall_total', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='Services total')),
+                ('service_total', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='Services total with discount')),
+                ('expense_total', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='Expenses total')),
+                ('expense_details', models.JSONField(blank=True, default=list, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Expenses by type')),
+                ('supplier_payment_total', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='Supplier payments total')),
+                ('supplier_payment_details', models.JSONField(blank=True, default=list, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Supplier payments by supplier')),
+                ('import_paid_total', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='Imports paid total')),
+                ('import_paid_details', models.JSONField(blank=True, default=list, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Imports paid by supplier')),
+                ('warehouse_import_total', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='Warehouse imports total')),
+                ('warehouse_import_paid', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='Warehouse imports paid')),
+                ('not_transfer_arrival_price', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='Not transfer arrival price')),
+                ('not_transfer_sell_price', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='Not transfer sell price')),
+                ('by_transfer_arrival_price', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='By transfer arrival price')),
+                ('by_transfer_sell_price', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='By transfer sell price')),
+                ('warehouse_remainder_sell_price', models.FloatField(default=0, verbose_name='Warehouse remainder sell price')),
+                ('warehouse_remainder_arrival_price', models.FloatField(default=0, verbose_name='Warehouse remainder arrival price')),
+                ('warehouse_remainder_at', models.DateTimeField(blank=True, null=True, verbose_name='Warehouse remainder at')),
+                ('is_dirty', models.BooleanField(db_index=True, default=False, verbose_name='Is dirty')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated at')),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='branches.branch', verbose_name='Branch')),
+            ],
+            options={
+                'verbose_name': 'Daily branch statistics',
+                'verbose_name_plural': 'Daily branch statistics',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailybranchstats',
+            constraint=models.UniqueConstraint(fields=('branch', 'date'), name='unique_daily_branch_stats'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('branches', '0006_walletmovement'),
+        ('transactions', '0016_dailybranchstats'),
+        ('users', '0011_alter_usertemp_last_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='debt',
+            index=models.Index(fields=['branch', 'created_at', 'id'], name='debt_branch_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='debt',
+            index=models.Index(fields=['branch', 'is_debt', 'created_at'], name='debt_branch_kind_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['branch', 'created_at', 'id'], name='expense_branch_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='importlist',
+            index=models.Index(fields=['branch', 'created_at', 'id'], name='importlist_branch_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lending',
+            index=models.Index(fields=['branch', 'created_at', 'id'], name='lending_branch_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='salary',
+            index=models.Index(fields=['branch', 'created_at', 'id'], name='salary_branch_created_idx'),
+        ),
+    ]
@@ -1,10 +1,12 @@
 from decimal import Decimal
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
 from rest_framework.exceptions import ValidationError
-from django.db.models import Sum, Case, When, F, DecimalField
 from branches.models import Branch, Wallet
-from inventory.models import Product
+from core.balances import increment
+from inventory.catalog import WarehouseLookup
+from inventory.models import Product, WarehouseValuation
 from users.models import User, Employee, Supplier, Client
 
 
@@ -21,33 +23,27 @@ class Debt(models.Model):
     class Meta:
         verbose_name = _('Debt')
         verbose_name_plural = _('Debts')
+        indexes = [
+            models.Index(fields=['branch', 'created_at', 'id'], name='debt_branch_created_idx'),
+            # supplier payments of the statistics: is_debt=False over a date range
+            models.Index(fields=['branch', 'is_debt', 'created_at'], name='debt_branch_kind_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.supplier.first_name} - {self.debt_amount}"
 
     def save(self, *args, **kwargs):
         with transaction.atomic():
-            wallet = Wallet.objects.last()
+            amount = self.debt_amount
             if self.pk:
-                old_instance = Debt.objects.get(pk=self.pk)
-                if self.is_debt:
-                    self.supplier.debt -= old_instance.debt_amount
-                    wallet -= old_instance.debt_amount
-                else:
-                    self.supplier.debt += old_instance.debt_amount
-                    wallet += old_instance.debt_amount
+                amount -= Debt.objects.get(pk=self.pk).debt_amount
 
             super().save(*args, **kwargs)
 
-            if self.is_debt:
-                self.supplier.debt += self.debt_amount
-                wallet.balance += self.debt_amount
-            else:
-                if self.supplier.debt < self.debt_amount:
-                    raise ValidationError({'detail': 'Paying debt amount is greater than branch debt from supplier'})
-                wallet.balance -= self.debt_amount
-                self.supplier.debt -= self.debt_amount
-            self.supplier.save()
+            if not self.is_debt:
+                amount = -amount
+            if not increment(self.supplier, minimum=0, debt=amount):
+                raise ValidationError({'detail': 'Paying debt amount is greater than branch debt from supplier'})
 
 
 class ImportList(models.Model):
@@ -65,6 +61,9 @@ class ImportList(models.Model):
     class Meta:
         verbose_name = _('Import list')
         verbose_name_plural = _('Import lists')
+        indexes = [
+            models.Index(fields=['branch', 'created_at', 'id'], name='importlist_branch_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.branch.name} - {self.description}"
@@ -79,19 +78,17 @@ class ImportList(models.Model):
                     self.paid = 0
                     super().save(*args, **kwargs)
                 else:
-                    wallet = Wallet.objects.last()
+                    debt, paid = self.debt or 0, self.paid or 0
                     if self.pk:
                         old_instance = ImportList.objects.get(pk=self.pk)
-                        self.supplier.debt -= old_instance.debt
-                        wallet.balance += old_instance.paid
+                        debt -= old_instance.debt or 0
+                        paid -= old_instance.paid or 0
 
                     super().save(*args, **kwargs)
 
-                    self.supplier.debt += self.debt
-                    wallet.balance -= self.paid
-
-                    wallet.save()
-                    self.supplier.save()
+                    if self.supplier:
+                        increment(self.supplier, debt=debt)
+                    Wallet.add(-paid, branch=self.branch, description=f'Import #{self.pk}')
 
 
     # def delete(self, *args, **kwargs):
@@ -122,22 +119,25 @@ class ImportProduct(models.Model):
     def __str__(self):
         return f"{self.product.name} - {self.amount}"
 
-    def save(self, *args, **kwargs):
+    def save(self, *args, lookup=None, **kwargs):
+        """
+        Adds the line to the stock of the warehouse product of the import's branch with the line
+        product's code or name, which is created if there is none. ``lookup``, a ``WarehouseLookup``
+        of that branch, is shared by the lines of a batch to resolve each product once.
+        """
         with transaction.atomic():
+            old_amount, old_total_summ = 0, 0
             if self.pk:
                 old_instance = ImportProduct.objects.get(pk=self.pk)
-                old_total_summ = old_instance.total_summ
-                old_amount = old_instance.amount
-                self.product.amount -= old_amount
-                self.import_list.total -= old_total_summ
-
-            available = Product.objects.filter(name=self.product.name, is_temp=False)
-            if available:
-                wareProduct = available.last()
-                wareProduct.amount += self.amount
+                old_amount, old_total_summ = old_instance.amount, old_instance.total_summ or 0
+
+            lookup = lookup or WarehouseLookup(self.import_list.branch_id)
+            wareProduct = lookup.get(self.product.code, self.product.name)
+            if wareProduct:
+                wareProduct.change_amount(self.amount - old_amount)
                 wareProduct.arrival_price = self.arrival_price
                 wareProduct.sell_price = self.sell_price
-                wareProduct.save()
+                wareProduct.save(update_fields=['arrival_price', 'sell_price', 'updated_at'])
             else:
                 wareProduct = Product.objects.create(
                     code=self.product.code,
@@ -151,28 +151,16 @@ class ImportProduct(models.Model):
                     supplier=self.import_list.supplier,
                     branch=self.import_list.branch
                 )
+                lookup.add(wareProduct)
                 self.product = wareProduct
             self.total_summ = self.arrival_price * Decimal(self.amount)
 
-            obj_product_sell_price = self.product.sell_price if self.product.sell_price == self.sell_price else self.sell_price
-            obj_product_arrival_price = self.product.arrival_price if self.product.arrival_price == self.arrival_price else self.arrival_price
-
-            warehouse_products = Product.objects.filter(branch=self.import_list.branch, is_temp=False).exclude(id=self.product.id)
-            warehouse_total_sell = warehouse_products.filter(amount__gt=0).aggregate(
-                total_value=Sum(
-                    F("amount") * F("sell_price"), output_field=DecimalField()))["total_value"] or 0
-            self.warehouse_remainder_sell_price = warehouse_total_sell + (
-                    Decimal(self.amount) * obj_product_sell_price)
-            warehouse_total_arrival = warehouse_products.filter(amount__gt=0).aggregate(
-                total_value=Sum(
-                    F("amount") * F("arrival_price"), output_field=DecimalField()))["total_value"] or 0
-            self.warehouse_remainder_arrival_price = warehouse_total_arrival + (
-                    Decimal(self.amount) * obj_product_arrival_price)
+            self.warehouse_remainder_sell_price, self.warehouse_remainder_arrival_price = \
+                WarehouseValuation.totals(self.import_list.branch)
 
             super().save(*args, **kwargs)
 
-            self.import_list.total += self.total_summ
-            self.import_list.save()
+            increment(self.import_list, total=self.total_summ - old_total_summ)
 
 
 class BranchFundTransfer(models.Model):
@@ -192,12 +180,12 @@ class BranchFundTransfer(models.Model):
 
     def save(self, *args, **kwargs):
         with transaction.atomic():
-            wallet = Wallet.objects.last()
-            wallet.balance += self.branch.balance
-            wallet.save()
+            # the whole balance goes to the wallet: read under the row lock, whatever the caller read before
+            self.amount = Branch.objects.select_for_update().values_list('balance', flat=True).get(pk=self.branch_id)
+            Branch.objects.filter(pk=self.branch_id).update(balance=0)
             self.branch.balance = 0
-            self.branch.save()
             super().save(*args, **kwargs)
+            Wallet.add(self.amount, branch=self.branch, description=f'Branch fund #{self.pk}')
 
 
 class ExpenseType(models.Model):
@@ -224,24 +212,24 @@ class Expense(models.Model):
     class Meta:
         verbose_name = _('Expense')
         verbose_name_plural = _('Expenses')
+        indexes = [
+            models.Index(fields=['branch', 'created_at', 'id'], name='expense_branch_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.type.name} - {self.description}"
 
     def save(self, *args, **kwargs):
         with transaction.atomic():
+            amount = self.amount
             if self.pk:
-                old_instance = Expense.objects.get(pk=self.pk)
-                old_amount = old_instance.amount
-                self.branch.balance += old_amount
+                amount -= Expense.objects.get(pk=self.pk).amount
             super().save(*args, **kwargs)
-            self.branch.balance -= self.amount
-            self.branch.save()
+            increment(self.branch, balance=-amount)
 
     def delete(self, *args, **kwargs):
         with transaction.atomic():
-            self.branch.balance += self.amount
-            self.branch.save()
+            increment(self.branch, balance=self.amount)
             super(Expense, self).delete(*args, **kwargs)
 
 
@@ -258,35 +246,27 @@ class Salary(models.Model):
     class Meta:
         verbose_name = _('Salary')
         verbose_name_plural = _('Salaries')
+        indexes = [
+            models.Index(fields=['branch', 'created_at', 'id'], name='salary_branch_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.employee.first_name} - {self.description}"
 
     def save(self, *args, **kwargs):
         with transaction.atomic():
-            wallet = Wallet.objects.last()
+            amount = self.amount
             if self.pk:
-                old_instance = Salary.objects.get(pk=self.pk)
-                old_amount = old_instance.amount
-                wallet.balance += old_amount
-                self.employee.balance += old_amount
+                amount -= Salary.objects.get(pk=self.pk).amount
             super().save(*args, **kwargs)
 
-            wallet.balance -= self.amount
-            self.employee.balance -= self.amount
-
-            self.employee.save()
-            wallet.save()
+            increment(self.employee, balance=-amount)
+            Wallet.add(-amount, branch=self.branch, description=f'Salary #{self.pk}')
 
     def delete(self, *args, **kwargs):
         with transaction.atomic():
-            wallet = Wallet.objects.last()
-
-            self.employee.balance += self.amount
-            wallet.balance += self.amount
-
-            self.employee.save()
-            wallet.save()
+            increment(self.employee, balance=self.amount)
+            Wallet.add(self.amount, branch=self.branch, description=f'Salary #{self.pk} deleted')
 
             super(Salary, self).delete(*args, **kwargs)
 
@@ -303,45 +283,95 @@ class Lending(models.Model):
     class Meta:
         verbose_name = _('Lending')
         verbose_name_plural = _('Lendings')
+        indexes = [
+            models.Index(fields=['branch', 'created_at', 'id'], name='lending_branch_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.client.first_name} - {self.lending_amount}"
 
     def save(self, *args, **kwargs):
         with transaction.atomic():
+            lending = self.lending_amount if self.is_lending else -self.lending_amount
             if self.pk:
                 old_instance = Lending.objects.get(pk=self.pk)
-                old_amount = old_instance.lending_amount
-                if old_instance.is_lending:
-                    self.client.lending -= old_amount
-                else:
-                    self.client.lending += old_amount
-                    self.branch.balance -= old_amount
+                lending -= old_instance.lending_amount if old_instance.is_lending else -old_instance.lending_amount
 
             super().save(*args, **kwargs)
 
-            if self.is_lending:
-                self.client.lending += self.lending_amount
-                self.branch.balance -= self.lending_amount
-            else:
-                if self.client.lending < self.lending_amount:
-                    raise ValidationError({'detail': 'Lending amount is greater than client lending'})
-                self.client.lending -= self.lending_amount
-                self.branch.balance += self.lending_amount
-
-            self.branch.save()
-            self.client.save()
+            if not increment(self.client, minimum=0, lending=lending):
+                raise ValidationError({'detail': 'Lending amount is greater than client lending'})
+            increment(self.branch, balance=-lending)
 
     def delete(self, *args, **kwargs):
         with transaction.atomic():
-            if self.is_lending:
-                self.client.lending -= self.lending_amount
-                self.branch.balance += self.lending_amount
-            else:
-                self.client.lending += self.lending_amount
-                self.branch.balance -= self.lending_amount
-
-            self.branch.save()
-            self.client.save()
+            lending = self.lending_amount if self.is_lending else -self.lending_amount
+            increment(self.client, lending=-lending)
+            increment(self.branch, balance=lending)
 
             super(Lending, self).delete(*args, **kwargs)
+
+
+class DailyBranchStats(models.Model):
+    """
+    Per-day statistics of a branch, computed by ``transactions.statistics`` from the raw
+    order, expense, debt and import tables. Writes to those tables flag the day as dirty.
+    """
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE, related_name='daily_stats',
+                               verbose_name=_('Branch'))
+    date = models.DateField(verbose_name=_('Date'))
+
+    product_overall_total = models.DecimalField(max_digits=20, decimal_places=2, default=0,
+                                                verbose_name=_('Sold products total'))
+    product_total = models.DecimalField(max_digits=20, decimal_places=2, default=0,
+                                        verbose_name=_('Sold products total with discount'))
+    product_net_profit = models.DecimalField(max_digits=20, decimal_places=2, default=0,
+                                             verbose_name=_('Sold products net profit'))
+    service_overall_total = models.DecimalField(max_digits=20, decimal_places=2, default=0,
+                                                verbose_name=_('Services total'))
+    service_total = models.DecimalField(max_digits=20, decimal_places=2, default=0,
+                                        verbose_name=_('Services total with discount'))
+
+    expense_total = models.DecimalField(max_digits=20, decimal_places=2, default=0,
+                                        verbose_name=_('Expenses total'))
+    expense_details = models.JSONField(default=list, blank=True, encoder=DjangoJSONEncoder,
+                                       verbose_name=_('Expenses by type'))
+    supplier_payment_total = models.DecimalField(max_digits=20, decimal_places=2, default=0,
+                                                 verbose_name=_('Supplier payments total'))
+    supplier_payment_details = models.JSONField(default=list, blank=True, encoder=DjangoJSONEncoder,
+                                                verbose_name=_('Supplier payments by supplier'))
+
+    import_paid_total = models.DecimalField(max_digits=20, decimal_places=2, default=0,
+                                            verbose_name=_('Imports paid total'))
+    import_paid_details = models.JSONField(default=list, blank=True, encoder=DjangoJSONEncoder,
+                                           verbose_name=_('Imports paid by supplier'))
+    warehouse_import_total = models.DecimalField(max_digits=20, decimal_places=2, default=0,
+                                                 verbose_name=_('Warehouse imports total'))
+    warehouse_import_paid = models.DecimalField(max_digits=20, decimal_places=2, default=0,
+                                                verbose_name=_('Warehouse imports paid'))
+    not_transfer_arrival_price = models.DecimalField(max_digits=20, decimal_places=2, default=0,
+                                                     verbose_name=_('Not transfer arrival price'))
+    not_transfer_sell_price = models.DecimalField(max_digits=20, decimal_places=2, default=0,
+                                                  verbose_name=_('Not transfer sell price'))
+    by_transfer_arrival_price = models.DecimalField(max_digits=20, decimal_places=2, default=0,
+                                                    verbose_name=_('By transfer arrival price'))
+    by_transfer_sell_price = models.DecimalField(max_digits=20, decimal_places=2, default=0,
+                                                 verbose_name=_('By transfer sell price'))
+
+    warehouse_remainder_sell_price = models.FloatField(default=0, verbose_name=_('Warehouse remainder sell price'))
+    warehouse_remainder_arrival_price = models.FloatField(default=0,
+                                                          verbose_name=_('Warehouse remainder arrival price'))
+    warehouse_remainder_at = models.DateTimeField(null=True, blank=True, verbose_name=_('Warehouse remainder at'))
+
+    is_dirty = models.BooleanField(default=False, db_index=True, verbose_name=_('Is dirty'))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_('Updated at'))
+
+    class Meta:
+        verbose_name = _('Daily branch statistics')
+        verbose_name_plural = _('Daily branch statistics')
+        constraints = [
+            models.UniqueConstraint(fields=['branch', 'date'], name='unique_daily_branch_stats'),
+        ]
+
+    def __str__(self):
+        return f"{self.branch} - {self.date}"
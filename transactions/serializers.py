@@ -1,13 +1,17 @@
+import re
 from decimal import Decimal
 
-from django.db import transaction
 from django.shortcuts import get_object_or_404
 from rest_framework.exceptions import ValidationError
 from rest_framework.fields import SerializerMethodField
-from rest_framework.serializers import ModelSerializer, DecimalField
+from rest_framework.serializers import (
+    ModelSerializer, Serializer, CharField, DecimalField, FileField, FloatField, JSONField
+)
 
+from core.serializers import PrefetchedListSerializer
 from inventory.models import Product
 from inventory.serializers import ProductImportDetailSerializer, ProductSerializer, ProductImportNameSerializer
+from .composition import compose_import
 from .models import ExpenseType, Expense, Salary, ImportList, ImportProduct, Debt, BranchFundTransfer, Lending
 
 
@@ -34,6 +38,7 @@ class ImportProductSerializer(ModelSerializer):
     product = ProductImportNameSerializer()
     total_summ = SerializerMethodField()
     class Meta:
+        list_serializer_class = PrefetchedListSerializer
         model = ImportProduct
         fields = ['id', 'product', 'amount', 'arrival_price', 'sell_price', 'total_summ']
         read_only_fields = ['total_summ']
@@ -63,19 +68,10 @@ class ImportListSerializer(ModelSerializer):
         read_only_fields = ['total', 'debt', 'created_at', 'branch']
 
     def create(self, validated_data):
-        with transaction.atomic():
-            products_data = validated_data.pop('products')
-            import_list = ImportList.objects.create(**validated_data, total=0, debt=0)
-            products_list = []
-            for product_data in products_data:
-                product = product_data['product']['id']
-                product_data.pop('product')
-                pro_cr = ImportProduct.objects.create(import_list=import_list, product=product, **product_data)
-                products_list.append(pro_cr)
-            import_list.debt = import_list.total - import_list.paid
-            import_list.save()
-            import_list.products = products_list
-            return import_list
+        products_data = validated_data.pop('products')
+        import_list, products_list = compose_import(validated_data, products_data)
+        import_list.products = products_list
+        return import_list
 
 class GetImportListSerializer(ModelSerializer):
     products = ImportProductGetSerializer(source='importproduct_set', many=True,)
@@ -85,6 +81,56 @@ class GetImportListSerializer(ModelSerializer):
         fields = ['id', 'total', 'paid', 'debt', 'payment_type', 'supplier', 'description', 'created_at', 'branch', 'products']
 
 
+class ImportUploadSerializer(ModelSerializer):
+    file = FileField(write_only=True, help_text='Supplier invoice, CSV or XLSX, with a header row')
+    columns = JSONField(binary=True, required=False, write_only=True,
+                        help_text='Header of each column the header is not recognized by, e.g. {"amount": "Qty"}')
+
+    class Meta:
+        model = ImportList
+        fields = ['file', 'columns', 'supplier', 'paid', 'payment_type', 'description', 'is_initial_stock']
+
+    def validate_columns(self, value):
+        if not isinstance(value, dict) or not all(isinstance(name, str) for name in value.values()):
+            raise ValidationError('Expected an object of column headers.')
+        return value
+
+
+class ImportListSummarySerializer(ModelSerializer):
+    class Meta:
+        model = ImportList
+        fields = ['id', 'total', 'paid', 'debt', 'payment_type', 'supplier', 'description', 'is_initial_stock',
+                  'created_at', 'branch']
+
+
+class InvoiceRowSerializer(Serializer):
+    code = CharField(max_length=20, required=False, allow_blank=True, allow_null=True)
+    name = CharField(max_length=255)
+    unit = CharField(max_length=50, required=False, allow_blank=True, allow_null=True)
+    amount = FloatField()
+    arrival_price = DecimalField(max_digits=15, decimal_places=2, min_value=Decimal(0))
+    sell_price = DecimalField(max_digits=15, decimal_places=2, min_value=Decimal(0))
+
+    def to_internal_value(self, data):
+        # spreadsheets write numbers as "12 500" or "2,5"
+        data = dict(data)
+        for field in ('amount', 'arrival_price', 'sell_price'):
+            if isinstance(data.get(field), str):
+                value = re.sub(r'\s', '', data[field])
+                data[field] = value.replace(',', '' if '.' in value else '.')
+        return super().to_internal_value(data)
+
+    def validate_amount(self, value):
+        if not 0 < value < float('inf'):
+            raise ValidationError('Ensure this value is greater than 0.')
+        return value
+
+    def validate(self, data):
+        if data['sell_price'] < data['arrival_price']:
+            raise ValidationError("Sell price cannot be lower than the import price.")
+        return data
+
+
 class BranchFundTransferSerializer(ModelSerializer):
     class Meta:
         model = BranchFundTransfer
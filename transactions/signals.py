@@ -0,0 +1,48 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from inventory.models import Product
+from services.models import Order, OrderProduct, OrderService
+from users.models import Supplier, Client
+from .models import Debt, Expense, ImportList, ImportProduct, Lending
+from .statistics import mark_dirty, invalidate
+
+
+def _changed(branch_id, moment):
+    mark_dirty(branch_id, moment)
+    invalidate(branch_id, moment)
+
+
+def _parent_day(instance, descriptor, model):
+    if descriptor.is_cached(instance):
+        parent = getattr(instance, descriptor.field.name)
+        return parent.branch_id, parent.created_at
+    return model.objects.filter(pk=getattr(instance, descriptor.field.attname)).values_list(
+        'branch_id', 'created_at').first() or (None, None)
+
+
+@receiver([post_save, post_delete], sender=Order)
+@receiver([post_save, post_delete], sender=Expense)
+@receiver([post_save, post_delete], sender=Debt)
+@receiver([post_save, post_delete], sender=ImportList)
+def branch_record_changed(sender, instance, **kwargs):
+    _changed(instance.branch_id, instance.created_at)
+
+
+@receiver([post_save, post_delete], sender=OrderProduct)
+@receiver([post_save, post_delete], sender=OrderService)
+def order_line_changed(sender, instance, **kwargs):
+    _changed(*_parent_day(instance, sender.order, Order))
+
+
+@receiver([post_save, post_delete], sender=ImportProduct)
+def import_line_changed(sender, instance, **kwargs):
+    _changed(*_parent_day(instance, ImportProduct.import_list, ImportList))
+
+
+@receiver([post_save, post_delete], sender=Lending)
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Supplier)
+@receiver([post_save, post_delete], sender=Client)
+def branch_balance_changed(sender, instance, **kwargs):
+    invalidate(instance.branch_id)
@@ -0,0 +1,498 @@
+import asyncio
+from collections import defaultdict
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Sum, Max, Min, F, Q, DecimalField
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from core.async_views import run_report
+from core.versions import bump_versions, cache_versions
+from inventory.models import Product
+from services.models import Order, OrderProduct
+from users.models import Supplier, Client
+from .models import DailyBranchStats, Debt, Expense, ImportList, ImportProduct
+
+TOTAL_FIELDS = (
+    'product_overall_total', 'product_total', 'product_net_profit', 'service_overall_total', 'service_total',
+    'expense_total', 'supplier_payment_total', 'import_paid_total', 'warehouse_import_total',
+    'warehouse_import_paid', 'not_transfer_arrival_price', 'not_transfer_sell_price',
+    'by_transfer_arrival_price', 'by_transfer_sell_price',
+)
+DETAIL_FIELDS = {
+    'expense_details': (('type__name',), 'total_amount'),
+    'supplier_payment_details': (('supplier__first_name', 'supplier__last_name'), 'total_payment'),
+    'import_paid_details': (('first_name', 'last_name'), 'total_paid'),
+}
+REMAINDER_FIELDS = ('warehouse_remainder_sell_price', 'warehouse_remainder_arrival_price', 'warehouse_remainder_at')
+STATS_FIELDS = TOTAL_FIELDS + tuple(DETAIL_FIELDS) + REMAINDER_FIELDS
+
+
+def day_range(first_day, last_day):
+    """Aware [start, end) datetimes covering the local days ``first_day`` .. ``last_day``."""
+    start = timezone.make_aware(datetime.combine(first_day, time.min))
+    end = timezone.make_aware(datetime.combine(last_day + timedelta(days=1), time.min))
+    return start, end
+
+
+def truncate_day(field, start, end):
+    """
+    ``TruncDate`` in local time. A range without an offset change is truncated with a fixed
+    offset, which every backend understands (SQLite cannot parse zone names such as Etc/GMT-5).
+    """
+    offset = start.utcoffset()
+    tzinfo = dt_timezone(offset) if offset == end.utcoffset() else timezone.get_current_timezone()
+    return TruncDate(field, tzinfo=tzinfo)
+
+
+def empty_day():
+    values = {field: Decimal(0) for field in TOTAL_FIELDS}
+    values.update({field: [] for field in DETAIL_FIELDS})
+    values.update(warehouse_remainder_sell_price=0, warehouse_remainder_arrival_price=0, warehouse_remainder_at=None)
+    return values
+
+
+def compute_daily(branch_id, first_day, last_day):
+    """Statistics of every local day in ``first_day`` .. ``last_day``, grouped in the database by day."""
+    start, end = day_range(first_day, last_day)
+    local_day = truncate_day('created_at', start, end)
+    days = defaultdict(empty_day)
+
+    orders = Order.objects.filter(branch_id=branch_id, created_at__gte=start, created_at__lt=end)
+    for row in orders.values(day=local_day).annotate(
+            product_overall_total=Sum('product_overall_total'), product_total=Sum('product_total'),
+            service_overall_total=Sum('service_overall_total'), service_total=Sum('service_total')):
+        day = days[row.pop('day')]
+        day.update({field: value or 0 for field, value in row.items()})
+
+    order_products = OrderProduct.objects.filter(order__branch_id=branch_id,
+                                                 order__created_at__gte=start, order__created_at__lt=end)
+    for row in order_products.values(day=truncate_day('order__created_at', start, end)).annotate(total=Sum('net_profit')):
+        days[row['day']]['product_net_profit'] = row['total'] or 0
+
+    expenses = Expense.objects.filter(branch_id=branch_id, created_at__gte=start, created_at__lt=end)
+    for row in expenses.values('type__name', day=local_day).annotate(total_amount=Sum('amount')):
+        day = days[row.pop('day')]
+        day['expense_total'] += row['total_amount'] or 0
+        day['expense_details'].append(row)
+
+    payments = Debt.objects.filter(branch_id=branch_id, is_debt=False, created_at__gte=start, created_at__lt=end)
+    for row in payments.values('supplier__first_name', 'supplier__last_name', day=local_day).annotate(
+            total_payment=Sum('debt_amount')):
+        day = days[row.pop('day')]
+        day['supplier_payment_total'] += row['total_payment'] or 0
+        day['supplier_payment_details'].append(row)
+
+    imports = ImportList.objects.filter(branch_id=branch_id, created_at__gte=start, created_at__lt=end)
+    not_transfer = ~Q(payment_type="0")
+    for row in imports.values(first_name=F('supplier__first_name'), last_name=F('supplier__last_name'),
+                              day=local_day).annotate(
+            total_paid=Sum('paid'),
+            warehouse_import_total=Sum('total', filter=not_transfer),
+            warehouse_import_paid=Sum('paid', filter=not_transfer)):
+        day = days[row.pop('day')]
+        day['warehouse_import_total'] += row.pop('warehouse_import_total') or 0
+        day['warehouse_import_paid'] += row.pop('warehouse_import_paid') or 0
+        day['import_paid_total'] += row['total_paid'] or 0
+        day['import_paid_details'].append(row)
+
+    import_products = ImportProduct.objects.filter(import_list__branch_id=branch_id,
+                                                   import_list__created_at__gte=start, import_list__created_at__lt=end)
+    arrival = F('arrival_price') * F('amount')
+    sell = F('sell_price') * F('amount')
+    by_transfer = Q(import_list__payment_type="0")
+    for row in import_products.values(day=truncate_day('import_list__created_at', start, end)).annotate(
+            not_transfer_arrival_price=Sum(arrival, filter=~by_transfer, output_field=DecimalField()),
+            not_transfer_sell_price=Sum(sell, filter=~by_transfer, output_field=DecimalField()),
+            by_transfer_arrival_price=Sum(arrival, filter=by_transfer, output_field=DecimalField()),
+            by_transfer_sell_price=Sum(sell, filter=by_transfer, output_field=DecimalField())):
+        day = days[row.pop('day')]
+        day.update({field: value or 0 for field, value in row.items()})
+
+    for day, remainder in latest_remainders(branch_id, start, end).items():
+        days[day].update(remainder)
+
+    return days
+
+
+def latest_remainders(branch_id, start, end):
+    """
+    The warehouse remainder snapshot left by the last import or sale of every day,
+    an import winning over a sale made at the same moment.
+    """
+    remainders = {}
+    sources = (
+        (OrderProduct.objects.filter(order__branch_id=branch_id), 'order__created_at'),
+        (ImportProduct.objects.filter(import_list__branch_id=branch_id), 'import_list__created_at'),
+    )
+    for lines, created_at in sources:
+        moments = lines.filter(**{f'{created_at}__gte': start, f'{created_at}__lt': end}).values(
+            day=truncate_day(created_at, start, end)).annotate(moment=Max(created_at)).values_list('moment', flat=True)
+        latest = lines.filter(**{f'{created_at}__in': list(moments)}).order_by(created_at, 'id').values_list(
+            created_at, 'warehouse_remainder_sell_price', 'warehouse_remainder_arrival_price')
+        for moment, sell, arrival in latest:
+            day = timezone.localdate(moment)
+            if day in remainders and remainders[day]['warehouse_remainder_at'] > moment:
+                continue
+            remainders[day] = {
+                'warehouse_remainder_sell_price': sell,
+                'warehouse_remainder_arrival_price': arrival,
+                'warehouse_remainder_at': moment,
+            }
+    return remainders
+
+
+def refresh_days(branch_id, days):
+    """
+    Recomputes the rollup rows of ``days``.
+
+    The rows are created and their dirty flag is cleared before the raw tables are read, so a
+    write committed while the days are being computed flags them again instead of being lost.
+    """
+    days = sorted(set(days))
+    if not days:
+        return []
+    DailyBranchStats.objects.bulk_create(
+        [DailyBranchStats(branch_id=branch_id, date=day, is_dirty=True) for day in days], ignore_conflicts=True)
+    stats = DailyBranchStats.objects.filter(branch_id=branch_id, date__in=days)
+    stats.update(is_dirty=False)
+    try:
+        computed = compute_daily(branch_id, days[0], days[-1])
+        rows = list(stats)
+        updated_at = timezone.now()
+        with transaction.atomic():
+            for row in rows:
+                values = computed[row.date] if row.date in computed else empty_day()
+                changed = {field: values[field] for field in STATS_FIELDS if getattr(row, field) != values[field]}
+                if not changed:
+                    continue
+                for field, value in changed.items():
+                    setattr(row, field, value)
+                row.updated_at = updated_at
+                # A plain UPDATE of the changed fields: bulk_update builds a CASE per field and row
+                DailyBranchStats.objects.filter(pk=row.pk).update(updated_at=updated_at, **changed)
+    except Exception:
+        stats.update(is_dirty=True)
+        raise
+    return rows
+
+
+def branch_days(branch_id, first_day=None, last_day=None):
+    """The days of ``first_day`` (the day of the branch's first record) .. ``last_day`` (today)."""
+    if first_day is None:
+        firsts = [
+            model.objects.filter(branch_id=branch_id).aggregate(first=Min('created_at'))['first']
+            for model in (Order, Expense, Debt, ImportList)
+        ]
+        firsts = [timezone.localdate(first) for first in firsts if first]
+        if not firsts:
+            return []
+        first_day = min(firsts)
+    last_day = last_day or timezone.localdate()
+    return [first_day + timedelta(days=offset) for offset in range((last_day - first_day).days + 1)]
+
+
+def daily_stats(branch_id, first_day, last_day):
+    """Rollup rows of ``first_day`` .. ``last_day``, computing missing and dirty days up to today."""
+    rows = {row.date: row for row in DailyBranchStats.objects.filter(
+        branch_id=branch_id, date__gte=first_day, date__lte=last_day)}
+    last_day = min(last_day, timezone.localdate())
+    stale = [first_day + timedelta(days=offset) for offset in range((last_day - first_day).days + 1)]
+    stale = [day for day in stale if day not in rows or rows[day].is_dirty]
+    for row in refresh_days(branch_id, stale):
+        rows[row.date] = row
+    return [rows[day] for day in sorted(rows)]
+
+
+def merge_details(details, keys, value_key):
+    merged = {}
+    for detail in details:
+        key = tuple(detail[name] for name in keys)
+        value = detail[value_key]
+        value = None if value is None else Decimal(value)
+        if key not in merged or merged[key] is None:
+            merged[key] = value
+        elif value is not None:
+            merged[key] += value
+    return [
+        {**dict(zip(keys, key)), value_key: value}
+        for key, value in sorted(merged.items(), key=lambda item: [(part is not None, part or '') for part in item[0]])
+    ]
+
+
+def summarize(rows):
+    """Period totals of the given rollup rows."""
+    return merge_summaries({field: getattr(row, field) for field in STATS_FIELDS} for row in rows)
+
+
+def merge_summaries(summaries):
+    """Totals of consecutive periods (rollup rows or ``summarize`` results) of one branch."""
+    summaries = list(summaries)
+    merged = {field: sum(summary[field] for summary in summaries) or 0 for field in TOTAL_FIELDS}
+    for field, (keys, value_key) in DETAIL_FIELDS.items():
+        merged[field] = merge_details((detail for summary in summaries for detail in summary[field]), keys, value_key)
+    merged['supplier_payment_details'] = [
+        detail for detail in merged['supplier_payment_details'] if detail['total_payment'] != 0]
+
+    remainders = [summary for summary in summaries if summary['warehouse_remainder_at'] is not None]
+    latest = max(remainders, key=lambda summary: summary['warehouse_remainder_at'], default=None)
+    for field in REMAINDER_FIELDS:
+        merged[field] = latest[field] if latest else empty_day()[field]
+    return merged
+
+
+def current_state(branch_id):
+    """Supplier debt, client lending and warehouse value of the branch, one grouped query per table."""
+    suppliers = list(Supplier.objects.filter(branch_id=branch_id).values(
+        "first_name", "last_name").annotate(total_debt=Sum("debt")))
+    clients = list(Client.objects.filter(branch_id=branch_id).values(
+        "first_name", "last_name").annotate(total_lending=Sum("lending")))
+
+    in_stock = Q(amount__gt=0)
+    products = list(Product.objects.filter(branch_id=branch_id, is_temp=False).values("code", "name").annotate(
+        total_value=Sum(F("amount") * F("sell_price"), output_field=DecimalField()),
+        in_stock_sell=Sum(F("amount") * F("sell_price"), filter=in_stock, output_field=DecimalField()),
+        in_stock_arrival=Sum(F("amount") * F("arrival_price"), filter=in_stock, output_field=DecimalField()),
+        in_stock_profit=Sum(F("amount") * (F("sell_price") - F("arrival_price")), filter=in_stock,
+                            output_field=DecimalField()),
+    ))
+    warehouse = {
+        field: sum(product.pop(field) or 0 for product in products) or 0
+        for field in ("in_stock_sell", "in_stock_arrival", "in_stock_profit")
+    }
+
+    return {
+        "debt_from_supplier": {
+            "total": sum(supplier["total_debt"] or 0 for supplier in suppliers) or 0,
+            "detail": [supplier for supplier in suppliers if supplier["total_debt"] != 0]
+        },
+        "client_lending": {
+            "total": sum(client["total_lending"] or 0 for client in clients) or 0,
+            "detail": [client for client in clients if client["total_lending"] != 0]
+        },
+        "warehouse": {
+            "arrival_price": warehouse["in_stock_arrival"],
+            "sell_price": warehouse["in_stock_sell"],
+            "net_profit": warehouse["in_stock_profit"],
+            "detail": [product for product in products if product["total_value"] != 0]
+        },
+    }
+
+
+def branch_statistics(branch_id, first_day, last_day):
+    """Statistics sections of the branch for ``first_day`` .. ``last_day`` as returned by the API."""
+    return build_statistics(summarize(daily_stats(branch_id, first_day, last_day)), current_state(branch_id))
+
+
+def cached_branch_statistics(branch_id, first_day, last_day):
+    """
+    ``branch_statistics`` served from the cache, returned with whether it was a hit and its age in seconds.
+
+    Period totals are cached under the versions of the months they cover and current balances under
+    the branch version; ``invalidate`` bumps both after a write commits. A closed period never expires.
+    """
+    period, period_hit, period_at = cached_period(branch_id, first_day, last_day)
+    state, state_hit, state_at = cached_state(branch_id)
+    age = timezone.now().timestamp() - min(period_at, state_at)
+    return build_statistics(period, state), period_hit and state_hit, int(age)
+
+
+async def acached_branch_statistics(branch_id, first_day, last_day):
+    """``cached_branch_statistics`` for async views: the period and the current balances are read at the same time."""
+    (period, period_hit, period_at), (state, state_hit, state_at) = await asyncio.gather(
+        run_report(cached_period, branch_id, first_day, last_day), run_report(cached_state, branch_id))
+    age = timezone.now().timestamp() - min(period_at, state_at)
+    return build_statistics(period, state), period_hit and state_hit, int(age)
+
+
+def cached_period(branch_id, first_day, last_day):
+    """``summarize`` of the period from the cache, with whether it was a hit and when it was computed."""
+    months = sorted({(first_day + timedelta(days=offset)).strftime('%Y-%m')
+                     for offset in range((last_day - first_day).days + 1)})
+    versions = cache_versions([f'statistics:version:{branch_id}:{month}' for month in months])
+    key = f'statistics:period:{branch_id}:{first_day}:{last_day}:' + ':'.join(map(str, versions))
+    timeout = None if last_day < timezone.localdate() else settings.STATISTICS_CACHE_TIMEOUT
+    return _cached(key, timeout, lambda: summarize(daily_stats(branch_id, first_day, last_day)))
+
+
+def cached_state(branch_id):
+    """``current_state`` of the branch from the cache, with whether it was a hit and when it was computed."""
+    version, = cache_versions([state_version_key(branch_id)])
+    key = f'statistics:state:{branch_id}:{version}'
+    return _cached(key, settings.STATISTICS_CACHE_TIMEOUT, lambda: current_state(branch_id))
+
+
+def _cached(key, timeout, compute):
+    entry = cache.get(key)
+    if entry is not None:
+        computed_at, value = entry
+        return value, True, computed_at
+    computed_at = timezone.now().timestamp()
+    value = compute()
+    cache.set(key, (computed_at, value), timeout)
+    return value, False, computed_at
+
+
+def month_chunks(first_day, last_day):
+    """Splits ``first_day`` .. ``last_day`` at calendar month boundaries."""
+    while first_day <= last_day:
+        next_month = (first_day.replace(day=28) + timedelta(days=4)).replace(day=1)
+        yield first_day, min(last_day, next_month - timedelta(days=1))
+        first_day = next_month
+
+
+async def arange_statistics(branch_ids, first_day, last_day):
+    """
+    Statistics of every branch in ``branch_ids`` for ``first_day`` .. ``last_day`` and their total.
+
+    Every (branch, month) period and every branch's current balances is read from the cache or
+    computed by a ``run_report`` call of its own, all of them at once, so a report costs about as
+    long as its slowest part while the reports of the process still share ``REPORT_WORKERS`` threads.
+    Returns ``(per_branch, total, hit, age)`` with ``per_branch`` keyed by branch id.
+    """
+    chunks = list(month_chunks(first_day, last_day))
+    results = await asyncio.gather(
+        *(run_report(cached_period, branch_id, *chunk) for branch_id in branch_ids for chunk in chunks),
+        *(run_report(cached_state, branch_id) for branch_id in branch_ids))
+    periods, states = results[:len(branch_ids) * len(chunks)], results[len(branch_ids) * len(chunks):]
+    per_branch = {
+        branch_id: build_statistics(
+            merge_summaries(period for period, _, _ in periods[index * len(chunks):(index + 1) * len(chunks)]),
+            states[index][0])
+        for index, branch_id in enumerate(branch_ids)
+    }
+
+    hit = all(result_hit for _, result_hit, _ in results)
+    age = timezone.now().timestamp() - min(computed_at for _, _, computed_at in results)
+    return per_branch, combine_statistics(per_branch.values()), hit, int(age)
+
+
+async def arange_report(branches, first_day, last_day):
+    """The report of ``arange_statistics`` for ``branches`` (their ``id`` and ``name``), as it is answered."""
+    per_branch, total, hit, age = await arange_statistics([branch['id'] for branch in branches], first_day, last_day)
+    return {
+        "start_date": first_day.strftime("%d-%m-%Y"),
+        "end_date": last_day.strftime("%d-%m-%Y"),
+        "branches": [
+            {"branch_id": branch['id'], "branch_name": branch['name'], **per_branch[branch['id']]}
+            for branch in branches
+        ],
+        "total": total,
+        "cache": {
+            "hit": hit,
+            "age": age
+        }
+    }
+
+
+# for jobs and other sync callers: the parts still run on the report threads of the process
+range_report = async_to_sync(arange_report)
+
+
+def combine_statistics(statistics):
+    """
+    Sums ``build_statistics`` results of several branches: numbers are added and detail rows
+    naming the same supplier, client, product or expense type are merged.
+    """
+    statistics = list(statistics)
+    if not statistics:
+        return {}
+    if isinstance(statistics[0], dict):
+        return {key: combine_statistics(item[key] for item in statistics) for key in statistics[0]}
+    if isinstance(statistics[0], list):
+        merged = {}
+        for row in (row for rows in statistics for row in rows):
+            key = tuple((name, value) for name, value in row.items() if not name.startswith('total_'))
+            if key not in merged:
+                merged[key] = dict(row)
+                continue
+            for name, value in row.items():
+                if name.startswith('total_') and value is not None:
+                    merged[key][name] = (merged[key][name] or 0) + value
+        return list(merged.values())
+    return sum(item or 0 for item in statistics)
+
+
+def build_statistics(period, state):
+    order_income_total = period["product_total"] + period["service_total"]
+    remainder_sell = period["warehouse_remainder_sell_price"]
+    remainder_arrival = period["warehouse_remainder_arrival_price"]
+    net_income = order_income_total - (
+        period["expense_total"] + period["warehouse_import_paid"] + period["supplier_payment_total"])
+
+    return {
+        "order": {
+            "total": order_income_total,
+            "products": {
+                "overall_total": period["product_overall_total"],
+                "total_with_discount": period["product_total"],
+                "net_profit": period["product_net_profit"]
+            },
+            "services": {
+                "overall_total": period["service_overall_total"],
+                "total_with_discount": period["service_total"]
+            }
+        },
+        "warehouse_remainder": {
+            "sell_price": remainder_sell,
+            "arrival_price": remainder_arrival,
+            "net_profit": remainder_sell - remainder_arrival
+        },
+        "expenses": {
+            "total": period["expense_total"],
+            "details": period["expense_details"]
+        },
+        "debt_from_supplier": state["debt_from_supplier"],
+        "supplier_payments": {
+            "total": period["supplier_payment_total"],
+            "detail": period["supplier_payment_details"]
+        },
+        "client_lending": state["client_lending"],
+        "warehouse": state["warehouse"],
+        "warehouse_paid": {
+            "total": period["import_paid_total"],
+            "detail": period["import_paid_details"]
+        },
+        "not_transfer": {
+            "arrival_price": period["not_transfer_arrival_price"],
+            "sell_price": period["not_transfer_sell_price"],
+            "net_profit": period["not_transfer_sell_price"] - period["not_transfer_arrival_price"]
+        },
+        "by_transfer": {
+            "arrival_price": period["by_transfer_arrival_price"],
+            "sell_price": period["by_transfer_sell_price"],
+            "net_profit": period["by_transfer_sell_price"] - period["by_transfer_arrival_price"]
+        },
+        "net_income": net_income
+    }
+
+
+def state_version_key(branch_id):
+    return f'statistics:version:{branch_id}:state'
+
+
+def invalidate(branch_id, moment=None):
+    """
+    Retires the cached statistics of the branch once the current transaction commits:
+    current balances always, period totals of the month of ``moment`` when given.
+    """
+    if branch_id is None:
+        return
+    keys = [state_version_key(branch_id)]
+    if moment is not None:
+        keys.append(f'statistics:version:{branch_id}:{timezone.localdate(moment):%Y-%m}')
+    bump_versions(keys)
+
+
+def mark_dirty(branch_id, moment):
+    """Flags the rollup row of the local day of ``moment`` once the current transaction commits."""
+    if branch_id is None or moment is None:
+        return
+    day = timezone.localdate(moment)
+    transaction.on_commit(
+        lambda: DailyBranchStats.objects.filter(branch_id=branch_id, date=day).update(is_dirty=True))
@@ -1,3 +1,583 @@
-from django.test import TestCase
+import io
+import zipfile
+from datetime import datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
 
-# Create your tests here.
+from django.db.models import Sum, F, DecimalField
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+from rest_framework.utils.encoders import JSONEncoder
+
+from branches.models import Branch, Wallet
+from core.dataset import Size, generate
+from core.xlsx import CONTENT_TYPES, ROOT_RELS, WORKBOOK, WORKBOOK_RELS, read_xlsx
+from inventory.catalog import WarehouseLookup
+from inventory.models import Car, Service, Product, WarehouseValuation
+from services.models import Order, OrderProduct
+from services.serializers import OrderPostSerializer
+from transactions.models import BranchFundTransfer, Debt, Expense, ExpenseType, ImportList, ImportProduct
+from transactions.invoices import import_invoice
+from transactions.serializers import ImportListSerializer
+from transactions.statistics import branch_statistics, daily_stats, range_report
+from users.models import Client, Employee, Supplier, User
+
+
+def reference_statistics(branch_id, start_date, end_date):
+    """The statistics as computed straight from the raw tables, one aggregate per figure."""
+    orders = Order.objects.filter(branch_id=branch_id, created_at__range=[start_date, end_date])
+    sold_product_total_price = orders.aggregate(total=Sum("product_overall_total"))["total"] or 0
+    products_totals_with_discount = orders.aggregate(total=Sum("product_total"))["total"] or 0
+    sold_product_net_profit = OrderProduct.objects.filter(
+        order__branch_id=branch_id, order__created_at__range=[start_date, end_date]).aggregate(
+        total=Sum("net_profit"))["total"] or 0
+    service_income_total = orders.aggregate(total=Sum("service_overall_total"))["total"] or 0
+    service_totals_with_discount = orders.aggregate(total=Sum("service_total"))["total"] or 0
+    order_income_total = products_totals_with_discount + service_totals_with_discount
+
+    import_list = ImportList.objects.filter(branch_id=branch_id, created_at__range=[start_date, end_date])
+    warehouse_import_paid = import_list.exclude(payment_type="0").aggregate(total=Sum("paid"))["total"] or 0
+
+    latest_import_product = ImportProduct.objects.filter(
+        import_list__created_at__range=[start_date, end_date], import_list__branch_id=branch_id
+    ).order_by('-import_list__created_at', '-id').first()
+    latest_order_product = OrderProduct.objects.filter(
+        order__created_at__range=[start_date, end_date], order__branch_id=branch_id
+    ).order_by('-order__created_at', '-id').first()
+    latest = latest_import_product or latest_order_product
+    if latest_import_product and latest_order_product \
+            and latest_import_product.import_list.created_at < latest_order_product.order.created_at:
+        latest = latest_order_product
+    remainder_sell = latest.warehouse_remainder_sell_price if latest else 0
+    remainder_arrival = latest.warehouse_remainder_arrival_price if latest else 0
+
+    expenses = Expense.objects.filter(branch_id=branch_id, created_at__range=[start_date, end_date])
+    suppliers = Supplier.objects.filter(branch_id=branch_id)
+    clients = Client.objects.filter(branch_id=branch_id)
+    payments = Debt.objects.filter(branch_id=branch_id, is_debt=False, created_at__range=[start_date, end_date])
+    warehouse_products = Product.objects.filter(branch_id=branch_id, is_temp=False)
+    in_stock = warehouse_products.filter(amount__gt=0)
+    import_products = ImportProduct.objects.filter(import_list__branch_id=branch_id,
+                                                   import_list__created_at__range=[start_date, end_date])
+    not_transfer = import_products.exclude(import_list__payment_type="0")
+    by_transfer = import_products.filter(import_list__payment_type="0")
+    arrival = Sum(F("arrival_price") * F("amount"), output_field=DecimalField())
+    sell = Sum(F("sell_price") * F("amount"), output_field=DecimalField())
+    not_transfer_arrival = not_transfer.aggregate(total=arrival)["total"] or 0
+    not_transfer_sell = not_transfer.aggregate(total=sell)["total"] or 0
+    by_transfer_arrival = by_transfer.aggregate(total=arrival)["total"] or 0
+    by_transfer_sell = by_transfer.aggregate(total=sell)["total"] or 0
+    expense_total = expenses.aggregate(total=Sum("amount"))["total"] or 0
+    supplier_payments = payments.aggregate(total=Sum("debt_amount"))["total"] or 0
+
+    return {
+        "order": {
+            "total": order_income_total,
+            "products": {
+                "overall_total": sold_product_total_price,
+                "total_with_discount": products_totals_with_discount,
+                "net_profit": sold_product_net_profit
+            },
+            "services": {
+                "overall_total": service_income_total,
+                "total_with_discount": service_totals_with_discount
+            }
+        },
+        "warehouse_remainder": {
+            "sell_price": remainder_sell,
+            "arrival_price": remainder_arrival,
+            "net_profit": remainder_sell - remainder_arrival
+        },
+        "expenses": {
+            "total": expense_total,
+            "details": list(expenses.values("type__name").annotate(total_amount=Sum("amount")))
+        },
+        "debt_from_supplier": {
+            "total": suppliers.aggregate(total=Sum("debt"))["total"] or 0,
+            "detail": list(suppliers.values("first_name", "last_name").annotate(
+                total_debt=Sum("debt")).exclude(total_debt=0))
+        },
+        "supplier_payments": {
+            "total": supplier_payments,
+            "detail": list(payments.values("supplier__first_name", "supplier__last_name").annotate(
+                total_payment=Sum("debt_amount")).exclude(total_payment=0))
+        },
+        "client_lending": {
+            "total": clients.aggregate(total=Sum("lending"))["total"] or 0,
+            "detail": list(clients.values("first_name", "last_name").annotate(
+                total_lending=Sum("lending")).exclude(total_lending=0))
+        },
+        "warehouse": {
+            "arrival_price": in_stock.aggregate(total=Sum(
+                F("amount") * F("arrival_price"), output_field=DecimalField()))["total"] or 0,
+            "sell_price": in_stock.aggregate(total=Sum(
+                F("amount") * F("sell_price"), output_field=DecimalField()))["total"] or 0,
+            "net_profit": in_stock.aggregate(total=Sum(
+                F("amount") * (F("sell_price") - F("arrival_price")), output_field=DecimalField()))["total"] or 0,
+            "detail": list(warehouse_products.values("code", "name").annotate(
+                total_value=Sum(F("amount") * F("sell_price"), output_field=DecimalField())).exclude(total_value=0))
+        },
+        "warehouse_paid": {
+            "total": import_list.aggregate(total=Sum('paid'))['total'] or 0,
+            "detail": list(import_list.values(first_name=F('supplier__first_name'),
+                                              last_name=F('supplier__last_name')).annotate(total_paid=Sum('paid')))
+        },
+        "not_transfer": {
+            "arrival_price": not_transfer_arrival,
+            "sell_price": not_transfer_sell,
+            "net_profit": not_transfer_sell - not_transfer_arrival
+        },
+        "by_transfer": {
+            "arrival_price": by_transfer_arrival,
+            "sell_price": by_transfer_sell,
+            "net_profit": by_transfer_sell - by_transfer_arrival
+        },
+        "net_income": order_income_total - (expense_total + warehouse_import_paid + supplier_payments)
+    }
+
+
+class DebtTests(TestCase):
+    """A supplier debt moves the supplier's debt by its amount; the wallet is not touched."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.branch = Branch.objects.create(name='debts')
+        cls.wallet = Wallet.objects.create(name='wallet', balance=1000)
+
+    def setUp(self):
+        self.supplier = Supplier.objects.create(first_name='supplier', phone='0', branch=self.branch)
+
+    def debt(self, amount, is_debt):
+        return Debt.objects.create(supplier=self.supplier, debt_amount=amount, is_debt=is_debt, current_debt=0,
+                                   branch=self.branch)
+
+    def assertMoney(self, wallet, debt):
+        self.supplier.refresh_from_db()
+        self.assertEqual((Wallet.objects.get().current_balance, self.supplier.debt), (wallet, debt))
+
+    def test_taking_and_paying(self):
+        self.debt(100, is_debt=True)
+        self.assertMoney(1000, 100)
+        payment = self.debt(40, is_debt=False)
+        self.assertMoney(1000, 60)
+
+        payment.debt_amount = 50
+        payment.save()
+        self.assertMoney(1000, 50)
+
+    def test_overpaying_changes_nothing(self):
+        self.debt(100, is_debt=True)
+        with self.assertRaises(ValidationError):
+            self.debt(150, is_debt=False)
+        self.assertMoney(1000, 100)
+        self.assertEqual(Debt.objects.count(), 1)
+
+
+class ComposeImportTests(TestCase):
+    """
+    An import created through ``ImportListSerializer`` (``compose_import``) against the same import
+    saved line by line with ``ImportProduct.save``, on two identical branches.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        Wallet.objects.create(name='wallet', balance=10 ** 6)
+
+    def branch(self, name):
+        branch = Branch.objects.create(name=name)
+        objects = SimpleNamespace(branch=branch)
+        objects.supplier = Supplier.objects.create(first_name=name, phone='0', debt=500, branch=branch)
+        objects.oil = Product.objects.create(name='oil', code='OIL-1', amount=5, arrival_price=1500, sell_price=2100,
+                                             is_temp=False, branch=branch)
+        Product.objects.create(name='stock', amount=7, arrival_price=50, sell_price=90, is_temp=False, branch=branch)
+        # products of the catalogue: one with the code of the warehouse oil, one the warehouse does not have
+        objects.oil_item = Product.objects.create(name='oil 5w30', code='oil-1', amount=0, arrival_price=0,
+                                                  sell_price=0, is_temp=True, branch=branch)
+        objects.pad = Product.objects.create(name='brake pad', code='PAD-2', amount=0, arrival_price=0, sell_price=0,
+                                             is_temp=True, branch=branch)
+        return objects
+
+    @staticmethod
+    def lines(objects, repeat=1):
+        return [
+            {'product': objects.oil, 'amount': 2, 'arrival_price': Decimal(1600), 'sell_price': Decimal(2200)},
+            {'product': objects.pad, 'amount': 4, 'arrival_price': Decimal(300), 'sell_price': Decimal(450)},
+            {'product': objects.oil_item, 'amount': 1.5, 'arrival_price': Decimal(1700), 'sell_price': Decimal(2300)},
+            {'product': objects.pad, 'amount': 1, 'arrival_price': Decimal(320), 'sell_price': Decimal(480)},
+        ] * repeat
+
+    def compose(self, objects, lines):
+        serializer = ImportListSerializer(data={
+            'paid': 1000, 'payment_type': '1', 'supplier': objects.supplier.id, 'description': 'invoice',
+            'products': [{**line, 'product': {'id': line['product'].id, 'name': line['product'].name}}
+                         for line in lines],
+        })
+        serializer.is_valid(raise_exception=True)
+        return serializer.save(branch=objects.branch)
+
+    @staticmethod
+    def state(objects, import_list):
+        import_list.refresh_from_db()
+        objects.supplier.refresh_from_db()
+        return {
+            'import': (import_list.total, import_list.paid, import_list.debt),
+            'lines': [(line.product.name, line.amount, line.total_summ, line.warehouse_remainder_sell_price,
+                       line.warehouse_remainder_arrival_price)
+                      for line in ImportProduct.objects.filter(import_list=import_list).order_by('id')],
+            'warehouse': list(Product.objects.filter(branch=objects.branch, is_temp=False).order_by('name').values_list(
+                'name', 'code', 'amount', 'arrival_price', 'sell_price')),
+            'supplier': objects.supplier.debt,
+            'valuation': WarehouseValuation.totals(objects.branch),
+        }
+
+    def test_composed_import_matches_line_by_line(self):
+        composed, line_by_line = self.branch('composed'), self.branch('line by line')
+        composed_import = self.compose(composed, self.lines(composed))
+
+        import_list = ImportList.objects.create(paid=1000, payment_type='1', supplier=line_by_line.supplier,
+                                                description='invoice', branch=line_by_line.branch, total=0, debt=0)
+        lookup = WarehouseLookup(line_by_line.branch.id)
+        for line in self.lines(line_by_line):
+            ImportProduct(import_list=import_list, **line).save(lookup=lookup)
+        import_list.refresh_from_db()
+        import_list.debt = import_list.total - import_list.paid
+        import_list.save()
+
+        expected = self.state(line_by_line, import_list)
+        self.assertEqual(self.state(composed, composed_import), expected)
+        self.assertEqual(expected['valuation'], WarehouseValuation.compute(line_by_line.branch))
+
+    def test_query_count(self):
+        # validation reads the supplier and the line products; then the import and its wallet movement,
+        # the warehouse products by code and by name, the valuation, the list total and supplier debt, the
+        # new products, stock, prices, the lines and the valuation again (and the savepoints around them)
+        for repeat in (1, 5):
+            objects = self.branch(f'queries {repeat}')
+            with self.subTest(lines=4 * repeat), self.assertNumQueries(23):
+                self.compose(objects, self.lines(objects, repeat))
+
+
+class BranchFundTransferTests(TestCase):
+    def test_hands_over_the_whole_balance(self):
+        branch = Branch.objects.create(name='fund', balance=700)
+        Wallet.objects.create(name='wallet', balance=0)
+        user = User.objects.create(username='fund', branch=branch)
+        stale = Branch.objects.get(pk=branch.pk)
+        Branch.objects.filter(pk=branch.pk).update(balance=900)
+
+        transfer = BranchFundTransfer.objects.create(description='day', user=user, branch=stale)
+
+        branch.refresh_from_db()
+        self.assertEqual((transfer.amount, branch.balance, Wallet.objects.get().current_balance), (900, 0, 900))
+
+
+class BranchStatisticsTests(TestCase):
+    """The statistics built from the daily rollup against the same figures aggregated from the raw tables."""
+
+    @classmethod
+    def setUpTestData(cls):
+        days = 40
+        branch = Branch.objects.create(name='statistics check', balance=10 ** 9)
+        user = User.objects.create(username='statistics-check', branch=branch)
+        client = Client.objects.create(first_name='check', phone='0', branch=branch)
+        car = Car.objects.create(name='check', brand='check', color='white', client=client, branch=branch)
+        manager = Employee.objects.create(first_name='check', phone='0', position='manager', branch=branch)
+        suppliers = [Supplier.objects.create(first_name=f'check {i}', phone='0', debt=10 ** 6, branch=branch)
+                     for i in range(3)]
+        services = [Service.objects.create(name=f'check {i}', price=50000 + i, branch=branch) for i in range(3)]
+        products = [Product.objects.create(name=f'check {branch.id} {i}', amount=1000, arrival_price=8000,
+                                           sell_price=10000 + i, is_temp=False, branch=branch) for i in range(3)]
+        types = [ExpenseType.objects.create(name=f'check {i}', branch=branch) for i in range(3)]
+
+        first_day = timezone.localdate().replace(day=1) - timedelta(days=days // 2)
+        start = timezone.make_aware(datetime.combine(first_day, datetime.min.time()))
+        for offset in range(days):
+            moment = start + timedelta(days=offset, hours=offset % 6 * 4 + 0.5)
+            serializer = OrderPostSerializer(data={
+                'car': car.id, 'paid': 1000, 'manager': manager.id,
+                'services': [{'service': services[offset % 3].id, 'part': 1, 'discount': offset % 20}],
+                'products': [{'product': products[offset % 3].id, 'amount': 1 + offset % 3, 'discount': 5}],
+            }, context={'request': SimpleNamespace(user=user)})
+            serializer.is_valid(raise_exception=True)
+            Order.objects.filter(pk=serializer.save().pk).update(created_at=moment)
+
+            expense = Expense.objects.create(description='check', type=types[offset % 3], amount=100 + offset,
+                                             from_user=user, branch=branch)
+            Expense.objects.filter(pk=expense.pk).update(created_at=moment + timedelta(hours=1))
+            debt = Debt.objects.create(supplier=suppliers[offset % 3], debt_amount=50 + offset,
+                                       is_debt=offset % 4 == 0, current_debt=0, branch=branch)
+            Debt.objects.filter(pk=debt.pk).update(created_at=moment)
+            import_list = ImportList.objects.create(paid=10 + offset, debt=5, payment_type=str(offset % 3),
+                                                    supplier=suppliers[offset % 3], branch=branch)
+            ImportProduct.objects.create(product=products[offset % 3], amount=3, arrival_price=8000,
+                                         sell_price=10000, import_list=import_list)
+            ImportList.objects.filter(pk=import_list.pk).update(created_at=moment + timedelta(hours=offset % 3 - 1))
+        cls.branch_id, cls.first_day = branch.id, first_day.replace(day=1)
+
+    def periods(self):
+        month_end = (self.first_day.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+        yield self.first_day, month_end
+        for offset in range(month_end.day):
+            day = self.first_day + timedelta(days=offset)
+            yield day, day
+
+    @staticmethod
+    def moments(start_day, end_day):
+        start = timezone.make_aware(datetime.combine(start_day, datetime.min.time()))
+        end = timezone.make_aware(datetime.combine(end_day + timedelta(days=1), datetime.min.time()))
+        return start, end - timedelta(seconds=1)
+
+    def test_statistics_match_raw_tables(self):
+        encoder = JSONEncoder(sort_keys=True)
+        for start_day, end_day in self.periods():
+            with self.subTest(start=start_day, end=end_day):
+                self.assertEqual(encoder.encode(branch_statistics(self.branch_id, start_day, end_day)),
+                                 encoder.encode(reference_statistics(self.branch_id, *self.moments(start_day, end_day))))
+
+    def test_daily_stats_match_raw_aggregation(self):
+        month_end = max(end for _, end in self.periods())
+        rows = {row.date: row for row in daily_stats(self.branch_id, self.first_day, month_end)}
+        for day, _ in self.periods():
+            start, end = self.moments(day, day)
+            orders = Order.objects.filter(branch_id=self.branch_id, created_at__range=[start, end]).aggregate(
+                product_overall_total=Sum('product_overall_total'), product_total=Sum('product_total'),
+                service_overall_total=Sum('service_overall_total'), service_total=Sum('service_total'))
+            expected = {
+                **orders,
+                'expense_total': Expense.objects.filter(branch_id=self.branch_id, created_at__range=[start, end])
+                .aggregate(total=Sum('amount'))['total'],
+                'supplier_payment_total': Debt.objects.filter(
+                    branch_id=self.branch_id, is_debt=False, created_at__range=[start, end])
+                .aggregate(total=Sum('debt_amount'))['total'],
+                'import_paid_total': ImportList.objects.filter(branch_id=self.branch_id, created_at__range=[start, end])
+                .aggregate(total=Sum('paid'))['total'],
+            }
+            with self.subTest(day=day):
+                self.assertEqual({field: getattr(rows[day], field) for field in expected},
+                                 {field: value or 0 for field, value in expected.items()})
+
+    def test_rolled_up_request_query_count(self):
+        for start_day, end_day in ((self.first_day, self.first_day + timedelta(days=27)), (self.first_day,) * 2):
+            branch_statistics(self.branch_id, start_day, end_day)
+            # the rollup rows, then the current balances of suppliers, clients and the warehouse
+            with self.subTest(start=start_day, end=end_day), self.assertNumQueries(4):
+                branch_statistics(self.branch_id, start_day, end_day)
+
+
+class RangeStatisticsPermissionTests(TransactionTestCase):
+    # the report runs on connections of its own in other threads, which only see committed rows
+    def test_branch_admins_and_superusers_only(self):
+        branch = Branch.objects.create(name='range')
+        users = {
+            'admin': (User.objects.create(username='admin', branch=branch), 200),
+            'superuser': (User.objects.create(username='superuser', is_superuser=True, branch=branch), 200),
+            'staff': (User.objects.create(username='staff', is_staff=True, branch=branch), 403),
+        }
+        day = timezone.localdate().isoformat()
+        for name, (user, status) in users.items():
+            client = APIClient()
+            client.force_authenticate(user)
+            with self.subTest(user=name):
+                response = client.get('/transaction/statistics/range/', {'start': day, 'end': day})
+                self.assertEqual(response.status_code, status)
+        self.assertEqual(APIClient().get('/transaction/statistics/range/', {'start': day, 'end': day}).status_code,
+                         401)
+
+
+class RangeStatisticsTests(TransactionTestCase):
+    """The range report of several branches against the statistics of each branch on its own."""
+    # the parts of the report run on connections of their own in other threads, which only see committed rows
+
+    def setUp(self):
+        self.generated = generate(2, Size(clients=10, products=20, orders=80, imports=20, ledger=30, days=40))
+        self.superuser = User.objects.create(username='range', is_superuser=True)
+
+    @staticmethod
+    def figures(statistics, path=()):
+        """``{path: number}`` of every figure of ``statistics``; a detail list counts as the sum of its totals."""
+        if isinstance(statistics, dict):
+            return {key: value for name, item in statistics.items()
+                    for key, value in RangeStatisticsTests.figures(item, path + (name,)).items()}
+        if isinstance(statistics, list):
+            return {path: sum(value or 0 for row in statistics for name, value in row.items()
+                              if name.startswith('total_'))}
+        return {path: statistics or 0}
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_branches_and_total_match_single_branch_statistics(self):
+        first_day = min(generated.first_day for generated in self.generated)
+        last_day = max(generated.last_day for generated in self.generated)
+        self.assertNotEqual((first_day.year, first_day.month), (last_day.year, last_day.month))
+        branch_ids = [generated.branch.id for generated in self.generated]
+        expected = {branch_id: branch_statistics(branch_id, first_day, last_day) for branch_id in branch_ids}
+
+        client = APIClient()
+        client.force_authenticate(self.superuser)
+        response = client.get('/transaction/statistics/range/', {
+            'start': first_day.isoformat(), 'end': last_day.isoformat(), 'branch': ','.join(map(str, branch_ids))})
+        self.assertEqual(response.status_code, 200)
+
+        encoder = JSONEncoder(sort_keys=True)
+        self.assertEqual([entry['branch_id'] for entry in response.data['branches']], branch_ids)
+        for entry in response.data['branches']:
+            with self.subTest(branch=entry['branch_id']):
+                statistics = {key: value for key, value in entry.items() if key not in ('branch_id', 'branch_name')}
+                self.assertEqual(encoder.encode(statistics), encoder.encode(expected[entry['branch_id']]))
+
+        branches = [self.figures(statistics) for statistics in expected.values()]
+        self.assertTrue(any(branches[0].values()))
+        for path, value in self.figures(response.data['total']).items():
+            with self.subTest(figure='.'.join(path)):
+                self.assertEqual(value, sum(figures[path] for figures in branches))
+
+        # the background job builds the same report
+        report = range_report([{'id': entry['branch_id'], 'name': entry['branch_name']}
+                               for entry in response.data['branches']], first_day, last_day)
+        self.assertEqual(encoder.encode([report['branches'], report['total']]),
+                         encoder.encode([response.data['branches'], response.data['total']]))
+
+
+class ImportUploadPermissionTests(TestCase):
+    def test_branch_admins_only(self):
+        branch = Branch.objects.create(name='upload')
+        staff = User.objects.create(username='staff', is_staff=True, branch=branch)
+        client = APIClient()
+        self.assertEqual(client.post('/transaction/import/upload/', {}, format='multipart').status_code, 401)
+        client.force_authenticate(staff)
+        self.assertEqual(client.post('/transaction/import/upload/', {}, format='multipart').status_code, 403)
+        client.force_authenticate(User.objects.create(username='admin', branch=branch))
+        # past the permission check, the empty form is rejected by the serializer
+        self.assertEqual(client.post('/transaction/import/upload/', {}, format='multipart').status_code, 400)
+        self.assertFalse(ImportList.objects.exists())
+
+
+def csv_file(*lines):
+    return io.BytesIO('\n'.join(lines).encode())
+
+
+def xlsx_file(strings, sheet):
+    """A workbook as spreadsheet programs write it: text in the shared strings, ``sheet`` the rows' XML."""
+    shared = ''.join(f'<si>{string}</si>' for string in strings)
+    file = io.BytesIO()
+    with zipfile.ZipFile(file, 'w') as archive:
+        archive.writestr('[Content_Types].xml', CONTENT_TYPES)
+        archive.writestr('_rels/.rels', ROOT_RELS)
+        archive.writestr('xl/workbook.xml', WORKBOOK.format(name='Invoice'))
+        archive.writestr('xl/_rels/workbook.xml.rels', WORKBOOK_RELS)
+        archive.writestr('xl/sharedStrings.xml',
+                         '<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">' + shared + '</sst>')
+        archive.writestr('xl/worksheets/sheet1.xml',
+                         '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                         '<sheetData>' + sheet + '</sheetData></worksheet>')
+    file.seek(0)
+    return file
+
+
+class InvoiceImportTests(TestCase):
+    def setUp(self):
+        self.branch = Branch.objects.create(name='invoice')
+        self.supplier = Supplier.objects.create(first_name='supplier', phone='0', branch=self.branch)
+        Wallet.objects.create(name='wallet', balance=10 ** 6)
+
+    def run_import(self, file, **kwargs):
+        return import_invoice({'branch': self.branch, 'supplier': self.supplier, 'paid': 0, 'payment_type': '1'},
+                              file, **kwargs)
+
+    def lines(self, import_list):
+        return list(ImportProduct.objects.filter(import_list=import_list).order_by('pk').values_list(
+            'product__name', 'product__code', 'amount', 'arrival_price', 'sell_price'))
+
+    def test_header_under_title_rows(self):
+        import_list, report = self.run_import(csv_file(
+            'Invoice No 17;;;',
+            'Date;2026-10-01;;',
+            ';;;',
+            'Name;Amount;Arrival price;Sell price',
+            'Oil;2;1 500;2 100',
+            'Pad;1,5;300;450',
+        ))
+        self.assertEqual(report, {'rows': 2, 'imported': 2, 'error_count': 0, 'errors': []})
+        self.assertEqual(self.lines(import_list), [('Oil', None, 2, 1500, 2100), ('Pad', None, 1.5, 300, 450)])
+        self.assertEqual(import_list.total, 3450)
+
+    def test_synonyms_and_translated_names(self):
+        for header in ('SKU,Product,Qty,Cost,Retail price',
+                       'Код,Имя,Количество,Цена закупки,Цена продажи',
+                       'Kod,Nomi,Miqdor,Import narxi,Eksport narxi',
+                       'code,name,amount,arrival_price,sell_price'):
+            with self.subTest(header=header):
+                import_list, report = self.run_import(csv_file(header, 'EO-1,Oil,2,1500,2100'))
+                self.assertEqual(report['imported'], 1)
+                self.assertEqual(self.lines(import_list), [('Oil', 'EO-1', 2, 1500, 2100)])
+        # a header given for a column replaces the names it is known by
+        import_list, report = self.run_import(csv_file('Nomi,Soni,Narx,Sotish', 'Oil,3,1500,2100'),
+                                              columns={'amount': 'Soni', 'arrival_price': 'Narx',
+                                                       'sell_price': 'Sotish'})
+        self.assertEqual(self.lines(import_list), [('Oil', 'EO-1', 3, 1500, 2100)])
+        with self.assertRaises(ValidationError):
+            self.run_import(csv_file('Name,Quantity,Price', 'Oil,1,1500'))
+        with self.assertRaises(ValidationError):
+            self.run_import(csv_file('name,amount,arrival_price,sell_price'), columns={'colour': 'Colour'})
+
+    def test_invalid_rows_are_reported(self):
+        import_list, report = self.run_import(csv_file(
+            'name,amount,arrival_price,sell_price',
+            'Oil,2,1500,2100',
+            ',1,100,200',
+            'Pad,0,300,450',
+            ',,,',
+            'Belt,1,cheap,500',
+            'Bulb,1,40,60',
+        ))
+        self.assertEqual((report['rows'], report['imported'], report['error_count']), (5, 2, 3))
+        # by their line in the file, blank rows skipped but counted
+        self.assertEqual([(error['row'], sorted(error['errors'])) for error in report['errors']],
+                         [(3, ['name']), (4, ['amount']), (6, ['arrival_price'])])
+        self.assertEqual([line[0] for line in self.lines(import_list)], ['Oil', 'Bulb'])
+
+        import_list, report = self.run_import(csv_file('name,amount,arrival_price,sell_price', 'Pad,0,300,450'))
+        self.assertIsNone(import_list)
+        self.assertEqual(report['error_count'], 1)
+        self.assertEqual(ImportList.objects.count(), 1)
+
+    def test_chunks_smaller_than_the_invoice(self):
+        rows = [f'Product {number % 3},{number},10,20' for number in range(1, 8)]
+        reports = []
+        import_list, report = self.run_import(csv_file('name,amount,arrival_price,sell_price', *rows), chunk_size=3,
+                                              progress=lambda report: reports.append(dict(report)))
+        self.assertEqual([(report['rows'], report['imported']) for report in reports], [(3, 3), (6, 6), (7, 7)])
+        self.assertEqual(report['imported'], 7)
+        self.assertEqual(ImportList.objects.count(), 1)
+        self.assertEqual(ImportProduct.objects.filter(import_list=import_list).count(), 7)
+        self.assertEqual(import_list.total, 10 * sum(range(1, 8)))
+        # a product met again in a later chunk is the one the earlier chunk created
+        amounts = dict(Product.objects.filter(branch=self.branch).values_list('name', 'amount'))
+        self.assertEqual(amounts, {'Product 1': 1 + 4 + 7, 'Product 2': 2 + 5, 'Product 0': 3 + 6})
+        self.assertEqual(WarehouseValuation.totals(self.branch), WarehouseValuation.compute(self.branch))
+
+    def test_xlsx_with_shared_strings(self):
+        file = xlsx_file(
+            ['<t>Invoice 17</t>', '<t>Name</t>', '<t>Qty</t>', '<t>Price</t>', '<t>Sale price</t>',
+             '<r><t>Engine</t></r><r><t xml:space="preserve"> oil</t></r><rPh><t>x</t></rPh>', '<t>Pad</t>',
+             '<t>Code</t>', '<t>EO-1</t>'],
+            '<row r="1"><c r="A1" t="s"><v>0</v></c></row>'
+            '<row r="3"><c r="A3" t="s"><v>1</v></c><c r="B3" t="s"><v>2</v></c><c r="C3" t="s"><v>3</v></c>'
+            '<c r="D3" t="s"><v>4</v></c><c r="F3" t="s"><v>7</v></c></row>'
+            '<row r="4"><c r="A4" t="s"><v>5</v></c><c r="B4"><v>2</v></c><c r="C4"><v>1500</v></c>'
+            '<c r="D4"><v>2100</v></c><c r="F4" t="s"><v>8</v></c></row>'
+            '<row r="5"><c r="A5" t="s"><v>6</v></c><c r="B5"><v>1.5</v></c><c r="C5"><v>300</v></c>'
+            '<c r="D5" t="inlineStr"><is><t>450</t></is></c></row>',
+        )
+        self.assertEqual(list(read_xlsx(file)), [
+            ['Invoice 17'], [], ['Name', 'Qty', 'Price', 'Sale price', None, 'Code'],
+            ['Engine oil', 2, 1500, 2100, None, 'EO-1'], ['Pad', Decimal('1.5'), 300, '450'],
+        ])
+        file.seek(0)
+        import_list, report = self.run_import(file)
+        self.assertEqual(report, {'rows': 2, 'imported': 2, 'error_count': 0, 'errors': []})
+        self.assertEqual(self.lines(import_list), [('Engine oil', 'EO-1', 2, 1500, 2100), ('Pad', None, 1.5, 300, 450)])
+
+        with self.assertRaises(ValidationError):
+            self.run_import(io.BytesIO(b'PK\x03\x04 not a workbook'))
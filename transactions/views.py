@@ -4,26 +4,29 @@ from django.utils import timezone
 from datetime import datetime, timedelta
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import status
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import ValidationError, PermissionDenied
 from rest_framework.filters import SearchFilter, OrderingFilter
 from rest_framework.generics import ListCreateAPIView, RetrieveUpdateDestroyAPIView, CreateAPIView, ListAPIView
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.db.models import Sum, Case, When, F, DecimalField, Value
-
-from branches.models import Wallet
-from inventory.models import Product
-from services.models import Order, OrderProduct, OrderService
-from users.models import Supplier, Client
-from users.permissions import IsAdminUser
-from .models import ExpenseType, Expense, Salary, ImportList, ImportProduct, Debt, BranchFundTransfer, Lending
+from asgiref.sync import sync_to_async
+
+from branches.models import Branch, Wallet
+from core.async_views import AsyncAPIView
+from core.exports import ExportView
+from jobs.tasks import enqueue, job_file
+from jobs.views import BACKGROUND_PARAMETER, in_background, accepted
+from users.permissions import IsAdminUser, IsAdminOrSuperUser
+from .models import ExpenseType, Expense, Salary, ImportList, Debt, BranchFundTransfer, Lending
+from .invoices import import_invoice
+from .statistics import acached_branch_statistics, arange_report
 from .serializers import (
     ExpenseTypeSerializer, ExpenseSerializer, SalarySerializer,
     ImportListSerializer, ImportProductSerializer, DebtSerializer,
     BranchFundTransferSerializer, BranchFundTransferPostSerializer, LendingListSerializer,
     GetPayDebtSerializer, GivePayLendingSerializer, DebtUpdateSerializer, GetImportListSerializer,
-    LendingUpdateSerializer, SalaryUpdateSerializer
+    LendingUpdateSerializer, SalaryUpdateSerializer, ImportUploadSerializer, ImportListSummarySerializer
 )
 
 
@@ -174,8 +177,67 @@ class ImportCreateView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class ImportUploadView(APIView):
+    parser_classes = (MultiPartParser,)
+    permission_classes = [IsAdminUser]
+
+    @swagger_auto_schema(
+        request_body=ImportUploadSerializer,
+        manual_parameters=[BACKGROUND_PARAMETER],
+        responses={201: 'The import list, rows read, lines imported and the errors of the rows left out',
+                   202: 'The job importing the invoice, its result is the same',
+                   400: 'No valid row, or not a readable invoice'}
+    )
+    def post(self, request):
+        serializer = ImportUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = dict(serializer.validated_data)
+        file, columns = data.pop('file'), data.pop('columns', None)
+        if in_background(request):
+            path = job_file(file.name)
+            with open(path, 'wb') as saved:
+                for chunk in file.chunks():
+                    saved.write(chunk)
+            data['supplier'] = data['supplier'].pk if data.get('supplier') else None
+            job = enqueue('transactions.import_invoice', branch_id=request.user.branch_id, created_by=request.user,
+                          path=path, import_data=data, columns=columns)
+            return accepted(job, request)
+        import_list, report = import_invoice({**data, 'branch': request.user.branch}, file, columns)
+        if import_list is None:
+            return Response(report, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'import_list': ImportListSummarySerializer(import_list).data, **report},
+                        status=status.HTTP_201_CREATED)
+
+
+class RebuildDailyStatsView(APIView):
+    """Queues the recomputation of the daily statistics of the user's branch, see ``rebuild_daily_stats``."""
+    permission_classes = [IsAdminUser]
+
+    @swagger_auto_schema(
+        request_body=openapi.Schema(type=openapi.TYPE_OBJECT, properties={
+            'start': openapi.Schema(type=openapi.TYPE_STRING,
+                                    description="First day (YYYY-MM-DD), defaults to the first record"),
+            'end': openapi.Schema(type=openapi.TYPE_STRING, description="Last day (YYYY-MM-DD), defaults to today"),
+        }),
+        responses={202: 'The job rebuilding the statistics'}
+    )
+    def post(self, request):
+        days = {}
+        for param in ('start', 'end'):
+            if request.data.get(param):
+                try:
+                    days[param] = datetime.strptime(request.data[param], "%Y-%m-%d").date()
+                except (TypeError, ValueError):
+                    return Response({"error": "Invalid date format."}, status=400)
+        if 'start' in days and 'end' in days and days['start'] > days['end']:
+            return Response({"error": "start must not be after end."}, status=400)
+        job = enqueue('transactions.rebuild_daily_stats', branch_id=request.user.branch_id, created_by=request.user,
+                      **days)
+        return accepted(job, request)
+
+
 class ImportListAPIView(ListAPIView):
-    queryset = ImportList.objects.all()
+    queryset = ImportList.objects.prefetch_related('importproduct_set__product')
     serializer_class = ImportListSerializer
     permission_classes = [IsAdminUser]
 
@@ -191,7 +253,7 @@ class ImportListAPIView(ListAPIView):
 
 
 class ImportListDetailAPIView(RetrieveUpdateDestroyAPIView):
-    queryset = ImportList.objects.all()
+    queryset = ImportList.objects.prefetch_related('importproduct_set__product')
     serializer_class = GetImportListSerializer
     permission_classes = [IsAdminUser]
 
@@ -220,12 +282,8 @@ class BranchFundTransferListCreateView(ListCreateAPIView):
         return self.queryset.none()
 
     def perform_create(self, serializer):
-        branch = self.request.user.branch
-        serializer.save(
-            branch=branch,
-            user=self.request.user,
-            amount=branch.balance
-        )
+        # the amount is the branch balance at the moment of the transfer, see BranchFundTransfer.save
+        serializer.save(branch=self.request.user.branch, user=self.request.user)
 
 
 class GiveLendingCreateView(CreateAPIView):
@@ -557,10 +615,10 @@ class SalaryDetailView(RetrieveUpdateDestroyAPIView):
 """
 
 
-class DetailedBranchStatisticsView(APIView):
+class DetailedBranchStatisticsView(AsyncAPIView):
     permission_classes = [IsAdminUser]
 
-    def get(self, request, year=None, month=None, day=None):
+    async def get(self, request, year=None, month=None, day=None):
         try:
             if year and month and day:
                 start_date = timezone.make_aware(datetime(year, month, day, 0, 0, 0))
@@ -578,115 +636,8 @@ class DetailedBranchStatisticsView(APIView):
         except ValueError:
             return Response({"error": "Invalid date format."}, status=400)
 
-        # Calculations
-        orders = Order.objects.filter(branch=request.user.branch, created_at__range=[start_date, end_date])
-
-        sold_product_total_price = orders.aggregate(total=Sum("product_overall_total"))["total"] or 0
-        products_totals_with_discount = orders.aggregate(total=Sum("product_total"))["total"] or 0
-
-        order_products = OrderProduct.objects.filter(order__branch=request.user.branch,
-                                                     order__created_at__range=[start_date, end_date])
-        sold_product_net_profit = order_products.aggregate(
-            total=Sum("net_profit"))["total"] or 0
-
-        service_income_total = orders.aggregate(total=Sum("service_overall_total"))["total"] or 0
-        service_totals_with_discount = orders.aggregate(total=Sum("service_total"))["total"] or 0
-
-        order_income_total = products_totals_with_discount + service_totals_with_discount
-
-        import_list = ImportList.objects.filter(branch=request.user.branch, created_at__range=[start_date, end_date])
-        warehouse_import_total = import_list.exclude(payment_type="0").aggregate(total=Sum("total"))["total"] or 0
-        warehouse_import_paid = import_list.exclude(payment_type="0").aggregate(total=Sum("paid"))["total"] or 0
-
-        latest_import_product = ImportProduct.objects.filter(
-            import_list__created_at__range=[start_date, end_date],
-            import_list__branch=request.user.branch
-        ).order_by('-import_list__created_at', '-id').first()
-
-        latest_order_product = OrderProduct.objects.filter(
-            order__created_at__range=[start_date, end_date],
-            order__branch=request.user.branch
-        ).order_by('-order__created_at', '-id').first()
-
-        if latest_import_product and latest_order_product:
-            if latest_import_product.import_list.created_at >= latest_order_product.order.created_at:
-                latest_warehouse_remainder_sell = latest_import_product.warehouse_remainder_sell_price
-                latest_warehouse_remainder_arrival = latest_import_product.warehouse_remainder_arrival_price
-            else:
-                latest_warehouse_remainder_sell = latest_order_product.warehouse_remainder_sell_price
-                latest_warehouse_remainder_arrival = latest_order_product.warehouse_remainder_arrival_price
-        elif latest_import_product:
-            latest_warehouse_remainder_sell = latest_import_product.warehouse_remainder_sell_price
-            latest_warehouse_remainder_arrival = latest_import_product.warehouse_remainder_arrival_price
-        elif latest_order_product:
-            latest_warehouse_remainder_sell = latest_order_product.warehouse_remainder_sell_price
-            latest_warehouse_remainder_arrival = latest_order_product.warehouse_remainder_arrival_price
-        else:
-            latest_warehouse_remainder_sell = 0
-            latest_warehouse_remainder_arrival = 0
-
-
-        expenses = Expense.objects.filter(branch=request.user.branch, created_at__range=[start_date, end_date])
-        general_expense_details = expenses.values("type__name").annotate(total_amount=Sum("amount"))
-        general_expense_total = expenses.aggregate(total=Sum("amount"))["total"] or 0
-
-        total_supplier_debt = Supplier.objects.filter(branch=request.user.branch).aggregate(
-            total=Sum("debt"))["total"] or 0
-        supplier_debt_details = Supplier.objects.filter(branch=request.user.branch).values(
-            "first_name", "last_name").annotate(total_debt=Sum("debt")).exclude(total_debt=0)
-
-        total_supplier_payments = Debt.objects.filter(branch=request.user.branch,
-                                                      is_debt=False,
-                                                      created_at__range=[start_date, end_date]).aggregate(
-            total=Sum("debt_amount"))["total"] or 0
-        supplier_payment_detail = Debt.objects.filter(branch=request.user.branch,
-                                                      is_debt=False,
-                                                      created_at__range=[start_date, end_date]).values(
-            "supplier__first_name", "supplier__last_name").annotate(total_payment=Sum("debt_amount")).exclude(
-            total_payment=0)
-
-        total_client_lending = Client.objects.filter(branch=request.user.branch).aggregate(
-            total=Sum("lending"))["total"] or 0
-        client_lending_details = Client.objects.filter(branch=request.user.branch).values(
-            "first_name", "last_name").annotate(total_lending=Sum("lending")).exclude(total_lending=0)
-
-        warehouse_products = Product.objects.filter(branch=request.user.branch, is_temp=False)
-        warehouse_profit = warehouse_products.filter(amount__gt=0).aggregate(
-            total_value=Sum(F("amount") * (F("sell_price") - F("arrival_price")), output_field=DecimalField()))["total_value"] or 0
-        warehouse_detail = Product.objects.filter(branch=request.user.branch, is_temp=False).values(
-            "code", "name").annotate(
-            total_value=Sum(F("amount") * F("sell_price"), output_field=DecimalField()),
-        ).exclude(total_value=0)
-        warehouse_arrival_price = warehouse_products.filter(amount__gt=0).aggregate(
-            total_value=Sum(F("amount") * F("arrival_price"), output_field=DecimalField()))["total_value"] or 0
-        warehouse_sell_price = warehouse_products.filter(amount__gt=0).aggregate(
-            total_value=Sum(F("amount") * F("sell_price"), output_field=DecimalField()))["total_value"] or 0
-
-        total_paid = import_list.aggregate(total=Sum('paid'))['total'] or 0
-
-        paid_to_supplier_details = (
-            import_list.values(
-                first_name=F('supplier__first_name'),
-                last_name=F('supplier__last_name'),
-            )
-            .annotate(total_paid=Sum('paid'))
-        )
-
-        import_products = ImportProduct.objects.filter(import_list__branch=request.user.branch,
-                                                       import_list__created_at__range=[start_date, end_date])
-        not_transfer_products = import_products.exclude(import_list__payment_type="0")
-        not_transfer_total_arrival_price = not_transfer_products.aggregate(
-                                                total=Sum(F("arrival_price") * F("amount"), output_field=DecimalField()))["total"] or 0
-        not_transfer_total_sell_price = not_transfer_products.aggregate(
-            total=Sum(F("sell_price") * F("amount"), output_field=DecimalField()))["total"] or 0
-
-        by_transfer_products = import_products.filter(import_list__payment_type="0")
-        by_transfer_total_arrival_price = by_transfer_products.aggregate(
-            total=Sum(F("arrival_price") * F("amount"), output_field=DecimalField()))["total"] or 0
-        by_transfer_total_sell_price = by_transfer_products.aggregate(
-            total=Sum(F("sell_price") * F("amount"), output_field=DecimalField()))["total"] or 0
-
-        net_income = order_income_total - (general_expense_total + warehouse_import_paid + total_supplier_payments)
+        statistics, cache_hit, cache_age = await acached_branch_statistics(
+            request.user.branch_id, start_date.date(), end_date.date())
 
         russian_months = {
             1: "января", 2: "февраля", 3: "марта", 4: "апреля",
@@ -695,65 +646,123 @@ class DetailedBranchStatisticsView(APIView):
         }
         # Response data
         response_data = {
-            "branch_id": request.user.branch.id,
+            "branch_id": request.user.branch_id,
             "duration": duration,
             "month": russian_months[start_date.month],
             "start_date": start_date.strftime("%d-%m-%Y"),
             "end_date": end_date.strftime("%d-%m-%Y"),
-            "order": {
-                "total": order_income_total,
-                "products": {
-                    "overall_total": sold_product_total_price,
-                    "total_with_discount": products_totals_with_discount,
-                    "net_profit": sold_product_net_profit
-                },
-                "services": {
-                    "overall_total": service_income_total,
-                    "total_with_discount": service_totals_with_discount
-                }
-            },
-            "warehouse_remainder": {
-                "sell_price": latest_warehouse_remainder_sell,
-                "arrival_price": latest_warehouse_remainder_arrival,
-                "net_profit": latest_warehouse_remainder_sell - latest_warehouse_remainder_arrival
-            },
-            "expenses": {
-                "total": general_expense_total,
-                "details": list(general_expense_details)
-            },
-            "debt_from_supplier": {
-                "total": total_supplier_debt,
-                "detail": list(supplier_debt_details)
-            },
-            "supplier_payments": {
-                "total": total_supplier_payments,
-                "detail": list(supplier_payment_detail)
-            },
-            "client_lending": {
-                "total": total_client_lending,
-                "detail": list(client_lending_details)
-            },
-            "warehouse": {
-                "arrival_price": warehouse_arrival_price,
-                "sell_price": warehouse_sell_price,
-                "net_profit": warehouse_profit,
-                "detail": warehouse_detail
-            },
-            "warehouse_paid": {
-                "total": total_paid,
-                "detail": list(paid_to_supplier_details)
-            },
-            "not_transfer": {
-                "arrival_price": not_transfer_total_arrival_price,
-                "sell_price": not_transfer_total_sell_price,
-                "net_profit": not_transfer_total_sell_price - not_transfer_total_arrival_price
-            },
-            "by_transfer": {
-                "arrival_price": by_transfer_total_arrival_price,
-                "sell_price": by_transfer_total_sell_price,
-                "net_profit": by_transfer_total_sell_price - by_transfer_total_arrival_price
-            },
-            "net_income": net_income
+            **statistics,
+            "cache": {
+                "hit": cache_hit,
+                "age": cache_age
+            }
         }
 
         return Response(response_data)
+
+
+class BranchRangeStatisticsView(AsyncAPIView):
+    """
+    Statistics of a custom date range for one or several branches with their total.
+    Other branches than the user's own are only available to superusers.
+    """
+    permission_classes = [IsAdminOrSuperUser]
+    max_days = 731
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(name='start', in_=openapi.IN_QUERY, required=True,
+                              description="First day (YYYY-MM-DD)", type=openapi.TYPE_STRING),
+            openapi.Parameter(name='end', in_=openapi.IN_QUERY, required=True,
+                              description="Last day (YYYY-MM-DD)", type=openapi.TYPE_STRING),
+            openapi.Parameter(name='branch', in_=openapi.IN_QUERY,
+                              description="Branch IDs, comma separated (superuser only; defaults to all branches)",
+                              type=openapi.TYPE_STRING),
+            BACKGROUND_PARAMETER,
+        ]
+    )
+    async def get(self, request):
+        try:
+            start_date = datetime.strptime(request.query_params['start'], "%Y-%m-%d").date()
+            end_date = datetime.strptime(request.query_params['end'], "%Y-%m-%d").date()
+        except KeyError:
+            return Response({"error": "start and end are required parameters."}, status=400)
+        except ValueError:
+            return Response({"error": "Invalid date format."}, status=400)
+        if start_date > end_date or (end_date - start_date).days >= self.max_days:
+            return Response({"error": f"The range must be between 1 and {self.max_days} days."}, status=400)
+
+        branches = Branch.objects.order_by('id')
+        if request.query_params.get('branch'):
+            try:
+                branch_ids = {int(branch_id) for branch_id in request.query_params['branch'].split(',')}
+            except ValueError:
+                return Response({"error": "Invalid branch."}, status=400)
+            branches = branches.filter(id__in=branch_ids)
+        elif not request.user.is_superuser:
+            branches = branches.filter(id=request.user.branch_id)
+        branches = [branch async for branch in branches.values('id', 'name')]
+        if not request.user.is_superuser and any(branch['id'] != request.user.branch_id for branch in branches):
+            raise PermissionDenied("Only superusers can see the statistics of other branches.")
+
+        if in_background(request):
+            job = await sync_to_async(enqueue)(
+                'transactions.range_statistics', branch_id=request.user.branch_id, created_by=request.user,
+                branches=branches, start=start_date, end=end_date)
+            return accepted(job, request)
+        return Response(await arange_report(branches, start_date, end_date))
+
+
+class ExpenseExportView(ExportView):
+    filename = 'expenses'
+    columns = (
+        ('ID', 'id'),
+        ('Created at', 'created_at'),
+        ('Type', 'type__name'),
+        ('Description', 'description'),
+        ('Amount', 'amount'),
+        ('User', 'from_user__username'),
+    )
+
+    def get_queryset(self):
+        return Expense.objects.filter(branch=self.request.user.branch)
+
+
+class DebtExportView(ExportView):
+    filename = 'debts'
+    columns = (
+        ('ID', 'id'),
+        ('Created at', 'created_at'),
+        ('Supplier', 'supplier__first_name'),
+        ('Supplier last name', 'supplier__last_name'),
+        ('Is debt', 'is_debt'),
+        ('Debt amount', 'debt_amount'),
+        ('Current debt', 'current_debt'),
+    )
+
+    def get_queryset(self):
+        queryset = Debt.objects.filter(branch=self.request.user.branch)
+        is_debt = (self.request.query_params.get('is_debt') or '').lower()
+        if is_debt in ('true', 'false'):
+            queryset = queryset.filter(is_debt=is_debt == 'true')
+        return queryset
+
+
+class LendingExportView(ExportView):
+    filename = 'lendings'
+    columns = (
+        ('ID', 'id'),
+        ('Created at', 'created_at'),
+        ('Client', 'client__first_name'),
+        ('Client last name', 'client__last_name'),
+        ('Is lending', 'is_lending'),
+        ('Lending amount', 'lending_amount'),
+        ('Current lending', 'current_lending'),
+    )
+
+    def get_queryset(self):
+        queryset = Lending.objects.filter(branch=self.request.user.branch)
+        is_lending = (self.request.query_params.get('is_lending') or '').lower()
+        if is_lending in ('true', 'false'):
+            queryset = queryset.filter(is_lending=is_lending == 'true')
+        return queryset
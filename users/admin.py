@@ -1,7 +1,7 @@
 from django.contrib.admin import ModelAdmin, register, site
 from django.contrib.auth.models import Group
 from django.contrib.auth.admin import UserAdmin
-from .models import User, Employee, Supplier, Client
+from .models import User, Employee, Supplier, Client, SalaryAccrual
 from django.utils.translation import gettext_lazy as _
 
 site.unregister(Group)
@@ -12,6 +12,7 @@ class UserAdmin(UserAdmin):
     search_fields = ('username', 'branch__name')
 
     list_filter = ('is_staff', 'is_superuser', 'is_active', 'branch')
+    list_select_related = ('branch',)
 
     fieldsets = (
         (None, {'fields': ('username', 'password')}),
@@ -53,3 +54,10 @@ class ClientAdmin(ModelAdmin):
     list_filter = ('branch',)
 
 
+@register(SalaryAccrual)
+class SalaryAccrualAdmin(ModelAdmin):
+    list_display = ('month', 'branch', 'employees', 'amount', 'created_at')
+    list_filter = ('branch',)
+    list_select_related = ('branch',)
+    ordering = ('-month', 'branch')
+    readonly_fields = ('branch', 'month', 'employees', 'amount', 'created_at')
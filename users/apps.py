@@ -6,3 +6,7 @@ class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
     verbose_name = _('Users')
+
+    def ready(self):
+        # connects the receivers that retire the branch catalogs of saved services and employees
+        import core.catalog
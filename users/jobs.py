@@ -0,0 +1,14 @@
+from datetime import timedelta
+
+from jobs.tasks import task
+from .salaries import accrue_salaries
+
+
+@task('users.accrue_salaries', every=timedelta(hours=1))
+def accrue_salaries_job(job):
+    """The ``add_salary_balance`` command, queued by the workers every hour."""
+    return {'accrued': [
+        {'branch_id': accrual.branch_id, 'month': accrual.month, 'employees': accrual.employees,
+         'amount': accrual.amount}
+        for accrual in accrue_salaries()
+    ]}
@@ -1,15 +1,34 @@
-from django.core.management.base import BaseCommand
-from django.utils import timezone
-from users.models import Employee
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from branches.models import Branch
+from users.salaries import accrue_month, accrue_salaries
+
 
 class Command(BaseCommand):
-    help = 'Add salary amount to balance for employees with position "other" on the 1st of the month'
+    help = ('Add the monthly salary to the balance of the "other" employees for every month not accrued yet '
+            '(the current one and any missed); safe to run any day and any number of times. '
+            '`run_jobs` workers run it every hour on their own. Migrated on the 1st of a month, the first '
+            'run pays that month: take the old day-1 cron off before migrating on that day')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--branch', type=int, action='append', help='Only accrue these branch ids')
+        parser.add_argument('--month', help='Accrue only this month (YYYY-MM), unless it already was')
 
     def handle(self, *args, **options):
-        current_date = timezone.now().date()
-        if current_date.day == 1:
-            employees = Employee.objects.filter(position="other")
-            for employee in employees:
-                employee.balance += employee.salary
-                employee.save()
-            self.stdout.write(self.style.SUCCESS("Successfully added salary to balance for 'other' employees"))
+        if options['month']:
+            try:
+                month = datetime.strptime(options['month'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError('--month must be YYYY-MM')
+            branch_ids = options['branch'] or Branch.objects.order_by('id').values_list('id', flat=True)
+            accruals = [accrual for accrual in (accrue_month(branch_id, month) for branch_id in branch_ids)
+                        if accrual is not None]
+        else:
+            accruals = accrue_salaries(options['branch'])
+
+        for accrual in accruals:
+            self.stdout.write(f"Branch #{accrual.branch_id}, {accrual.month:%Y-%m}: "
+                              f"{accrual.employees} employee(s), {accrual.amount}")
+        self.stdout.write(self.style.SUCCESS(f"Salaries accrued for {len(accruals)} month(s)"))
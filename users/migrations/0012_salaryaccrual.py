@@ -0,0 +1,61 @@
+# Generated by Django 5.0.7 on 2026-10-18 09:15
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+
+def seed_current_month(apps, schema_editor, today=None):
+    """
+    Records the current month as accrued for every branch: the day-1 cron this replaces has paid it
+    already, and the first accrual run would otherwise pay it again.
+
+    On the 1st the cron may not have run yet, so the month before is recorded instead and the current
+    one left to the first accrual run (see the ``add_salary_balance`` help).
+    """
+    Branch = apps.get_model('branches', 'Branch')
+    Employee = apps.get_model('users', 'Employee')
+    SalaryAccrual = apps.get_model('users', 'SalaryAccrual')
+    today = today or timezone.localdate()
+    month = today.replace(day=1)
+    if today.day == 1:
+        month = (month - timedelta(days=1)).replace(day=1)
+    for branch in Branch.objects.all():
+        totals = Employee.objects.filter(branch=branch, position='other').aggregate(count=Count('id'),
+                                                                                    amount=Sum('salary'))
+        SalaryAccrual.objects.create(branch=branch, month=month, employees=totals['count'],
+                                     amount=totals['amount'] or 0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('branches', '0006_walletmovement'),
+        ('users', '0011_alter_usertemp_last_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalaryAccrual',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='Month')),
+                ('employees', models.PositiveIntegerField(default=0, verbose_name='Employees')),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=15, verbose_name='Amount')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='branches.branch', verbose_name='Branch')),
+            ],
+            options={
+                'verbose_name': 'Salary accrual',
+                'verbose_name_plural': 'Salary accruals',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='salaryaccrual',
+            constraint=models.UniqueConstraint(fields=('branch', 'month'), name='unique_salary_accrual'),
+        ),
+        migrations.RunPython(seed_current_month, migrations.RunPython.noop),
+    ]
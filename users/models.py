@@ -72,4 +72,25 @@ class Client(UserTemp):
         verbose_name_plural = _("Clients")
 
     def __str__(self):
-        return f"{self.first_name} {self.last_name}"
\ No newline at end of file
+        return f"{self.first_name} {self.last_name}"
+
+class SalaryAccrual(models.Model):
+    """
+    The salaries of a month added to the balances of a branch's "other" employees. One per branch
+    and month, so a month is never paid twice, see ``users.salaries``.
+    """
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE, verbose_name=_('Branch'))
+    month = models.DateField(verbose_name=_('Month'))
+    employees = models.PositiveIntegerField(default=0, verbose_name=_('Employees'))
+    amount = models.DecimalField(default=0, max_digits=15, decimal_places=2, verbose_name=_('Amount'))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Created at'))
+
+    class Meta:
+        verbose_name = _("Salary accrual")
+        verbose_name_plural = _("Salary accruals")
+        constraints = [
+            models.UniqueConstraint(fields=['branch', 'month'], name='unique_salary_accrual'),
+        ]
+
+    def __str__(self):
+        return f"{self.branch} - {self.month:%Y-%m}"
@@ -15,4 +15,10 @@ class IsAdminUser(BasePermission):
         if request.user.is_authenticated:
             if not request.user.is_superuser and not request.user.is_staff:
                 return True
-        return False
\ No newline at end of file
+        return False
+
+
+class IsAdminOrSuperUser(BasePermission):
+    """Branch admins (see ``IsAdminUser``) and superusers, for what spans branches."""
+    def has_permission(self, request, view):
+        return IsAdminUser().has_permission(request, view) or bool(request.user and request.user.is_superuser)
@@ -0,0 +1,67 @@
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Sum
+from django.utils import timezone
+
+from branches.models import Branch
+from .models import Employee, SalaryAccrual
+
+# the employees paid a monthly salary into their balance
+SALARIED_POSITION = 'other'
+
+
+def next_month(month):
+    return (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def due_months(last, current, opened):
+    """
+    The months after ``last`` (the last one accrued, ``None`` for none) up to ``current``; with none
+    accrued, from the month after ``opened``, the month the branch was created in. A month pays the
+    employees there at its first run, and a new branch has none then.
+    """
+    month = next_month(last or opened)
+    while month <= current:
+        yield month
+        month = next_month(month)
+
+
+def accrue_month(branch_id, month):
+    """
+    Adds the salary of each of the branch's salaried employees to their balance for ``month``, with
+    one UPDATE, and returns the accrual; ``None`` if the month was already accrued.
+
+    The accrual row is inserted in the same transaction as the UPDATE, so its unique constraint is
+    what keeps two runs (or two workers) from paying a month twice.
+    """
+    employees = Employee.objects.filter(branch_id=branch_id, position=SALARIED_POSITION)
+    try:
+        with transaction.atomic():
+            totals = employees.aggregate(count=Count('id'), amount=Sum('salary'))
+            accrual = SalaryAccrual.objects.create(branch_id=branch_id, month=month, employees=totals['count'],
+                                                   amount=totals['amount'] or 0)
+            employees.update(balance=F('balance') + F('salary'))
+    except IntegrityError:
+        return None
+    return accrual
+
+
+def accrue_salaries(branch_ids=None, today=None):
+    """
+    Accrues every month due: the current one from its first day on, and those missed since the last
+    accrual of each branch (a branch without any starts with the month after it was created).
+    Running it again does nothing until the next month. Returns the accruals made.
+    """
+    current = (today or timezone.localdate()).replace(day=1)
+    branches = Branch.objects.order_by('id')
+    if branch_ids:
+        branches = branches.filter(id__in=branch_ids)
+    last = dict(SalaryAccrual.objects.values('branch').annotate(last=Max('month')).values_list('branch', 'last'))
+    accruals = []
+    for branch_id, created_at in branches.values_list('id', 'created_at'):
+        for month in due_months(last.get(branch_id), current, timezone.localdate(created_at).replace(day=1)):
+            accrual = accrue_month(branch_id, month)
+            if accrual is not None:
+                accruals.append(accrual)
+    return accruals
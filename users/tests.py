@@ -1,3 +1,66 @@
+from datetime import date, datetime
+from importlib import import_module
+
+from django.apps import apps
 from django.test import TestCase
+from django.utils import timezone
+
+from branches.models import Branch
+from users.models import Employee, SalaryAccrual
+from users.salaries import accrue_salaries
+
+seed_current_month = import_module('users.migrations.0012_salaryaccrual').seed_current_month
+
+
+class SalaryAccrualTests(TestCase):
+    def branch(self, name, opened):
+        branch = Branch.objects.create(name=name)
+        Branch.objects.filter(pk=branch.pk).update(
+            created_at=timezone.make_aware(datetime.combine(opened, datetime.min.time())))
+        return branch
+
+    def employee(self, branch, salary):
+        return Employee.objects.create(first_name='employee', phone='0', branch=branch, position='other', salary=salary)
+
+    def test_month_paid_by_the_cron_is_not_paid_again(self):
+        branch = self.branch('old', date(2026, 1, 5))
+        employee = self.employee(branch, 100)
+        # deployed mid-month: the day-1 cron has paid the current month already
+        seed_current_month(apps, None, today=date(2026, 5, 12))
+        self.assertEqual(list(SalaryAccrual.objects.values_list('branch', 'month', 'employees', 'amount')),
+                         [(branch.pk, date(2026, 5, 1), 1, 100)])
+        self.assertEqual(accrue_salaries(today=date(2026, 5, 12)), [])
+        employee.refresh_from_db()
+        self.assertEqual(employee.balance, 0)
+
+    def test_month_is_left_to_accrue_when_deployed_on_its_first_day(self):
+        branch = self.branch('old', date(2026, 1, 5))
+        employee = self.employee(branch, 100)
+        # the day-1 cron may not have run yet: the month before is the one recorded
+        seed_current_month(apps, None, today=date(2026, 5, 1))
+        self.assertEqual(list(SalaryAccrual.objects.values_list('month', flat=True)), [date(2026, 4, 1)])
+        self.assertEqual([accrual.month for accrual in accrue_salaries(today=date(2026, 5, 1))], [date(2026, 5, 1)])
+        self.assertEqual(accrue_salaries(today=date(2026, 5, 2)), [])
+        employee.refresh_from_db()
+        self.assertEqual(employee.balance, 100)
+
+    def test_new_branch_starts_with_the_month_after_it_opened(self):
+        branch = self.branch('new', date(2026, 3, 15))
+        self.assertEqual(accrue_salaries(today=date(2026, 3, 20)), [])
+        # hired after the branch opened: March is not paid, April is, once
+        employee = self.employee(branch, 100)
+        self.assertEqual(accrue_salaries(today=date(2026, 3, 25)), [])
+        self.assertEqual([(accrual.month, accrual.employees) for accrual in accrue_salaries(today=date(2026, 4, 1))],
+                         [(date(2026, 4, 1), 1)])
+        self.assertEqual(accrue_salaries(today=date(2026, 4, 2)), [])
+        employee.refresh_from_db()
+        self.assertEqual(employee.balance, 100)
 
-# Create your tests here.
+    def test_missed_months_are_caught_up(self):
+        branch = self.branch('missed', date(2026, 1, 10))
+        employee = self.employee(branch, 50)
+        accruals = accrue_salaries(today=date(2026, 4, 7))
+        self.assertEqual([accrual.month for accrual in accruals],
+                         [date(2026, 2, 1), date(2026, 3, 1), date(2026, 4, 1)])
+        employee.refresh_from_db()
+        self.assertEqual(employee.balance, 150)
@@ -4,6 +4,7 @@ from rest_framework.generics import ListCreateAPIView, RetrieveUpdateDestroyAPIV
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from core.catalog import CatalogListMixin
 from .models import Employee, Supplier, Client
 from .permissions import IsSameBranch, IsAdminUser
 from .serializers import *
@@ -54,9 +55,12 @@ class SupplierRetrieveUpdateDestroyView(RetrieveUpdateDestroyAPIView):
 
 
 
-class ManagerListCreateView(ListCreateAPIView):
+class ManagerListCreateView(CatalogListMixin, ListCreateAPIView):
     serializer_class = ManagerSerializer
     permission_classes = [IsAdminUser, IsSameBranch]
+    catalog_model = Employee
+    catalog_filter = {'position': 'manager'}
+    live_fields = ('balance',)
 
     def get_queryset(self):
         return Employee.objects.filter(position='manager', branch=self.request.user.branch)
@@ -77,10 +81,13 @@ class ManagerRetrieveUpdateDestroyView(RetrieveUpdateDestroyAPIView):
             return self.queryset.filter(branch=self.request.user.branch)
         return self.queryset.none()
 
-class MechanicListCreateView(ListCreateAPIView):
+class MechanicListCreateView(CatalogListMixin, ListCreateAPIView):
     queryset = Employee.objects.filter(position='mechanic')
     serializer_class = MechanicSerializer
     permission_classes = [IsAdminUser, IsSameBranch]
+    catalog_model = Employee
+    catalog_filter = {'position': 'mechanic'}
+    live_fields = ('balance',)
 
     def get_queryset(self):
         if self.request.user.is_authenticated:
@@ -103,10 +110,13 @@ class MechanicRetrieveUpdateDestroyView(RetrieveUpdateDestroyAPIView):
             return self.queryset.filter(branch=self.request.user.branch)
         return self.queryset.none()
 
-class WorkerListCreateView(ListCreateAPIView):
+class WorkerListCreateView(CatalogListMixin, ListCreateAPIView):
     queryset = Employee.objects.filter(position='other')
     serializer_class = WorkerSerializer
     permission_classes = [IsAdminUser, IsSameBranch]
+    catalog_model = Employee
+    catalog_filter = {'position': 'other'}
+    live_fields = ('balance',)
 
     def get_queryset(self):
         if self.request.user.is_authenticated: